@@ -26,6 +26,25 @@ CSV_PATH = PROJECT_ROOT / "PCG.csv"
 
 EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
 
+# Persistent text -> vector cache (see functions/embedding_cache.py)
+EMBEDDING_CACHE_DIR = PROJECT_ROOT / ".cache" / "embeddings"
+EMBEDDING_CACHE_DTYPE = "float32"  # or "float16" to halve disk usage
+
+# Dynamic batching (see functions/embedding_service.py)
+EMBED_MAX_BATCH_TOKENS = 16384   # padded tokens per model call
+EMBED_MAX_BATCH_SIZE = 128
+QUERY_BATCH_WAIT_MS = 5.0        # window for coalescing concurrent queries
+
+# Query embedder / reranker runtime (see functions/onnx_backend.py):
+# "torch" (eager fp32), "onnx" or "onnx-int8" (dynamic int8 quantization)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+ONNX_CACHE_DIR = PROJECT_ROOT / ".cache" / "onnx"
+ONNX_QUANTIZATION = "avx2"  # or "avx512", "avx512_vnni", "arm64"
+# Parity gates vs PyTorch: an export that misses one is not used (PyTorch fallback)
+ONNX_PARITY_MIN_COSINE = 0.99        # embedder: worst-case cosine similarity
+ONNX_PARITY_MAX_RERANK_DRIFT = 0.5   # reranker: max |score difference| (logits)
+ONNX_PARITY_MIN_RANK_CORR = 0.9      # reranker: Spearman rank correlation
+
 
 # -------------------------
 # 4. Pipeline Parameters
@@ -36,6 +55,21 @@ MIN_FULLTEXT_LEN = 100
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 100
 
+# Process pool size for PDFExtractor.read_many
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", os.cpu_count() or 1))
+
+# On-disk cache of cleaned full text (see functions/extraction_cache.py)
+CACHE_DIR = PROJECT_ROOT / ".cache"
+EXTRACTION_CACHE_DIR = CACHE_DIR / "extraction"
+EXTRACTION_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Per-paper fingerprints for incremental sync (see functions/incremental_sync.py)
+SYNC_MANIFEST_PATH = CACHE_DIR / "sync_manifest.json"
+
+# Checkpointed backfill (see functions/staged_backfill.py)
+BACKFILL_WORK_DIR = CACHE_DIR / "backfill"
+BACKFILL_PARTITION_SIZE = 256  # papers per Parquet partition
+
 
 # -------------------------
 # 5. Hopsworks
@@ -50,16 +84,78 @@ HOPSWORKS_API_KEY = os.getenv("HOPSWORKS_API_KEY")
 # 6. Feature Store Schema
 # -------------------------
 
-# Feature Groups
-META_FG_NAME = "zotero_meta_fg"
-META_FG_VERSION = 1
+# Feature Groups (created by 1_feature_backfill.ipynb)
+META_FG_NAME = "paper_metadata_fg_2"
+META_FG_VERSION = 3
 
-FULLTEXT_FG_NAME = "zotero_fulltext_fg"
-FULLTEXT_FG_VERSION = 1
+FULLTEXT_FG_NAME = "paper_chunk_fg_2"
+FULLTEXT_FG_VERSION = 3
 
 # Feature Views
-META_FV_NAME = "zotero_papers"
-META_FV_VERSION = 1
+META_FV_NAME = "paper_metadata_fv_2"
+META_FV_VERSION = 3
+
+FULLTEXT_FV_NAME = "paper_chunk_fv_2"
+FULLTEXT_FV_VERSION = 3
+
+
+# -------------------------
+# 7. Retrieval Backend
+# -------------------------
 
-FULLTEXT_FV_NAME = "zotero_chunks"
-FULLTEXT_FV_VERSION = 1
+# "hopsworks": find_neighbors on the Feature Views
+# "local"    : exact search over memory-mapped exports (functions/vector_index.py)
+# "hnsw"     : approximate search, same exports + HNSW graph (functions/hnsw_index.py)
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "hopsworks")
+
+LOCAL_INDEX_DIR = PROJECT_ROOT / ".cache" / "index"
+
+# paper_id -> title/authors/year snapshot (see functions/metadata_snapshot.py)
+METADATA_SNAPSHOT_DIR = PROJECT_ROOT / ".cache" / "metadata_snapshot"
+
+# Adaptive recall depth for search_chunks (see functions/recall_controller.py)
+RECALL_OVERSAMPLE = 5      # in-scope candidates per requested chunk
+RECALL_MAX_DEPTH = 2000
+RECALL_MAX_ROUNDS = 3      # extra widening round-trips per query
+RECALL_LOG = os.getenv("RECALL_LOG", "0") == "1"  # per-query depth printout
+# Largest paper_id list pushed down to the Hopsworks vector DB as a filter;
+# bigger scopes are post-filtered with an over-fetch instead
+FILTER_PUSHDOWN_MAX_IDS = 10000
+
+# Hybrid retrieval: local BM25 index over chunk content (functions/sparse_index.py),
+# fused with dense results by reciprocal-rank fusion before reranking.
+# Opt-in: after an ingest run that does not update it in place (notebooks,
+# resumable backfill) the index is rebuilt with a full read of the chunk view
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "0") == "1"
+BM25_INDEX_DIR = LOCAL_INDEX_DIR / "bm25"
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+
+# Rerank cascade (functions/rerank_cascade.py): cheap re-score first, then the
+# cross-encoder on RERANK_TOP_M_FACTOR * k survivors unless the margin is decisive.
+# Off by default: early-exit results keep cheap-stage scores, which are not on
+# the cross-encoder scale, until recall/latency are measured on real queries
+RERANK_CASCADE = os.getenv("RERANK_CASCADE", "0") == "1"
+RERANK_TOP_M_FACTOR = 2.0
+RERANK_LEXICAL_WEIGHT = 0.5
+RERANK_EARLY_EXIT_MARGIN = 0.25
+
+# HNSW parameters (M / ef_construction only apply when the graph is built)
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Async serving (functions/worker_pool.py): threads shared by every request
+# for blocking work (embedding, vector search, reranking, local LLM calls)
+ASYNC_WORKERS = int(os.getenv("ASYNC_WORKERS", min(8, os.cpu_count() or 1)))
+# Concurrent agent runs the Gradio UI lets onto the event loop
+UI_CONCURRENCY_LIMIT = 32
+
+# Semantic answer cache in front of the agent (functions/answer_cache.py)
+# Opt-in: paraphrases are answered from earlier responses
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "0") == "1"
+ANSWER_CACHE_THRESHOLD = 0.92        # cosine similarity of query embeddings
+ANSWER_CACHE_SIZE = 512
+ANSWER_CACHE_TTL_SECONDS = 24 * 3600
+ANSWER_CACHE_POLL_SECONDS = 60       # background poll of Feature Group commits
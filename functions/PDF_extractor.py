@@ -1,5 +1,7 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, List, Optional, Tuple
 
 import fitz  # PyMuPDF
 from bs4 import BeautifulSoup
@@ -10,6 +12,11 @@ class PDFExtractor:
     Extract full text from PDF or HTML files referenced by CSV.
     """
 
+    # PDFs with more pages than this are split into page ranges in read_many
+    PAGES_PER_TASK = 40
+    # Only files at least this large are probed for their page count
+    SPLIT_MIN_BYTES = 2 * 1024 * 1024
+
     @staticmethod
     def read_file(file_path: str) -> str:
         path = Path(file_path)
@@ -26,17 +33,123 @@ class PDFExtractor:
         else:
             return ""
 
+    @staticmethod
+    def read_many(
+        file_paths: Iterable[str],
+        workers: Optional[int] = None,
+        pages_per_task: int = PAGES_PER_TASK,
+    ) -> List[str]:
+        """
+        Extract many files in parallel with a process pool.
+
+        Large PDFs are split into page ranges so a single long document
+        does not keep one worker busy while the others sit idle.
+        Results are returned in input order and follow the read_file
+        contract: an unreadable file yields an empty string.
+        """
+        paths = [str(p) if p else "" for p in file_paths]
+        if not paths:
+            return []
+
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or (len(paths) == 1 and not PDFExtractor._is_large_pdf(paths[0])):
+            return [PDFExtractor.read_file(p) if p else "" for p in paths]
+
+        # ---- Plan tasks: (input position, part number, path, page range) ----
+        tasks: List[Tuple[int, int, str, Optional[int], Optional[int]]] = []
+        num_parts = [0] * len(paths)
+
+        for i, p in enumerate(paths):
+            if not p:
+                continue
+
+            page_count = (
+                PDFExtractor._page_count(Path(p))
+                if PDFExtractor._is_large_pdf(p)
+                else 0
+            )
+
+            if page_count > pages_per_task:
+                for part, start in enumerate(range(0, page_count, pages_per_task)):
+                    tasks.append((i, part, p, start, min(start + pages_per_task, page_count)))
+                num_parts[i] = len(range(0, page_count, pages_per_task))
+            else:
+                tasks.append((i, 0, p, None, None))
+                num_parts[i] = 1
+
+        # ---- Run ----
+        parts: List[List[Optional[str]]] = [[None] * n for n in num_parts]
+        failed = [False] * len(paths)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (i, part, pool.submit(_extract_task, p, start, stop))
+                for i, part, p, start, stop in tasks
+            ]
+            for i, part, future in futures:
+                try:
+                    text = future.result()
+                except Exception:
+                    text = None
+
+                if text is None:
+                    failed[i] = True
+                else:
+                    parts[i][part] = text
+
+        # ---- Reassemble in input order ----
+        results = []
+        for i in range(len(paths)):
+            if failed[i] or not parts[i]:
+                results.append("")
+            else:
+                results.append("\n".join(t for t in parts[i] if t))
+
+        return results
+
+    @staticmethod
+    def _is_large_pdf(file_path: str) -> bool:
+        if not file_path.lower().endswith(".pdf"):
+            return False
+        try:
+            return os.path.getsize(file_path) >= PDFExtractor.SPLIT_MIN_BYTES
+        except OSError:
+            return False
+
+    @staticmethod
+    def _page_count(path: Path) -> int:
+        try:
+            with fitz.open(path) as doc:
+                return doc.page_count
+        except Exception:
+            return 0
+
     @staticmethod
     def _read_pdf(path: Path) -> str:
+        text = PDFExtractor._read_pdf_range(path)
+        return text if text is not None else ""
+
+    @staticmethod
+    def _read_pdf_range(
+        path: Path,
+        start: Optional[int] = None,
+        stop: Optional[int] = None,
+    ) -> Optional[str]:
+        """
+        Read pages [start, stop) of a PDF. Returns None on failure so a
+        split document can be discarded as a whole.
+        """
         text_parts = []
         try:
             with fitz.open(path) as doc:
-                for page in doc:
-                    page_text = page.get_text()
+                start = 0 if start is None else start
+                stop = doc.page_count if stop is None else min(stop, doc.page_count)
+                for page_no in range(start, stop):
+                    page_text = doc[page_no].get_text()
                     if page_text:
                         text_parts.append(page_text)
         except Exception:
-            return ""
+            return None
 
         return "\n".join(text_parts)
 
@@ -52,3 +165,16 @@ class PDFExtractor:
             return soup.get_text(separator="\n").strip()
         except Exception:
             return ""
+
+
+def _extract_task(
+    file_path: str,
+    start: Optional[int],
+    stop: Optional[int],
+) -> Optional[str]:
+    """
+    Process pool entry point (must be module level to be picklable).
+    """
+    if start is None:
+        return PDFExtractor.read_file(file_path)
+    return PDFExtractor._read_pdf_range(Path(file_path), start, stop)
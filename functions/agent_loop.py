@@ -2,6 +2,8 @@ import json
 from functions.agent_state import AgentState
 from functions.reasoning_schema import ReasoningOutput
 from functions.intent_router import IntentRouter
+from functions.retrieval_batch import RetrievalBatch
+from functions.worker_pool import run_in_worker
 from collections import OrderedDict
 
 class AgenticInference:
@@ -12,6 +14,7 @@ class AgenticInference:
         context_builder,
         prompt_synthesizer,
         mcp_dispatcher,
+        answer_cache=None,
     ):
         self.llm = llm
         self.search_engine = search_engine
@@ -20,9 +23,74 @@ class AgenticInference:
         self.mcp = mcp_dispatcher
         self.router = IntentRouter(llm)
 
-    def run(self, query: str) -> str:
+        # Optional SemanticAnswerCache: repeated / rephrased questions skip the loop
+        self.answer_cache = answer_cache
 
-        intent = self.router.route(query)
+    def run(self, query: str) -> str:
+        """
+        Answer query; LLM and search calls block the calling thread.
+        """
+        if self.answer_cache is not None:
+            cached = self.answer_cache.lookup(query)
+            if cached is not None:
+                return cached
+
+        steps = self._steps(query)
+        reply = None
+        while True:
+            try:
+                kind, payload = steps.send(reply)
+            except StopIteration as done:
+                if self.answer_cache is not None:
+                    self.answer_cache.store(query, done.value)
+                return done.value
+
+            if kind == "llm":
+                reply = self.llm(payload)
+            else:
+                reply = self.mcp.dispatch(**payload)
+
+    async def run_async(self, query: str) -> str:
+        """
+        Same as run, but awaits the LLM (generate_async) and the searches
+        (dispatch_async), so one event loop can serve many queries at once.
+        """
+        if self.answer_cache is not None:
+            # Lookup may embed the query: keep it off the event loop
+            cached = await run_in_worker(self.answer_cache.lookup, query)
+            if cached is not None:
+                return cached
+
+        steps = self._steps(query)
+        reply = None
+        while True:
+            try:
+                kind, payload = steps.send(reply)
+            except StopIteration as done:
+                if self.answer_cache is not None:
+                    await run_in_worker(self.answer_cache.store, query, done.value)
+                return done.value
+
+            if kind == "llm":
+                reply = await self._llm_async(payload)
+            else:
+                reply = await self.mcp.dispatch_async(**payload)
+
+    async def _llm_async(self, prompt: str) -> str:
+        generate = getattr(self.llm, "generate_async", None)
+        if generate is not None:
+            return await generate(prompt)
+        # Plain callables (no async API) run on the worker pool
+        return await run_in_worker(self.llm, prompt)
+
+    def _steps(self, query: str):
+        """
+        The agent loop as a generator shared by run and run_async.
+
+        Yields ("llm", prompt) or ("dispatch", dispatch kwargs) and is sent
+        the LLM text / retrieval results back; returns the final answer.
+        """
+        intent = self.router.parse((yield ("llm", self.router.prompt(query))))
         print(f"=== DETECTED INTENT: {intent} ===")
 
         if intent in ["GREETING", "SELF_INFO", "GENERAL_KNOWLEDGE"]:
@@ -34,7 +102,7 @@ class AgenticInference:
             
             Please respond politely and concisely. Do NOT hallucinate retrieved papers.
             """
-            response_text = self.llm(direct_prompt)
+            response_text = yield ("llm", direct_prompt)
             
             return {
                 "answer": response_text,
@@ -52,11 +120,11 @@ class AgenticInference:
 
             # --- If no evidence yet, start with metadata search ---
             if not state.retrieval_results:
-                results = self.mcp.dispatch(
+                results = yield ("dispatch", dict(
                     action="search_metadata",
                     query=state.canonical_query,
                     k=5,
-                )
+                ))
                 state.retrieval_results = results
                 state.last_retrieval_type = "metadata"
 
@@ -64,23 +132,25 @@ class AgenticInference:
             #     state.candidate_papers = {
             #         r["paper_id"] for r in state.retrieval_results if "paper_id" in r
             #     }
+                results = state.retrieval_results
                 state.paper_metadata = {
-                    r["paper_id"]: {
-                        "title": r.get("title"),
-                        "abstract": r.get("abstract"),
-                    }
-                    for r in state.retrieval_results
-                    if r.get("paper_id")
+                    pid: {"title": title, "abstract": abstract}
+                    for pid, title, abstract in zip(
+                        results.column("paper_id"),
+                        results.column("title"),
+                        results.column("abstract"),
+                    )
+                    if pid
                 }
 
                 state.candidate_papers = set(state.paper_metadata.keys())
 
-                state.retrieval_results = self.mcp.dispatch(
+                state.retrieval_results = yield ("dispatch", dict(
                     action="search_chunks",
                     query=state.canonical_query,
                     k=10,
                     paper_ids=list(state.candidate_papers),
-                )
+                ))
                 state.last_retrieval_type = "chunks"
                 continue
 
@@ -92,10 +162,11 @@ class AgenticInference:
             print("PAPER METADATA:", state.paper_metadata)
 
             if state.last_retrieval_type == "chunks":
-                for chunk in state.retrieval_results:
-                    pid = chunk.get("paper_id")
-                    if pid in state.paper_metadata:
-                        chunk["title"] = state.paper_metadata[pid].get("title")
+                results = state.retrieval_results
+                results.set_column("title", [
+                    state.paper_metadata[pid].get("title") if pid in state.paper_metadata else title
+                    for pid, title in zip(results.column("paper_id"), results.column("title"))
+                ])
 
                 state.context_bundle = self.context_builder.build(
                     state.retrieval_results
@@ -116,7 +187,7 @@ class AgenticInference:
             )
 
             # --- LLM reasoning ---
-            raw_output = self.llm(prompt)
+            raw_output = yield ("llm", prompt)
             print("=== RAW LLM OUTPUT ===")
             print(raw_output)
             print("======================")
@@ -148,17 +219,22 @@ class AgenticInference:
 
                 paper_map = OrderedDict()
 
-                for item in state.context_bundle.get("items", []):
-                    pid = item["paper_id"]
+                items = state.context_bundle.get("items") or RetrievalBatch()
+                for pid, title, content, source_id in zip(
+                    items.column("paper_id"),
+                    items.column("title"),
+                    items.column("content"),
+                    items.column("source_id"),
+                ):
                     if pid not in paper_map:
                         paper_map[pid] = {
                             "paper_id": pid,
-                            "title": item.get("title"),
+                            "title": title,
                             "chunks": []
                         }
                     paper_map[pid]["chunks"].append({
-                        "content": item.get("content"),
-                        "source_id": item.get("source_id")
+                        "content": content,
+                        "source_id": source_id
                     })
 
                 citations = []
@@ -174,11 +250,11 @@ class AgenticInference:
 
             # --- METADATA SEARCH ---
             elif decision == "search_metadata":
-                results = self.mcp.dispatch(
+                results = yield ("dispatch", dict(
                     action="search_metadata",
                     query=state.canonical_query,
                     k=5,
-                )
+                ))
 
                 state.retrieval_results = results
 
@@ -186,9 +262,7 @@ class AgenticInference:
                 print(state.retrieval_results[:2])
                 print("=========================")
 
-                state.candidate_papers = {
-                    r["paper_id"] for r in results if "paper_id" in r
-                }
+                state.candidate_papers = set(results.column("paper_id")) - {None}
 
                 continue
 
@@ -200,12 +274,12 @@ class AgenticInference:
                     else None
                 )
 
-                state.retrieval_results = self.mcp.dispatch(
+                state.retrieval_results = yield ("dispatch", dict(
                     action="search_chunks",
                     query=state.canonical_query,
                     k=10,
                     paper_ids=paper_ids,
-                )
+                ))
 
                 continue
 
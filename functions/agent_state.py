@@ -2,6 +2,8 @@
 from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional, Set
 
+from functions.retrieval_batch import RetrievalBatch
+
 
 @dataclass
 class AgentState:
@@ -12,7 +14,7 @@ class AgentState:
     current_goal: Optional[str] = None
 
     # --- Retrieval / Perception ---
-    retrieval_results: List[Dict[str, Any]] = field(default_factory=list)
+    retrieval_results: RetrievalBatch = field(default_factory=RetrievalBatch)
     candidate_papers: Set[str] = field(default_factory=set)
     paper_metadata: Dict[str, Dict[str, Any]] = field(default_factory=dict)
 
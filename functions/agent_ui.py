@@ -1,6 +1,8 @@
 import gradio as gr
 from collections import defaultdict
 
+from config import UI_CONCURRENCY_LIMIT
+
 def launch_agent_ui(agent):
     """
     NotebookLM-style conversational UI for Gradio 6.3+.
@@ -11,7 +13,7 @@ def launch_agent_ui(agent):
     - Clean citations (no scores)
     """
 
-    def agent_chat(query, history):
+    async def agent_chat(query, history):
         """
         Input: 
             query: str
@@ -32,7 +34,8 @@ def launch_agent_ui(agent):
 
         # 3. Run Agent (Inference)
         try:
-            result = agent.run(query)
+            # Awaited on Gradio's event loop: no thread is parked per request
+            result = await agent.run_async(query)
         except Exception as e:
             # Fallback for errors
             error_msg = f"⚠️ System Error: {str(e)}"
@@ -113,6 +116,7 @@ def launch_agent_ui(agent):
             agent_chat,
             inputs=[query_box, chatbot],
             outputs=[query_box, chatbot],
+            concurrency_limit=UI_CONCURRENCY_LIMIT,
         )
         
         # 2. Bind Click Button
@@ -120,6 +124,7 @@ def launch_agent_ui(agent):
             agent_chat,
             inputs=[query_box, chatbot],
             outputs=[query_box, chatbot],
+            concurrency_limit=UI_CONCURRENCY_LIMIT,
         )
 
     return demo
\ No newline at end of file
@@ -0,0 +1,313 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+
+from config import (
+    ANSWER_CACHE_POLL_SECONDS,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+    SYNC_MANIFEST_PATH,
+)
+from functions.metadata_snapshot import source_label
+
+
+def corpus_stamp(search_engine=None, manifest_path=SYNC_MANIFEST_PATH) -> tuple:
+    """
+    Local fingerprint of what an answer depends on: the ingestion manifest
+    (mtime + size), the feature views the engine reads (name + version, or
+    local index row counts) and its metadata snapshot. Any change -> new stamp.
+    """
+    parts: list = []
+
+    manifest = Path(manifest_path)
+    if manifest.exists():
+        st = manifest.stat()
+        parts.append(("manifest", st.st_mtime_ns, st.st_size))
+
+    if search_engine is not None:
+        for fv in (search_engine.metadata_fv, search_engine.chunk_fv):
+            # Local indexes grow in place, and an upsert (re-embedded paper)
+            # appends rows even when the live count stays the same
+            size = len(fv) if hasattr(fv, "__len__") else None
+            parts.append((source_label(fv), size, getattr(fv, "count", None)))
+
+        snapshot = getattr(search_engine, "metadata_snapshot", None)
+        if snapshot is not None:
+            parts.append(("snapshot", snapshot.stamp.get("content_hash")))
+
+    return tuple(parts)
+
+
+def feature_view_commits(feature_view) -> Optional[tuple]:
+    """
+    Latest commit id of each Feature Group behind a Hopsworks Feature View,
+    i.e. a live signal that data was written from any machine.
+    None for local indexes or when the backend cannot tell.
+    """
+    get_parents = getattr(feature_view, "get_parent_feature_groups", None)
+    if get_parents is None:
+        return None
+    try:
+        commits = []
+        for fg in get_parents().accessible:
+            details = fg.commit_details(limit=1) or {}
+            commits.append((fg.name, fg.version, max(details, default=None)))
+        return tuple(commits)
+    except Exception as e:
+        print(f"[answer-cache] cannot read commits of {source_label(feature_view)}: {e}")
+        return None
+
+
+class CorpusStamp:
+    """
+    stamp_fn for an engine: corpus_stamp() plus the Feature Group commits.
+
+    corpus_stamp() only sees local state, which misses ingest runs on other
+    machines. The commits cost a Hopsworks round-trip, so a daemon thread
+    polls them every poll_seconds and requests only read the last value
+    (answers may be stale for up to poll_seconds).
+    """
+
+    def __init__(
+        self,
+        search_engine=None,
+        manifest_path=SYNC_MANIFEST_PATH,
+        poll_seconds: Optional[float] = ANSWER_CACHE_POLL_SECONDS,
+    ):
+        self.search_engine = search_engine
+        self.manifest_path = manifest_path
+        self.poll_seconds = poll_seconds
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._commits: Optional[tuple] = None
+        self.refresh()
+
+        live = search_engine is not None and any(
+            hasattr(fv, "get_parent_feature_groups")
+            for fv in (search_engine.metadata_fv, search_engine.chunk_fv)
+        )
+        if live and poll_seconds:
+            self._thread = threading.Thread(
+                target=self._poll_loop, name="answer-cache-stamp", daemon=True
+            )
+            self._thread.start()
+
+    def refresh(self) -> None:
+        """
+        Poll the Feature Group commits now.
+        """
+        if self.search_engine is None:
+            return
+        # Single attribute swap: readers see the old or the new tuple
+        self._commits = tuple(
+            feature_view_commits(fv)
+            for fv in (self.search_engine.metadata_fv, self.search_engine.chunk_fv)
+        )
+
+    def _poll_loop(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            self.refresh()
+
+    def close(self) -> None:
+        self._stop.set()
+
+    def commits(self) -> Optional[tuple]:
+        return self._commits
+
+    def __call__(self) -> tuple:
+        return corpus_stamp(self.search_engine, self.manifest_path) + (("commits", self._commits),)
+
+
+class _Entry:
+    __slots__ = ("query", "vector", "result", "created_at")
+
+    def __init__(self, query: str, vector: np.ndarray, result: Any, created_at: float):
+        self.query = query
+        self.vector = vector
+        self.result = result
+        self.created_at = created_at
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache in front of AgenticInference.run, keyed by query meaning.
+
+    A query hits when its embedding has cosine similarity >= threshold with
+    a cached query (exact repeats skip the embedding). Hits return a copy of
+    the stored answer + citations, skipping routing, both searches, the
+    rerank and generation.
+
+    - LRU: at most `capacity` entries, least recently used evicted first
+    - TTL: entries older than ttl_seconds are never served
+    - Invalidation: all entries are dropped when stamp_fn() changes
+      (Feature Group commits, ingestion manifest, metadata snapshot)
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], np.ndarray],
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        capacity: int = ANSWER_CACHE_SIZE,
+        ttl_seconds: Optional[float] = ANSWER_CACHE_TTL_SECONDS,
+        stamp_fn: Callable[[], Hashable] = corpus_stamp,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self.stamp_fn = stamp_fn
+        self.clock = clock
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._stamp: Hashable = None
+        # (keys, matrix of normalized query vectors), rebuilt after writes
+        self._matrix = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @classmethod
+    def for_engine(cls, search_engine, **kwargs) -> "SemanticAnswerCache":
+        """
+        Cache sharing the engine's query embeddings (and its query LRU).
+        """
+        embed_fn = getattr(search_engine, "_embed_query", None) or search_engine.embedding_model.encode
+        return cls(embed_fn, stamp_fn=CorpusStamp(search_engine), **kwargs)
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def _vector(self, query: str) -> Optional[np.ndarray]:
+        vector = np.asarray(self.embed_fn(query), dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    # ------------------------------------------------------------
+    # Housekeeping (callers hold the lock)
+    # ------------------------------------------------------------
+
+    def _check_stamp(self, stamp: Hashable) -> None:
+        if stamp != self._stamp:
+            if self._entries:
+                self.invalidations += 1
+                print(f"[answer-cache] corpus changed, dropped {len(self._entries)} answers")
+            self._entries.clear()
+            self._matrix = None
+            self._stamp = stamp
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return self.ttl_seconds is not None and now - entry.created_at > self.ttl_seconds
+
+    def _drop(self, key: str) -> None:
+        self._entries.pop(key, None)
+        self._matrix = None
+
+    def _nearest(self, vector: np.ndarray):
+        if not self._entries:
+            return None, -1.0
+        if self._matrix is None:
+            keys = list(self._entries)
+            self._matrix = (keys, np.vstack([self._entries[k].vector for k in keys]))
+        keys, matrix = self._matrix
+        if matrix.shape[1] != vector.shape[0]:
+            return None, -1.0
+        sims = matrix @ vector
+        best = int(np.argmax(sims))
+        return keys[best], float(sims[best])
+
+    # ------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------
+
+    def lookup(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Cached result for query (or a paraphrase of it), else None.
+        """
+        key = self._key(query)
+        # Outside the lock: the stamp may poll the Feature Store
+        stamp = self.stamp_fn()
+        with self._lock:
+            self._check_stamp(stamp)
+            entry = self._entries.get(key)
+
+        similarity = 1.0
+        if entry is None:
+            # Embedding outside the lock (may run the model on a cold query)
+            vector = self._vector(query)
+            if vector is not None:
+                with self._lock:
+                    key, similarity = self._nearest(vector)
+                    if key is not None and similarity >= self.threshold:
+                        entry = self._entries.get(key)
+
+        with self._lock:
+            if entry is not None and self._expired(entry, self.clock()):
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+
+        print(f"[answer-cache] hit (similarity {similarity:.3f}): {entry.query!r}")
+        # Callers may mutate the result (e.g. UI formatting)
+        return copy.deepcopy(entry.result)
+
+    def store(self, query: str, result: Any) -> bool:
+        """
+        Cache a final agent result; only answered queries are kept
+        (no abstentions, errors or terminated runs).
+        """
+        if not isinstance(result, dict) or not result.get("answer"):
+            return False
+        vector = self._vector(query)
+        if vector is None:
+            return False
+
+        key = self._key(query)
+        stamp = self.stamp_fn()
+        with self._lock:
+            self._check_stamp(stamp)
+            now = self.clock()
+            self._entries[key] = _Entry(query, vector, copy.deepcopy(result), now)
+            self._entries.move_to_end(key)
+
+            # Expired entries go first, then least recently used
+            for old in [k for k, e in self._entries.items() if self._expired(e, now)]:
+                self._entries.pop(old)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+            self._matrix = None
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "invalidations": self.invalidations,
+        }
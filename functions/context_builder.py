@@ -1,6 +1,8 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 import re
 
+from functions.retrieval_batch import RetrievalBatch
+
 
 class ContextBuilder:
     """
@@ -36,24 +38,31 @@ class ContextBuilder:
 
     def build(
         self,
-        retrieved_chunks: List[Dict[str, Any]],
+        retrieved_chunks: Union[RetrievalBatch, List[Dict[str, Any]]],
     ) -> Dict[str, Any]:
+        """
+        retrieved_chunks: a RetrievalBatch (or list of dicts) with at least
+        paper_id and content. "items" is a RetrievalBatch with columns
+        source_id, paper_id, title, content, score.
+        """
+        chunks = RetrievalBatch.from_records(retrieved_chunks).sort_by("score")
 
-        sorted_chunks = sorted(
-                    retrieved_chunks,
-                    key=lambda x: x.get("score") if x.get("score") is not None else float("inf"),
-                )
+        paper_ids = chunks.column("paper_id")
+        chunk_indices = chunks.column("chunk_index")
+        titles = chunks.column("title")
+        contents = chunks.column("content", "")
+        scores = chunks.column("score")
 
-        items = []
+        picked = []
+        normalized = []
         seen = set()
         token_count = 0
 
-        for chunk in sorted_chunks:
-            key = (chunk["paper_id"], chunk.get("chunk_index"))
+        for i, key in enumerate(zip(paper_ids, chunk_indices)):
             if key in seen:
                 continue
 
-            content = self._normalize_text(chunk.get("content", ""))
+            content = self._normalize_text(contents[i] or "")
 
             if not content:
                 continue
@@ -63,31 +72,33 @@ class ContextBuilder:
             if token_count + tokens > self.max_tokens:
                 break
 
-            items.append(
-                {
-                    "source_id": f"{chunk['paper_id']}#chunk-{chunk.get('chunk_index')}",
-                    "paper_id": chunk["paper_id"],
-                    "title": chunk.get("title"), 
-                    "content": content,
-                    "score": chunk.get("score"),
-                }
-            )
-
+            picked.append(i)
+            normalized.append(content)
             seen.add(key)
             token_count += tokens
 
-            if len(items) >= self.max_chunks:
+            if len(picked) >= self.max_chunks:
                 break
 
+        items = RetrievalBatch(
+            {
+                "source_id": [f"{paper_ids[i]}#chunk-{chunk_indices[i]}" for i in picked],
+                "paper_id": [paper_ids[i] for i in picked],
+                "title": [titles[i] for i in picked],
+                "content": normalized,
+                "score": [scores[i] for i in picked],
+            },
+            n=len(picked),
+        )
+
         return {
             "items": items,
             "stats": {
                 "num_items": len(items),
-                "unique_papers": len({i["paper_id"] for i in items}),
+                "unique_papers": len(set(items["paper_id"])),
             },
             "token_usage": {
                 "estimated_tokens": token_count,
                 "max_tokens": self.max_tokens,
             },
         }
-
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by (model name, normalized text hash).
+
+    Layout under <cache_dir>/<model name>/:
+    - vectors.bin : row-major float32/float16 matrix, memory-mapped for reads
+    - keys.bin    : 20-byte SHA-1 digest per row (the index file)
+    - meta.json   : model name, dimension, dtype
+
+    Both files are append-only. A row only counts once its key is written,
+    so an interrupted run never exposes a half-written vector.
+    """
+
+    KEY_BYTES = 20
+
+    def __init__(
+        self,
+        cache_dir: str,
+        model_name: str,
+        dim: int,
+        dtype: str = "float32",
+    ):
+        if dtype not in {"float32", "float16"}:
+            raise ValueError(f"Unsupported cache dtype: {dtype}")
+
+        self.model_name = model_name
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+
+        self.root = Path(cache_dir) / _slug(model_name)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.root / "vectors.bin"
+        self._keys_path = self.root / "keys.bin"
+
+        self._check_meta()
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        self._matrix = None
+        self._load()
+
+    # ------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------
+
+    def _check_meta(self) -> None:
+        meta_path = self.root / "meta.json"
+        meta = {"model_name": self.model_name, "dim": self.dim, "dtype": self.dtype.name}
+
+        if meta_path.exists():
+            stored = json.loads(meta_path.read_text())
+            if stored != meta:
+                raise ValueError(
+                    f"Embedding cache at {self.root} was built with {stored}, "
+                    f"not {meta}. Use another cache_dir or delete it."
+                )
+        else:
+            meta_path.write_text(json.dumps(meta))
+
+    def _load(self) -> None:
+        row_bytes = self.dim * self.dtype.itemsize
+
+        keys = self._keys_path.read_bytes() if self._keys_path.exists() else b""
+        n_keys = len(keys) // self.KEY_BYTES
+        n_vectors = (
+            self._vectors_path.stat().st_size // row_bytes
+            if self._vectors_path.exists()
+            else 0
+        )
+        n = min(n_keys, n_vectors)
+
+        # Drop any torn tail left by an interrupted append
+        if n_keys != n:
+            with open(self._keys_path, "r+b") as f:
+                f.truncate(n * self.KEY_BYTES)
+        if n_vectors != n:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(n * row_bytes)
+
+        self._index = {
+            keys[i * self.KEY_BYTES : (i + 1) * self.KEY_BYTES]: i for i in range(n)
+        }
+        self._remap(n)
+
+    def _remap(self, n: int) -> None:
+        if n == 0:
+            self._matrix = np.empty((0, self.dim), dtype=self.dtype)
+        else:
+            self._matrix = np.memmap(
+                self._vectors_path, dtype=self.dtype, mode="r", shape=(n, self.dim)
+            )
+
+    def _append(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        with open(self._vectors_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=self.dtype).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self._keys_path, "ab") as f:
+            f.write(b"".join(keys))
+
+        start = len(self._index)
+        for offset, key in enumerate(keys):
+            self._index[key] = start + offset
+        self._remap(len(self._index))
+
+    # ------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def text_key(text: str) -> bytes:
+        normalized = " ".join((text or "").split())
+        return hashlib.sha1(normalized.encode("utf-8")).digest()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def encode(self, model, texts: Sequence[str], **encode_kwargs) -> np.ndarray:
+        """
+        Drop-in for model.encode(texts): only texts never seen before
+        (for this model) are sent to the model. Returns float32 (n, dim).
+        """
+        texts = list(texts)
+        keys = [self.text_key(t) for t in texts]
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+
+        with self._lock:
+            missing: Dict[bytes, List[int]] = {}
+            for i, key in enumerate(keys):
+                row = self._index.get(key)
+                if row is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    out[i] = self._matrix[row]
+
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+            if missing:
+                new_keys = list(missing)
+                new_texts = [texts[missing[k][0]] for k in new_keys]
+
+                encode_kwargs.setdefault("convert_to_numpy", True)
+                vectors = np.asarray(
+                    model.encode(new_texts, **encode_kwargs), dtype=np.float32
+                ).reshape(len(new_texts), self.dim)
+
+                self._append(new_keys, vectors)
+
+                for key, vec in zip(new_keys, vectors):
+                    out[missing[key]] = vec
+
+        return out
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._index),
+        }
+
+    def report(self, label: str = "Embedding cache") -> None:
+        s = self.stats()
+        print(
+            f"{label}: {s['hits']} hits, {s['misses']} misses "
+            f"({s['hit_rate']:.1%} hit rate), {s['entries']} cached vectors."
+        )
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name)
@@ -0,0 +1,189 @@
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Sequence, Union
+
+import numpy as np
+
+
+class EmbeddingService:
+    """
+    Length-bucketed, dynamically batched wrapper around a SentenceTransformer.
+
+    - encode(texts): sorts inputs by token length, packs them into batches
+      under a padded-token budget, and restores the original order
+    - encode_query(text): coalesces concurrent single-query calls (e.g. from
+      several agent requests) into one model call
+
+    Exposes .encode so it can be used anywhere the raw model was used.
+    """
+
+    def __init__(
+        self,
+        model,
+        max_batch_tokens: int = 16384,
+        max_batch_size: int = 128,
+        max_wait_ms: float = 5.0,
+        length_fn: Optional[Callable[[List[str]], List[int]]] = None,
+    ):
+        self.model = model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.length_fn = length_fn or self._token_lengths
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    # ------------------------------------------------------------
+    # Model passthrough
+    # ------------------------------------------------------------
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    @property
+    def max_seq_length(self) -> Optional[int]:
+        return getattr(self.model, "max_seq_length", None)
+
+    # ------------------------------------------------------------
+    # Length estimation
+    # ------------------------------------------------------------
+
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        """
+        Token counts via the model's (fast) tokenizer, capped at
+        max_seq_length. Falls back to a ~4 chars/token estimate.
+        """
+        cap = self.max_seq_length or 512
+        tokenizer = getattr(self.model, "tokenizer", None)
+
+        if tokenizer is not None:
+            try:
+                ids = tokenizer(
+                    texts,
+                    add_special_tokens=True,
+                    truncation=True,
+                    max_length=cap,
+                )["input_ids"]
+                return [len(x) for x in ids]
+            except Exception:
+                pass
+
+        return [min(cap, len(t) // 4 + 2) for t in texts]
+
+    # ------------------------------------------------------------
+    # Batch encoding
+    # ------------------------------------------------------------
+
+    def plan_batches(self, lengths: Sequence[int]) -> List[List[int]]:
+        """
+        Group input positions into batches of similar length.
+        Cost of a batch = longest member * batch size (padding included).
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+
+        batches: List[List[int]] = []
+        current: List[int] = []
+        longest = 0
+
+        for i in order:
+            length = max(1, lengths[i])
+            longest_if_added = max(longest, length)
+            if current and (
+                len(current) >= self.max_batch_size
+                or longest_if_added * (len(current) + 1) > self.max_batch_tokens
+            ):
+                batches.append(current)
+                current, longest_if_added = [], length
+            current.append(i)
+            longest = longest_if_added
+
+        if current:
+            batches.append(current)
+
+        return batches
+
+    def encode(
+        self,
+        texts: Union[str, Sequence[str]],
+        **encode_kwargs,
+    ) -> np.ndarray:
+        if isinstance(texts, str):
+            return self.encode([texts], **encode_kwargs)[0]
+
+        texts = list(texts)
+        if not texts:
+            dim = self.get_sentence_embedding_dimension()
+            return np.empty((0, dim), dtype=np.float32)
+
+        # Batching is decided here; a per-call progress bar would be noise
+        encode_kwargs.pop("batch_size", None)
+        encode_kwargs.pop("show_progress_bar", None)
+        encode_kwargs["convert_to_numpy"] = True
+
+        out: Optional[np.ndarray] = None
+
+        for batch in self.plan_batches(self.length_fn(texts)):
+            vectors = np.asarray(
+                self.model.encode(
+                    [texts[i] for i in batch],
+                    batch_size=len(batch),
+                    **encode_kwargs,
+                ),
+                dtype=np.float32,
+            )
+            if out is None:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[batch] = vectors
+
+        return out
+
+    # ------------------------------------------------------------
+    # Coalesced single-query encoding
+    # ------------------------------------------------------------
+
+    def encode_query(self, text: str) -> np.ndarray:
+        """
+        Blocking single-query encode. Concurrent callers arriving within
+        max_wait_ms of each other share one model call.
+        """
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._serve_queries,
+                    name="embedding-service",
+                    daemon=True,
+                )
+                self._worker.start()
+
+    def _serve_queries(self) -> None:
+        while True:
+            pending = [self._queue.get()]
+
+            # Collect whatever else arrives within the wait window
+            try:
+                while len(pending) < self.max_batch_size:
+                    pending.append(self._queue.get(timeout=self.max_wait_ms / 1000.0))
+            except queue.Empty:
+                pass
+
+            texts = [text for text, _ in pending]
+            try:
+                vectors = self.encode(texts)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), vec in zip(pending, vectors):
+                future.set_result(vec)
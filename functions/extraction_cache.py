@@ -0,0 +1,218 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from functions.PDF_extractor import PDFExtractor
+from functions.test_and_file_processor import clean_text
+
+
+class ExtractionCache:
+    """
+    Persistent, content-addressed cache of cleaned full text.
+
+    - Keyed by resolved path + size + mtime (optionally + SHA-256 of the bytes)
+    - Stores zlib-compressed text in a single SQLite file
+    - Size-bounded with least-recently-used eviction
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = 2 * 1024 ** 3,
+        hash_content: bool = False,
+        compress_level: int = 6,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hash_content = hash_content
+        self.compress_level = compress_level
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.cache_dir / "extraction_cache.sqlite",
+            check_same_thread=False,
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                nbytes INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                payload BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_access ON entries(last_access)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_path ON entries(path)")
+        self._conn.commit()
+
+    # ------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------
+
+    def cache_key(self, file_path: str) -> Optional[str]:
+        """
+        Returns None when the file cannot be stat'ed (nothing to cache).
+        """
+        try:
+            path = Path(file_path).resolve()
+            st = path.stat()
+        except OSError:
+            return None
+
+        parts = [str(path), str(st.st_size), str(st.st_mtime_ns)]
+        if self.hash_content:
+            parts.append(_file_sha256(path))
+
+        return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------------------
+    # Get / Put
+    # ------------------------------------------------------------
+
+    def get(self, file_path: str) -> Optional[str]:
+        key = self.cache_key(file_path)
+        if key is None:
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE entries SET last_access = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self._conn.commit()
+            self.hits += 1
+
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, file_path: str, text: str) -> None:
+        key = self.cache_key(file_path)
+        if key is None:
+            return
+
+        path = str(Path(file_path).resolve())
+        payload = zlib.compress((text or "").encode("utf-8"), self.compress_level)
+
+        with self._lock:
+            # A file has one live version: drop entries for older size/mtime
+            self._conn.execute(
+                "DELETE FROM entries WHERE path = ? AND key != ?", (path, key)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (key, path, len(payload), time.time(), payload),
+            )
+            self._evict()
+            self._conn.commit()
+
+    # ------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------
+
+    def _evict(self) -> None:
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(nbytes), 0) FROM entries"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        cursor = self._conn.execute(
+            "SELECT key, nbytes FROM entries ORDER BY last_access ASC"
+        )
+        stale = []
+        for key, nbytes in cursor:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= nbytes
+
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(nbytes), 0) FROM entries"
+            ).fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def _file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_clean_fulltexts(
+    file_paths: Iterable[str],
+    cache: Optional[ExtractionCache] = None,
+    workers: Optional[int] = None,
+) -> List[str]:
+    """
+    Extract + clean many attachments, serving unchanged files from cache.
+
+    Only cache misses go through PDFExtractor.read_many; their cleaned
+    text is written back so the next run can skip them.
+    """
+    paths = [str(p) if p else "" for p in file_paths]
+    results: List[str] = [""] * len(paths)
+
+    missing = []
+    for i, p in enumerate(paths):
+        if not p:
+            continue
+        cached = cache.get(p) if cache is not None else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            missing.append(i)
+
+    if not missing:
+        return results
+
+    raw_texts = PDFExtractor.read_many([paths[i] for i in missing], workers=workers)
+
+    for i, raw in zip(missing, raw_texts):
+        text = clean_text(raw)
+        results[i] = text
+        if cache is not None and os.path.exists(paths[i]):
+            cache.put(paths[i], text)
+
+    return results
@@ -0,0 +1,450 @@
+"""
+Feature pipeline CLI (backfill + incremental update).
+
+    python -m functions.feature_pipeline --mode backfill
+    python -m functions.feature_pipeline --mode incremental --csv PCG_latest.csv
+
+Extraction, chunking and embedding run as concurrent stages connected by
+bounded queues, so PDFs of the next batch are parsed while the current
+batch is being embedded or uploaded.
+"""
+
+import argparse
+import queue
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import config
+from functions.extraction_cache import ExtractionCache, read_clean_fulltexts
+from functions.staged_backfill import StagedBackfill, build_feature_frames
+from functions.test_and_file_processor import batched
+from functions.zotero_parser import ZoteroCSVParser
+
+
+# -------- Stage plumbing --------
+
+_DONE = object()
+
+
+class _StageFailure:
+    def __init__(self, stage: str, error: BaseException):
+        self.stage = stage
+        self.error = error
+
+
+def _put(q: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """
+    Blocking put that gives up once the pipeline is stopping.
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.2)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _source_stage(
+    items: Iterable[Any],
+    outbox: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    try:
+        for item in items:
+            if not _put(outbox, item, stop):
+                return
+        _put(outbox, _DONE, stop)
+    except BaseException as e:
+        _put(outbox, _StageFailure("parse", e), stop)
+
+
+def _worker_stage(
+    name: str,
+    fn: Callable[[Any], Any],
+    inbox: queue.Queue,
+    outbox: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    while not stop.is_set():
+        try:
+            item = inbox.get(timeout=0.2)
+        except queue.Empty:
+            continue
+
+        if item is _DONE or isinstance(item, _StageFailure):
+            _put(outbox, item, stop)
+            return
+
+        try:
+            result = fn(item)
+        except BaseException as e:
+            _put(outbox, _StageFailure(name, e), stop)
+            return
+
+        if not _put(outbox, result, stop):
+            return
+
+
+# -------- Pipeline --------
+
+class FeaturePipeline:
+    """
+    parse -> extract -> chunk -> embed -> upload, one thread per stage.
+    Queues hold at most `queue_size` paper batches, which bounds memory.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[List[str]], np.ndarray],
+        extraction_cache: Optional[ExtractionCache] = None,
+        extract_workers: int = config.EXTRACT_WORKERS,
+        queue_size: int = 2,
+    ):
+        self.embed_fn = embed_fn
+        self.extraction_cache = extraction_cache
+        self.extract_workers = extract_workers
+        self.queue_size = queue_size
+        self.timings: Counter = Counter()
+
+    def _timed(self, name: str, fn: Callable[[Any], Any]) -> Callable[[Any], Any]:
+        def wrapper(item):
+            start = time.perf_counter()
+            try:
+                return fn(item)
+            finally:
+                self.timings[name] += time.perf_counter() - start
+        return wrapper
+
+    # ---- Stage bodies ----
+
+    def extract(self, papers: List[Dict[str, Any]]) -> pd.DataFrame:
+        df = pd.DataFrame(papers)
+        paths = [urllib.parse.unquote(p) if p else "" for p in df["file_attachments"]]
+        df["full_text"] = read_clean_fulltexts(
+            paths,
+            cache=self.extraction_cache,
+            workers=self.extract_workers,
+        )
+        return df
+
+    @staticmethod
+    def chunk(papers: pd.DataFrame):
+        return build_feature_frames(papers)
+
+    def embed(self, frames):
+        for df, col in zip(frames, ("combined_text", "content")):
+            if df.empty:
+                df["embedding"] = []
+            else:
+                vectors = np.asarray(
+                    self.embed_fn(df[col].fillna("").tolist()), dtype=np.float32
+                )
+                df["embedding"] = [v.tolist() for v in vectors]
+        return frames
+
+    # ---- Driver ----
+
+    def run(
+        self,
+        paper_batches: Iterable[List[Dict[str, Any]]],
+        sink: Callable[[pd.DataFrame, pd.DataFrame], None],
+    ) -> None:
+        stop = threading.Event()
+        q_parsed, q_extracted, q_chunked, q_embedded = (
+            queue.Queue(maxsize=self.queue_size) for _ in range(4)
+        )
+
+        threads = [
+            threading.Thread(
+                target=_source_stage,
+                args=(paper_batches, q_parsed, stop),
+                name="parse",
+                daemon=True,
+            ),
+        ]
+        for name, fn, inbox, outbox in (
+            ("extract", self.extract, q_parsed, q_extracted),
+            ("chunk", self.chunk, q_extracted, q_chunked),
+            ("embed", self.embed, q_chunked, q_embedded),
+        ):
+            threads.append(
+                threading.Thread(
+                    target=_worker_stage,
+                    args=(name, self._timed(name, fn), inbox, outbox, stop),
+                    name=name,
+                    daemon=True,
+                )
+            )
+
+        for t in threads:
+            t.start()
+
+        try:
+            while True:
+                item = q_embedded.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _StageFailure):
+                    raise RuntimeError(f"Stage '{item.stage}' failed") from item.error
+
+                start = time.perf_counter()
+                sink(*item)
+                self.timings["upload"] += time.perf_counter() - start
+        finally:
+            stop.set()
+            for t in threads:
+                t.join(timeout=5)
+
+    def report(self) -> None:
+        print("Busy time per stage (stages overlap):")
+        for name in ("extract", "chunk", "embed", "upload"):
+            print(f"  {name:<8} {self.timings[name]:8.1f}s")
+
+
+# -------- Hopsworks --------
+
+def _get_feature_groups(args):
+    """
+    Existing Feature Groups only: they are created (with their embedding
+    index) by 1_feature_backfill.ipynb, and a typo in a name or version
+    must fail here instead of silently creating an empty group.
+    """
+    import hopsworks
+
+    project = hopsworks.login(api_key_value=config.HOPSWORKS_API_KEY)
+    fs = project.get_feature_store()
+
+    def get(name, version):
+        fg = fs.get_feature_group(name, version=version)
+        if fg is None:
+            raise RuntimeError(
+                f"Feature Group {name} v{version} not found; "
+                "create it with 1_feature_backfill.ipynb or check --metadata-fg / --chunk-fg."
+            )
+        return fg
+
+    metadata_fg = get(args.metadata_fg, args.metadata_fg_version)
+    chunk_fg = get(args.chunk_fg, args.chunk_fg_version)
+    return metadata_fg, chunk_fg
+
+
+# -------- CLI --------
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(
+        prog="python -m functions.feature_pipeline",
+        description="Zotero CSV -> chunks + embeddings -> Hopsworks Feature Groups.",
+    )
+    p.add_argument("--mode", choices=("backfill", "incremental"), default="backfill")
+    p.add_argument("--csv", default=str(config.CSV_PATH), help="Zotero CSV export")
+
+    p.add_argument("--extract-workers", type=int, default=config.EXTRACT_WORKERS)
+    p.add_argument("--paper-batch-size", type=int, default=64,
+                   help="papers per pipeline batch")
+    p.add_argument("--queue-size", type=int, default=2,
+                   help="max batches buffered between two stages")
+    p.add_argument("--embed-batch-tokens", type=int, default=config.EMBED_MAX_BATCH_TOKENS)
+    p.add_argument("--embed-batch-size", type=int, default=config.EMBED_MAX_BATCH_SIZE)
+
+    p.add_argument("--no-cache", action="store_true",
+                   help="bypass the extraction and embedding caches")
+    p.add_argument("--resumable", action="store_true",
+                   help="backfill only: use checkpointed stages (StagedBackfill)")
+    p.add_argument("--dry-run", action="store_true",
+                   help="run everything except the Feature Store upload")
+    p.add_argument("--local-index", action="store_true",
+                   help="also update the local indexes under LOCAL_INDEX_DIR in place")
+
+    p.add_argument("--metadata-fg", default=config.META_FG_NAME)
+    p.add_argument("--metadata-fg-version", type=int, default=config.META_FG_VERSION)
+    p.add_argument("--chunk-fg", default=config.FULLTEXT_FG_NAME)
+    p.add_argument("--chunk-fg-version", type=int, default=config.FULLTEXT_FG_VERSION)
+    return p
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = build_arg_parser().parse_args(argv)
+
+    from sentence_transformers import SentenceTransformer
+
+    from functions.embedding_cache import EmbeddingCache
+    from functions.embedding_service import EmbeddingService
+
+    # ---- Models / caches ----
+    model = SentenceTransformer(config.EMBEDDING_MODEL_NAME)
+    embedding_dim = model.get_sentence_embedding_dimension()
+    embedder = EmbeddingService(
+        model,
+        max_batch_tokens=args.embed_batch_tokens,
+        max_batch_size=args.embed_batch_size,
+    )
+
+    if args.no_cache:
+        extraction_cache = None
+        embed_fn = embedder.encode
+    else:
+        extraction_cache = ExtractionCache(
+            config.EXTRACTION_CACHE_DIR,
+            max_bytes=config.EXTRACTION_CACHE_MAX_BYTES,
+        )
+        embedding_cache = EmbeddingCache(
+            config.EMBEDDING_CACHE_DIR,
+            model_name=config.EMBEDDING_MODEL_NAME,
+            dim=embedding_dim,
+            dtype=config.EMBEDDING_CACHE_DTYPE,
+        )
+        embed_fn = lambda texts: embedding_cache.encode(embedder, texts)
+
+    metadata_fg = chunk_fg = None
+    if not args.dry_run:
+        metadata_fg, chunk_fg = _get_feature_groups(args)
+
+    # ---- Resumable backfill ----
+    if args.mode == "backfill" and args.resumable:
+        StagedBackfill(
+            args.csv,
+            config.BACKFILL_WORK_DIR,
+            embed_fn=embed_fn,
+            metadata_fg=metadata_fg,
+            chunk_fg=chunk_fg,
+            partition_size=config.BACKFILL_PARTITION_SIZE,
+            extract_workers=args.extract_workers,
+            extraction_cache=extraction_cache,
+            manifest_path=None if args.dry_run else config.SYNC_MANIFEST_PATH,
+        ).run(stop_after="embed" if args.dry_run else "upload")
+        return
+
+    # ---- Select papers ----
+    parser = ZoteroCSVParser(args.csv)
+    sync = changes = None
+    # Backfill: every paper that went through, for the sync manifest
+    backfilled: List[Dict[str, Any]] = []
+
+    if args.mode == "incremental":
+        from functions.incremental_sync import IncrementalSync
+
+        papers = [p for batch in parser.iter_batches() for p in batch]
+        sync = IncrementalSync(config.SYNC_MANIFEST_PATH)
+        changes = sync.diff(papers)
+        print(f"Change detection: {changes.summary()}")
+
+        to_process = set(changes.to_process)
+        paper_batches = batched(
+            (p for p in papers if p["paper_id"] in to_process),
+            args.paper_batch_size,
+        )
+    else:
+        def record(batch):
+            backfilled.extend(batch)
+            return batch
+
+        paper_batches = (
+            record(small)
+            for batch in parser.iter_batches()
+            for small in batched(batch, args.paper_batch_size)
+        )
+
+    # ---- Run ----
+    write_options = {"start_offline_materialization": False}
+    if args.mode == "incremental":
+        write_options["upsert"] = True
+
+    totals = Counter()
+    chunk_counts: Dict[str, int] = {}
+
+    local_meta = local_chunks = bm25 = None
+    if args.local_index:
+        from functions.vector_index import open_index
+
+        local_meta = open_index(config.LOCAL_INDEX_DIR / "metadata")
+        local_chunks = open_index(config.LOCAL_INDEX_DIR / "chunks")
+
+    # An existing BM25 index is kept in step with every upload (not just
+    # --local-index runs); other ingest paths leave it stale, and
+    # BM25Index.open_or_build rebuilds it from the Feature View
+    if not args.dry_run and (config.BM25_INDEX_DIR / "meta.json").exists():
+        from functions.incremental_sync import manifest_signature
+        from functions.sparse_index import BM25Index
+
+        bm25 = BM25Index(config.BM25_INDEX_DIR, k1=config.BM25_K1, b=config.BM25_B)
+        if bm25.source != manifest_signature(config.SYNC_MANIFEST_PATH):
+            print("BM25 index is already stale: left for open_or_build to rebuild.")
+            bm25 = None
+
+    def sink(df_meta: pd.DataFrame, df_chunks: pd.DataFrame) -> None:
+        if metadata_fg is not None and not df_meta.empty:
+            metadata_fg.insert(df_meta, write_options=write_options)
+        if chunk_fg is not None and not df_chunks.empty:
+            chunk_fg.insert(df_chunks, write_options=write_options)
+
+        if local_meta is not None:
+            # In-place update: tombstone old rows of these papers, append new ones
+            local_meta.upsert_papers(df_meta)
+            local_chunks.delete_papers(df_meta["paper_id"])
+            local_chunks.add(df_chunks)
+
+        if bm25 is not None:
+            bm25.delete_papers(df_meta["paper_id"])
+            bm25.add(df_chunks)
+
+        for pid in df_meta["paper_id"]:
+            chunk_counts[pid] = 0
+        chunk_counts.update(df_chunks["paper_id"].value_counts().to_dict())
+
+        totals["papers"] += len(df_meta)
+        totals["chunks"] += len(df_chunks)
+        print(f"Processed {totals['papers']} papers / {totals['chunks']} chunks...")
+
+    pipeline = FeaturePipeline(
+        embed_fn=embed_fn,
+        extraction_cache=extraction_cache,
+        extract_workers=args.extract_workers,
+        queue_size=args.queue_size,
+    )
+    start = time.perf_counter()
+    pipeline.run(paper_batches, sink)
+    print(f"Done: {totals['papers']} papers, {totals['chunks']} chunks "
+          f"in {time.perf_counter() - start:.1f}s.")
+    pipeline.report()
+
+    if local_meta is not None and changes is not None:
+        local_meta.delete_papers(changes.deleted)
+        local_chunks.delete_papers(changes.deleted)
+    if bm25 is not None and changes is not None:
+        bm25.delete_papers(changes.deleted)
+
+    if args.dry_run:
+        return
+
+    # ---- Finalize ----
+    if sync is not None:
+        from functions.incremental_sync import delete_chunk_records, delete_paper_records
+
+        stale = sync.stale_chunk_keys(changes, chunk_counts)
+        print(f"Deleted {delete_chunk_records(chunk_fg, stale)} stale chunks.")
+        print(f"Deleted {delete_paper_records(metadata_fg, changes.deleted)} removed papers.")
+        sync.commit(changes, chunk_counts)
+    else:
+        from functions.incremental_sync import IncrementalSync
+
+        IncrementalSync(config.SYNC_MANIFEST_PATH).record_backfill(backfilled, chunk_counts)
+
+    if bm25 is not None:
+        # Matches the manifest just written: the index is current
+        bm25.source = manifest_signature(config.SYNC_MANIFEST_PATH)
+        bm25.save()
+
+    if totals["papers"]:
+        for fg in (metadata_fg, chunk_fg):
+            fg.materialization_job.run(await_termination=True)
+
+
+if __name__ == "__main__":
+    main()
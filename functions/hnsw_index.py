@@ -0,0 +1,249 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import hnswlib
+import numpy as np
+import pandas as pd
+
+from functions.vector_index import LocalVectorIndex
+
+
+class HNSWVectorIndex(LocalVectorIndex):
+    """
+    Approximate nearest-neighbor index (HNSW graph) on top of LocalVectorIndex.
+
+    - Vectors, ids and feature columns use the LocalVectorIndex layout and
+      stay memory-mapped; the graph lives in hnsw.bin (+ hnsw.json params)
+    - M / ef_construction are fixed at build time, ef_search is tunable
+    - add / delete / upsert_papers update the graph in place, so the
+      incremental pipeline never needs a full rebuild
+    - recall_report() measures recall@k against the exact scan
+    - ef is a property of the shared graph: every ef change + query (and
+      every graph update) holds _graph_lock, so concurrent searches from
+      the worker pool never run with another call's ef
+
+    Same Feature View compatible surface (.find_neighbors, .schema, ...)
+    so it plugs into SimilaritySearchEngine.search_metadata / search_chunks.
+    """
+
+    GRAPH_FILE = "hnsw.bin"
+    PARAMS_FILE = "hnsw.json"
+
+    def __init__(self, index_dir: str, ef_search: Optional[int] = None):
+        super().__init__(index_dir)
+
+        params = json.loads((self.index_dir / self.PARAMS_FILE).read_text())
+        self.M: int = params["M"]
+        self.ef_construction: int = params["ef_construction"]
+
+        self._graph_lock = threading.RLock()
+        self.graph = hnswlib.Index(space="ip", dim=self.dim)
+        self.graph.load_index(
+            str(self.index_dir / self.GRAPH_FILE),
+            max_elements=max(self.count, 1),
+        )
+        self.set_ef_search(ef_search or params.get("ef_search", 64))
+
+    # ------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------
+
+    @classmethod
+    def build(
+        cls,
+        index_dir: str,
+        df: pd.DataFrame,
+        embedding_col: str = "embedding",
+        M: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+    ) -> "HNSWVectorIndex":
+        exact = LocalVectorIndex.build(index_dir, df, embedding_col)
+        cls._build_graph(exact, M, ef_construction, ef_search)
+        return cls(index_dir)
+
+    @classmethod
+    def from_exact(
+        cls,
+        index_dir: str,
+        M: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+    ) -> "HNSWVectorIndex":
+        """
+        Add a graph to an existing LocalVectorIndex directory.
+        """
+        cls._build_graph(LocalVectorIndex(index_dir), M, ef_construction, ef_search)
+        return cls(index_dir)
+
+    @classmethod
+    def _build_graph(
+        cls,
+        exact: LocalVectorIndex,
+        M: int,
+        ef_construction: int,
+        ef_search: int,
+    ) -> None:
+        graph = hnswlib.Index(space="ip", dim=exact.dim)  # rows are normalized: ip == cosine
+        graph.init_index(
+            max_elements=max(exact.count, 1),
+            M=M,
+            ef_construction=ef_construction,
+        )
+
+        alive = np.flatnonzero(~exact.deleted)
+        if len(alive):
+            graph.add_items(np.asarray(exact.vectors[alive]), np.asarray(exact.ids[alive]))
+
+        _save_graph(graph, exact.index_dir / cls.GRAPH_FILE)
+        (exact.index_dir / cls.PARAMS_FILE).write_text(
+            json.dumps({"M": M, "ef_construction": ef_construction, "ef_search": ef_search})
+        )
+
+    # ------------------------------------------------------------
+    # Tuning / persistence
+    # ------------------------------------------------------------
+
+    def set_ef_search(self, ef_search: int) -> None:
+        with self._graph_lock:
+            self.ef_search = ef_search
+            self.graph.set_ef(ef_search)
+
+    def save_graph(self) -> None:
+        with self._graph_lock:
+            _save_graph(self.graph, self.index_dir / self.GRAPH_FILE)
+
+    def _knn_query(self, queries: np.ndarray, k: int):
+        """
+        knn_query with ef >= k (hnswlib returns fewer than k results otherwise).
+        """
+        with self._graph_lock:
+            if self.ef_search >= k:
+                return self.graph.knn_query(queries, k=k)
+            self.graph.set_ef(k)
+            try:
+                return self.graph.knn_query(queries, k=k)
+            finally:
+                self.graph.set_ef(self.ef_search)
+
+    # ------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------
+
+    def add(self, df: pd.DataFrame) -> np.ndarray:
+        new_ids = super().add(df)
+        if len(new_ids):
+            with self._graph_lock:
+                if self.count > self.graph.get_max_elements():
+                    # Grow geometrically to keep resizes rare
+                    self.graph.resize_index(max(self.count, 2 * self.graph.get_max_elements()))
+                self.graph.add_items(np.asarray(self.vectors[new_ids]), new_ids)
+                self.save_graph()
+        return new_ids
+
+    def delete(self, positions: Iterable[int]) -> int:
+        positions = np.asarray(list(positions), dtype=np.int64)
+        fresh = positions[~self.deleted[positions]]
+        with self._graph_lock:
+            for label in np.asarray(self.ids[fresh]):
+                self.graph.mark_deleted(int(label))
+        removed = super().delete(fresh)
+        if removed:
+            self.save_graph()
+        return removed
+
+    def compact(self) -> "HNSWVectorIndex":
+        """
+        Rewrite the exact layer without tombstones, then build the graph once.
+        """
+        exact = LocalVectorIndex.compact(self)
+        self._build_graph(exact, self.M, self.ef_construction, self.ef_search)
+        return type(self)(self.index_dir)
+
+    # ------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------
+
+    def search(self, embedding, k: int = 10):
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        q = self._prepare_query(embedding)
+        labels, distances = self._knn_query(q, k)
+
+        # Labels are row ids, which equal row positions
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+    def search_batch(self, embeddings, k: int = 10, positions=None, block_size: int = 256):
+        if positions is not None:
+            # Restricted scans are exact and small: no graph needed
+            return super().search_batch(embeddings, k, positions, block_size)
+
+        k = min(k, len(self))
+        queries = self._prepare_queries(embeddings)
+        if k <= 0:
+            empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+            return [empty] * len(queries)
+
+        # hnswlib spreads a 2D query batch over its own threads
+        labels, distances = self._knn_query(queries, k)
+
+        return list(zip(labels.astype(np.int64), 1.0 - distances))
+
+    def exact_search(self, embedding, k: int = 10):
+        return LocalVectorIndex.search(self, embedding, k)
+
+    def recall_report(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        ef_values: Optional[List[int]] = None,
+    ) -> pd.DataFrame:
+        """
+        recall@k and mean latency of HNSW vs the exact scan, per ef_search.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+
+        exact_start = time.perf_counter()
+        truth = [set(self.exact_search(q, k)[0].tolist()) for q in queries]
+        exact_ms = (time.perf_counter() - exact_start) * 1000 / len(queries)
+
+        # Held for the whole sweep: other searches must not see the trial ef values
+        self._graph_lock.acquire()
+        original_ef = self.ef_search
+        rows: List[Dict[str, Any]] = []
+        try:
+            for ef in ef_values or [original_ef]:
+                self.set_ef_search(ef)
+                start = time.perf_counter()
+                found = [set(self.search(q, k)[0].tolist()) for q in queries]
+                ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+                recall = np.mean(
+                    [len(f & t) / max(1, len(t)) for f, t in zip(found, truth)]
+                )
+                rows.append(
+                    {
+                        "ef_search": ef,
+                        f"recall@{k}": float(recall),
+                        "ann_ms": ann_ms,
+                        "exact_ms": exact_ms,
+                        "speedup": exact_ms / ann_ms if ann_ms else float("inf"),
+                    }
+                )
+        finally:
+            self.set_ef_search(original_ef)
+            self._graph_lock.release()
+
+        return pd.DataFrame(rows)
+
+
+def _save_graph(graph, path: Path) -> None:
+    tmp = path.with_suffix(".tmp")
+    graph.save_index(str(tmp))
+    os.replace(tmp, path)
@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import urllib.parse
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+
+# Metadata fields that feed the feature groups (order matters for hashing)
+FINGERPRINT_FIELDS = (
+    "title",
+    "authors",
+    "year",
+    "abstract",
+    "item_type",
+    "url",
+    "file_attachments",
+)
+
+
+@dataclass
+class ChangeSet:
+    """
+    Result of comparing the current Zotero export against the manifest.
+    """
+
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    # paper_id -> new fingerprint (for added + modified)
+    fingerprints: Dict[str, Dict[str, str]] = field(default_factory=dict)
+
+    @property
+    def to_process(self) -> List[str]:
+        return self.added + self.modified
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.modified or self.deleted)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.added)} added, {len(self.modified)} modified, "
+            f"{len(self.deleted)} deleted, {self.unchanged} unchanged"
+        )
+
+
+class IncrementalSync:
+    """
+    Content-based change detection for the incremental feature pipeline.
+
+    Keeps a local JSON manifest with, per paper:
+    - fingerprint   : hash of metadata fields + "Date Modified"
+    - attachment    : size/mtime (or SHA-256) signature of the attachment
+    - num_chunks    : number of chunks last uploaded (to tombstone leftovers)
+
+    The manifest is only advanced by commit(), i.e. after the upload
+    succeeded, so a failed run is simply detected again next time.
+    """
+
+    MANIFEST_VERSION = 1
+
+    def __init__(self, manifest_path: str, hash_attachments: bool = False):
+        self.manifest_path = Path(manifest_path)
+        self.hash_attachments = hash_attachments
+        self.papers: Dict[str, Dict[str, Any]] = self._load()
+
+    # ------------------------------------------------------------
+    # Manifest I/O
+    # ------------------------------------------------------------
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.manifest_path.exists():
+            return {}
+
+        data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        if data.get("version") != self.MANIFEST_VERSION:
+            # Unknown layout: start over (everything is re-synced via upsert)
+            return {}
+        return data.get("papers", {})
+
+    def save(self) -> None:
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps({"version": self.MANIFEST_VERSION, "papers": self.papers}),
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.manifest_path)
+
+    # ------------------------------------------------------------
+    # Fingerprints
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def metadata_fingerprint(paper: Dict[str, Any]) -> str:
+        digest = hashlib.sha1()
+        for name in FINGERPRINT_FIELDS + ("date_modified",):
+            value = paper.get(name)
+            digest.update(("" if value is None else str(value)).encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def attachment_signature(self, file_attachments: Optional[str]) -> str:
+        if not file_attachments:
+            return ""
+
+        path = Path(urllib.parse.unquote(file_attachments))
+        try:
+            st = path.stat()
+        except OSError:
+            return "missing"
+
+        if not self.hash_attachments:
+            return f"{st.st_size}:{st.st_mtime_ns}"
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    # ------------------------------------------------------------
+    # Diff / Commit
+    # ------------------------------------------------------------
+
+    def diff(self, papers: Iterable[Dict[str, Any]]) -> ChangeSet:
+        changes = ChangeSet()
+        seen = set()
+
+        for paper in papers:
+            pid = str(paper["paper_id"])
+            seen.add(pid)
+
+            current = {
+                "fingerprint": self.metadata_fingerprint(paper),
+                "attachment": self.attachment_signature(paper.get("file_attachments")),
+            }
+            previous = self.papers.get(pid)
+
+            if previous is None:
+                changes.added.append(pid)
+            elif (
+                previous.get("fingerprint") != current["fingerprint"]
+                or previous.get("attachment") != current["attachment"]
+            ):
+                changes.modified.append(pid)
+            else:
+                changes.unchanged += 1
+                continue
+
+            changes.fingerprints[pid] = current
+
+        changes.deleted = sorted(set(self.papers) - seen)
+        return changes
+
+    def stale_chunk_keys(
+        self,
+        changes: ChangeSet,
+        new_chunk_counts: Dict[str, int],
+    ) -> List[Tuple[str, int]]:
+        """
+        (paper_id, chunk_index) keys that exist in the Feature Store but
+        will not be overwritten by the upcoming upsert.
+        """
+        keys: List[Tuple[str, int]] = []
+
+        for pid in changes.modified:
+            old = self.papers.get(pid, {}).get("num_chunks", 0)
+            new = new_chunk_counts.get(pid, 0)
+            keys.extend((pid, i) for i in range(new, old))
+
+        for pid in changes.deleted:
+            old = self.papers.get(pid, {}).get("num_chunks", 0)
+            keys.extend((pid, i) for i in range(old))
+
+        return keys
+
+    def commit(self, changes: ChangeSet, new_chunk_counts: Dict[str, int]) -> None:
+        for pid in changes.to_process:
+            self.papers[pid] = dict(
+                changes.fingerprints[pid],
+                num_chunks=int(new_chunk_counts.get(pid, 0)),
+            )
+        for pid in changes.deleted:
+            self.papers.pop(pid, None)
+        self.save()
+
+    def record_backfill(
+        self,
+        papers: Iterable[Dict[str, Any]],
+        chunk_counts: Dict[str, int],
+    ) -> None:
+        """
+        Replace the manifest with the papers a full backfill just uploaded,
+        so the first incremental run only sees real changes (and knows how
+        many chunks to tombstone per paper).
+        """
+        counts = {str(pid): int(n) for pid, n in chunk_counts.items()}
+        self.papers = {}
+        for paper in papers:
+            pid = str(paper["paper_id"])
+            self.papers[pid] = {
+                "fingerprint": self.metadata_fingerprint(paper),
+                "attachment": self.attachment_signature(paper.get("file_attachments")),
+                "num_chunks": counts.get(pid, 0),
+            }
+        self.save()
+        print(f"Sync manifest: recorded {len(self.papers)} papers -> {self.manifest_path}")
+
+
+def manifest_signature(manifest_path: str) -> str:
+    """
+    Content hash of the sync manifest ("" if there is none yet). Every
+    ingest path rewrites the manifest, so derived local indexes (BM25) can
+    tell whether they still match the Feature Groups.
+    """
+    path = Path(manifest_path)
+    if not path.exists():
+        return ""
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+# -------- Feature Store tombstones --------
+
+def delete_chunk_records(chunk_fg, keys: List[Tuple[str, int]]) -> int:
+    """
+    Delete (paper_id, chunk_index) rows from the chunk Feature Group.
+    """
+    if not keys:
+        return 0
+    df = pd.DataFrame(keys, columns=["paper_id", "chunk_index"])
+    chunk_fg.commit_delete_record(df)
+    return len(df)
+
+
+def delete_paper_records(paper_fg, paper_ids: List[str]) -> int:
+    """
+    Delete paper rows from the metadata Feature Group.
+    """
+    if not paper_ids:
+        return 0
+    df = pd.DataFrame({"paper_id": list(paper_ids)})
+    paper_fg.commit_delete_record(df)
+    return len(df)
@@ -9,8 +9,11 @@ class IntentRouter:
         Determine the intent of the user query.
         Returns one of: 'GREETING', 'RAG_SEARCH', 'GENERAL_KNOWLEDGE'
         """
-        
-        prompt = f"""
+        return self.parse(self.llm(self.prompt(query)))
+
+    @staticmethod
+    def prompt(query: str) -> str:
+        return f"""
 You are a query classifier for a Medical Research Agent.
 Classify the following user query into exactly one of these categories:
 
@@ -24,7 +27,9 @@ User Query: "{query}"
 Output ONLY the category name (e.g., RAG_SEARCH). Do not output explanation.
 """.strip()
 
-        response = self.llm(prompt).strip().upper()
+    @staticmethod
+    def parse(response: str) -> str:
+        response = response.strip().upper()
 
         valid_intents = {"GREETING", "SELF_INFO", "RAG_SEARCH", "GENERAL_KNOWLEDGE"}
         
@@ -2,7 +2,7 @@
 
 import os
 from typing import Optional
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 
 class LLMWrapper:
@@ -17,6 +17,7 @@ class LLMWrapper:
     Contract:
     - Input: prompt (str)
     - Output: raw generated text (str)
+    - generate_async(prompt): same, awaitable (AsyncOpenAI client)
     """
 
     def __init__(
@@ -39,12 +40,17 @@ class LLMWrapper:
             api_key=self.api_key,
             base_url=base_url,
         )
+        # Non-blocking twin for the async agent loop (one shared connection pool)
+        self.async_client = AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=base_url,
+        )
 
-    def __call__(self, prompt: str) -> str:
+    def _request(self, prompt: str) -> dict:
         if not isinstance(prompt, str):
             raise ValueError("Prompt must be a string.")
 
-        response = self.client.chat.completions.create(
+        return dict(
             model=self.model,
             messages=[
                 {"role": "user", "content": prompt}
@@ -53,7 +59,17 @@ class LLMWrapper:
             max_tokens=self.max_tokens,
         )
 
+    @staticmethod
+    def _text(response) -> str:
         try:
             return response.choices[0].message.content.strip()
         except Exception:
             raise RuntimeError(f"Invalid LLM response: {response}")
+
+    def __call__(self, prompt: str) -> str:
+        response = self.client.chat.completions.create(**self._request(prompt))
+        return self._text(response)
+
+    async def generate_async(self, prompt: str) -> str:
+        response = await self.async_client.chat.completions.create(**self._request(prompt))
+        return self._text(response)
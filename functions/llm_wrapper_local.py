@@ -1,7 +1,10 @@
 # functions/llm_wrapper.py
 
+import asyncio
 import os
 import getpass
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import torch
 import transformers
 from transformers import AutoTokenizer, AutoModelForCausalLM
@@ -31,6 +34,11 @@ class LLMWrapper:
         self.tokenizer, self.model = self._load_model()
         self.pipeline = self._build_pipeline()
 
+        # One generation at a time on the shared model. Async callers queue on
+        # a dedicated thread so they never hold the shared search workers.
+        self._generate_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-llm")
+
     # ------------------------------------------------------------------
     # Model loading (BASE MODEL)
     # ------------------------------------------------------------------
@@ -105,9 +113,17 @@ class LLMWrapper:
         if not isinstance(prompt, str):
             raise ValueError("Prompt must be a string.")
 
-        outputs = self.pipeline(prompt)
+        with self._generate_lock:
+            outputs = self.pipeline(prompt)
 
         if not outputs or "generated_text" not in outputs[0]:
             raise RuntimeError("Invalid LLM output format.")
 
         return outputs[0]["generated_text"].strip()
+
+    async def generate_async(self, prompt: str) -> str:
+        """
+        __call__ off the event loop, so it keeps serving other requests.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self, prompt)
@@ -1,4 +1,7 @@
-from typing import Dict, Any, List
+from functions.retrieval_batch import RetrievalBatch
+from functions.worker_pool import run_in_worker
+
+ACTIONS = ("search_metadata", "search_chunks")
 
 
 class MCPDispatcher:
@@ -10,12 +13,28 @@ class MCPDispatcher:
         action: str,
         query: str,
         **kwargs,
-    ) -> List[Dict[str, Any]]:
-        if action == "search_metadata":
-            return self.search_engine.search_metadata(query, **kwargs)
+    ) -> RetrievalBatch:
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown MCP action: {action}")
+
+        results = getattr(self.search_engine, action)(query, **kwargs)
+        # Engines returning list[dict] (e.g. the legacy one) are converted once here
+        return RetrievalBatch.from_records(results)
 
-        if action == "search_chunks":
-            return self.search_engine.search_chunks(query, **kwargs)
-            
+    async def dispatch_async(
+        self,
+        action: str,
+        query: str,
+        **kwargs,
+    ) -> RetrievalBatch:
+        """
+        dispatch without blocking the event loop: uses the engine's
+        <action>_async when it has one, else runs dispatch on the worker pool.
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown MCP action: {action}")
 
-        raise ValueError(f"Unknown MCP action: {action}")
+        search = getattr(self.search_engine, f"{action}_async", None)
+        if search is None:
+            return await run_in_worker(self.dispatch, action, query, **kwargs)
+        return RetrievalBatch.from_records(await search(query, **kwargs))
@@ -1,6 +1,10 @@
 import re
 from typing import Optional, Dict, Any
 
+import pandas as pd
+
+_YEAR_PATTERN = r"((?:19|20)\d{2})"
+
 def sanitize_paper_metadata(paper: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """
     Defensive metadata sanitation.
@@ -40,4 +44,39 @@ def sanitize_paper_metadata(paper: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     attachments = paper.get("file_attachments")
     paper["file_attachments"] = str(attachments) if attachments is not None else ""
 
-    return paper
\ No newline at end of file
+    return paper
+
+
+def sanitize_metadata_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorized sanitize_paper_metadata over a normalized parser frame.
+    Same rules, applied column-wise; invalid rows are dropped.
+    """
+
+    # ---- 1. Mandatory Field Validation ----
+    title = df["title"].fillna("").astype(str).str.strip()
+    df = df.loc[title != ""].copy()
+    df["title"] = title[title != ""]
+
+    # ---- 2. Year Repair ----
+    for field in ("url", "abstract"):
+        missing = df["year"].isna()
+        if not missing.any():
+            break
+        found = df.loc[missing, field].fillna("").astype(str).str.extract(
+            _YEAR_PATTERN, expand=False
+        )
+        df.loc[missing, "year"] = pd.to_numeric(found, errors="coerce").astype("Int64")
+
+    # ---- 3. Authors Fallback ----
+    authors = df["authors"].fillna("").astype(str).str.strip()
+    df["authors"] = authors.mask((authors == "") | (authors.str.lower() == "nan"), "Unknown")
+
+    # ---- 4. Abstract Normalization ----
+    abstract = df["abstract"].fillna("").astype(str).str.strip()
+    df["abstract"] = df["abstract"].mask(abstract.str.lower().isin({"nan", "none"}), "")
+
+    # ---- 5. Attachments Handling ----
+    df["file_attachments"] = df["file_attachments"].fillna("").astype(str)
+
+    return df.reset_index(drop=True)
@@ -0,0 +1,195 @@
+import re
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from functions.lru_cache import LRUCache
+
+# "year >= 2023 and item_type in (journalArticle, preprint) and author = Liu"
+_CLAUSE_RE = re.compile(r"^\s*(\w+)\s*(>=|<=|!=|==|=|>|<|~|\bin\b)\s*(.+?)\s*$", re.IGNORECASE)
+_AND_RE = re.compile(r"\s+and\s+", re.IGNORECASE)
+
+FIELD_ALIASES = {
+    "year": "year",
+    "item_type": "item_type",
+    "type": "item_type",
+    "author": "authors",
+    "authors": "authors",
+}
+
+Clause = Tuple[str, str, object]
+
+
+def parse_filter(expr: str) -> List[Clause]:
+    """
+    Parse a small SQL-like filter: clauses joined by AND.
+
+    - year      : =, !=, >, >=, <, <=  (e.g. year >= 2023)
+    - item_type : =, !=, in            (e.g. item_type in (journalArticle, preprint))
+    - author    : = / ~, !=, in        (last name or "Last, First", case-insensitive)
+    """
+    clauses = []
+    for part in _AND_RE.split(expr.strip()):
+        match = _CLAUSE_RE.match(part)
+        if not match:
+            raise ValueError(f"Cannot parse filter clause: {part!r}")
+
+        name, op, raw = match.groups()
+        field = FIELD_ALIASES.get(name.lower())
+        if field is None:
+            raise ValueError(f"Unknown filter field: {name!r}")
+        op = {"==": "=", "~": "="}.get(op.lower(), op.lower())
+
+        if op == "in":
+            values = [_unquote(v) for v in raw.strip("()[] ").split(",") if v.strip()]
+            value: object = values
+        else:
+            value = _unquote(raw)
+
+        if field == "year":
+            if op == "in":
+                value = [float(v) for v in value]
+            else:
+                value = float(value)
+        elif op in (">", ">=", "<", "<="):
+            raise ValueError(f"Operator {op!r} only applies to year")
+
+        clauses.append((field, op, value))
+    return clauses
+
+
+def _unquote(value: str) -> str:
+    return value.strip().strip("'\"")
+
+
+def _author_keys(authors: str) -> List[str]:
+    """
+    "Narváez, Pedro; Percybrooks, Winston S." -> full names and last names, lowercased.
+    """
+    keys = []
+    for name in str(authors).split(";"):
+        name = " ".join(name.lower().split())
+        if not name:
+            continue
+        keys.append(name)
+        last = name.split(",")[0].strip()
+        if last != name:
+            keys.append(last)
+    return keys
+
+
+class MetadataFilterIndex:
+    """
+    Columnar index over paper-level year / item_type / authors.
+
+    Rows follow the MetadataSnapshot order (sorted paper_id). Every clause
+    becomes a packed bitmap (np.packbits, one bit per paper); clauses are
+    ANDed bitwise and only the surviving paper_ids are handed to the vector
+    search, so a selective filter shrinks the scan.
+    """
+
+    def __init__(self, paper_ids: np.ndarray, year: np.ndarray, item_type, authors):
+        self.paper_ids = np.asarray(paper_ids)
+        self.n = len(self.paper_ids)
+        self.year = np.asarray(year, dtype=np.float64)
+
+        self.item_type_bitmaps: Dict[str, np.ndarray] = {}
+        codes = defaultdict(list)
+        for i, value in enumerate(item_type):
+            codes[str(value).lower()].append(i)
+        for value, rows in codes.items():
+            self.item_type_bitmaps[value] = self._bitmap(np.asarray(rows, dtype=np.int64))
+
+        # author key -> row positions (turned into a bitmap when queried)
+        postings = defaultdict(list)
+        for i, value in enumerate(authors):
+            for key in set(_author_keys(value)):
+                postings[key].append(i)
+        self.author_postings = {k: np.asarray(v, dtype=np.int64) for k, v in postings.items()}
+
+        # filter expression -> bitmap
+        self._cache = LRUCache(256)
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> "MetadataFilterIndex":
+        frame = snapshot.to_frame()
+        n = len(frame)
+        return cls(
+            frame["paper_id"].to_numpy(),
+            frame["year"].to_numpy() if "year" in frame else np.full(n, np.nan),
+            frame["item_type"] if "item_type" in frame else [""] * n,
+            frame["authors"] if "authors" in frame else [""] * n,
+        )
+
+    # ------------------------------------------------------------
+    # Bitmaps
+    # ------------------------------------------------------------
+
+    def _bitmap(self, rows: np.ndarray) -> np.ndarray:
+        mask = np.zeros(self.n, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+
+    def _all(self) -> np.ndarray:
+        return np.packbits(np.ones(self.n, dtype=bool))
+
+    def _clause_bitmap(self, field: str, op: str, value) -> np.ndarray:
+        if field == "year":
+            year = self.year
+            if op == "in":
+                mask = np.isin(year, value)
+            else:
+                mask = {
+                    "=": year == value,
+                    "!=": (year != value) & ~np.isnan(year),
+                    ">": year > value,
+                    ">=": year >= value,
+                    "<": year < value,
+                    "<=": year <= value,
+                }[op]
+            return np.packbits(mask)
+
+        if field == "item_type":
+            empty = np.zeros_like(self._all())
+            values = value if op == "in" else [value]
+            bitmap = empty
+            for v in values:
+                bitmap = bitmap | self.item_type_bitmaps.get(v.lower(), empty)
+            return ~bitmap & self._all() if op == "!=" else bitmap
+
+        # authors: a paper matches "in (...)" if any of the names is among its authors
+        values = value if op == "in" else [value]
+        empty = np.empty(0, dtype=np.int64)
+        rows = [self.author_postings.get(" ".join(str(v).lower().split()), empty) for v in values]
+        bitmap = self._bitmap(np.concatenate(rows) if rows else empty)
+        return ~bitmap & self._all() if op == "!=" else bitmap
+
+    def bitmap(self, expr: str) -> np.ndarray:
+        """
+        Packed bitmap of the papers matching expr (cached per expression).
+        """
+        def compute():
+            bitmap = self._all()
+            for clause in parse_filter(expr):
+                bitmap &= self._clause_bitmap(*clause)
+            return bitmap
+
+        return self._cache.get_or_compute(expr, compute)
+
+    def positions(self, expr: str) -> np.ndarray:
+        return np.flatnonzero(np.unpackbits(self.bitmap(expr), count=self.n))
+
+    def select(self, expr: str) -> List[str]:
+        """
+        paper_ids matching expr.
+        """
+        return self.paper_ids[self.positions(expr)].tolist()
+
+    def selectivity(self, expr: str) -> float:
+        """
+        Fraction of papers that pass expr (1.0 for an empty index).
+        """
+        if self.n == 0:
+            return 1.0
+        return int(np.unpackbits(self.bitmap(expr), count=self.n).sum()) / self.n
@@ -0,0 +1,530 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Paper-level columns kept next to paper_id (whichever the source has)
+SNAPSHOT_COLUMNS = ["title", "authors", "year", "item_type"]
+
+# Commits listed per delta refresh; more than this since the stamp -> full read
+MAX_DELTA_COMMITS = 100
+
+
+class StringColumn:
+    """
+    Variable-length UTF-8 strings: one byte blob + int64 offsets, both memory-mapped.
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def tolist(self) -> List[str]:
+        return [self[i] for i in range(len(self))]
+
+    @staticmethod
+    def encode(values):
+        encoded = [str(v).encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+    @staticmethod
+    def write(prefix: Path, values) -> None:
+        StringColumn.write_arrays(prefix, *StringColumn.encode(values))
+
+    @staticmethod
+    def write_arrays(prefix: Path, data: np.ndarray, offsets: np.ndarray) -> None:
+        with open(f"{prefix}.bin", "wb") as f:
+            f.write(np.asarray(data, dtype=np.uint8).tobytes())
+        np.save(f"{prefix}.off.npy", offsets)
+
+    @staticmethod
+    def take(data: np.ndarray, offsets: np.ndarray, index: np.ndarray):
+        """
+        (data, offsets) of the strings at index, without decoding them.
+        """
+        starts = np.asarray(offsets[:-1])[index]
+        lengths = np.asarray(offsets[1:])[index] - starts
+        new_offsets = np.zeros(len(index) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=new_offsets[1:])
+        # byte i of output string j comes from starts[j] + (i - new_offsets[j])
+        positions = np.repeat(starts - new_offsets[:-1], lengths) + np.arange(new_offsets[-1])
+        return np.asarray(data)[positions], new_offsets
+
+    @classmethod
+    def load(cls, prefix: Path) -> "StringColumn":
+        offsets = np.load(f"{prefix}.off.npy", mmap_mode="r")
+        if offsets[-1] == 0:
+            data = np.zeros(0, dtype=np.uint8)  # mmap of an empty file fails
+        else:
+            data = np.memmap(f"{prefix}.bin", dtype=np.uint8, mode="r")
+        return cls(data, offsets)
+
+
+class ColumnLookup(Mapping):
+    """
+    Read-only dict paper_id -> value, backed by the sorted paper_id array
+    (binary search) and a column; no Python dict is materialized.
+    """
+
+    def __init__(self, keys: np.ndarray, column):
+        self._ids = keys
+        self._values = column
+
+    def _find(self, key) -> int:
+        if not isinstance(key, str) or len(self._ids) == 0:
+            return -1
+        i = int(np.searchsorted(self._ids, key))
+        if i < len(self._ids) and self._ids[i] == key:
+            return i
+        return -1
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._values[i]
+
+    def __contains__(self, key) -> bool:
+        return self._find(key) >= 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[str]:
+        return (str(k) for k in self._ids)
+
+
+class MetadataSnapshot:
+    """
+    Local, versioned snapshot of paper-level metadata (paper_id, title, ...).
+
+    Replaces reading the whole metadata Feature View with iterrows at engine
+    startup: the snapshot is memory-mapped in milliseconds, and a background
+    refresh publishes a new version only when papers were added, changed or
+    removed. On a Hopsworks source the refresh reads only the rows committed
+    to the Feature Group since the commit recorded in CURRENT and patches
+    the columns; the full read happens on the first run and on schema changes.
+
+    Layout under <snapshot_dir>/:
+    - CURRENT         : version stamp of the live version (json, incl. FG commit)
+    - v<n>/paper_id.npy : sorted fixed-width paper ids
+    - v<n>/<col>.bin + <col>.off.npy : string columns
+    - v<n>/<col>.npy  : numeric columns (float64, NaN = missing)
+    """
+
+    def __init__(self, snapshot_dir: str):
+        self.snapshot_dir = Path(snapshot_dir)
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._load()
+
+    # ------------------------------------------------------------
+    # Loading / writing
+    # ------------------------------------------------------------
+
+    def _load(self) -> None:
+        stamp = json.loads((self.snapshot_dir / "CURRENT").read_text())
+        version_dir = self.snapshot_dir / f"v{stamp['version']}"
+
+        keys = np.load(version_dir / "paper_id.npy", mmap_mode="r")
+        columns: Dict[str, Any] = {}
+        for name in stamp["columns"]:
+            if (version_dir / f"{name}.npy").exists():
+                columns[name] = np.load(version_dir / f"{name}.npy", mmap_mode="r")
+            else:
+                columns[name] = StringColumn.load(version_dir / name)
+
+        # Single attribute swap: readers never see a half-loaded version
+        self._state = (stamp, keys, columns, {})
+
+    @property
+    def stamp(self) -> Dict[str, Any]:
+        return self._state[0]
+
+    @property
+    def version(self) -> int:
+        return self.stamp["version"]
+
+    def __len__(self) -> int:
+        return len(self._state[1])
+
+    def lookup(self, column: str) -> ColumnLookup:
+        _, keys, columns, lookups = self._state
+        if column not in lookups:
+            lookups[column] = ColumnLookup(keys, columns[column])
+        return lookups[column]
+
+    @property
+    def titles(self) -> ColumnLookup:
+        return self.lookup("title")
+
+    def to_frame(self) -> pd.DataFrame:
+        _, keys, columns, _ = self._state
+        data = {"paper_id": keys.astype(object)}
+        for name, col in columns.items():
+            data[name] = col.tolist() if isinstance(col, StringColumn) else np.asarray(col)
+        return pd.DataFrame(data)
+
+    @classmethod
+    def write(
+        cls,
+        snapshot_dir: str,
+        df: pd.DataFrame,
+        source: str = "",
+        version: int = 1,
+        commit: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Write df as version <version> and make it current; returns the stamp.
+        commit: latest Feature Group commit df covers (None for local sources).
+        """
+        snapshot_dir = Path(snapshot_dir)
+        df = _prepare(df)
+
+        version_dir = _new_version_dir(snapshot_dir, version)
+        np.save(version_dir / "paper_id.npy", df["paper_id"].to_numpy(dtype=str))
+        columns = [c for c in SNAPSHOT_COLUMNS if c in df.columns]
+        for name in columns:
+            if pd.api.types.is_numeric_dtype(df[name]):
+                np.save(version_dir / f"{name}.npy", df[name].to_numpy())
+            else:
+                StringColumn.write(version_dir / name, df[name])
+
+        stamp = {
+            "version": version,
+            "source": source,
+            "rows": len(df),
+            "columns": columns,
+            "content_hash": _content_hash(df),
+            "commit": commit,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        _publish(snapshot_dir, stamp)
+        return stamp
+
+    @classmethod
+    def open_or_build(
+        cls,
+        snapshot_root: str,
+        feature_view,
+        refresh: bool = True,
+    ) -> "MetadataSnapshot":
+        """
+        Snapshot of feature_view under <snapshot_root>/<source label>/.
+
+        An existing snapshot is opened right away (and refreshed in the
+        background if refresh=True); otherwise it is built synchronously once.
+        """
+        source = source_label(feature_view)
+        snapshot_dir = Path(snapshot_root) / _slug(source)
+
+        if (snapshot_dir / "CURRENT").exists():
+            snapshot = cls(snapshot_dir)
+            if refresh:
+                snapshot.refresh_async(feature_view)
+            return snapshot
+
+        print(f"Building metadata snapshot for {source}...")
+        # Commit first: rows committed during the read are re-read next refresh
+        commit = latest_commit(source_feature_group(feature_view))
+        cls.write(snapshot_dir, _read_source(feature_view), source=source, commit=commit)
+        return cls(snapshot_dir)
+
+    # ------------------------------------------------------------
+    # Delta refresh
+    # ------------------------------------------------------------
+
+    def diff(self, df: pd.DataFrame) -> Dict[str, int]:
+        """
+        Counts of added / changed / removed papers in df vs this snapshot.
+        """
+        new = _prepare(df)
+        old = self.to_frame()
+        columns = [c for c in self.stamp["columns"] if c in new.columns]
+
+        merged = old.merge(new, on="paper_id", how="outer", suffixes=("_old", ""), indicator=True)
+        both = merged["_merge"] == "both"
+        changed = np.zeros(len(merged), dtype=bool)
+        for name in columns:
+            a, b = merged[f"{name}_old"], merged[name]
+            changed |= both & ~((a == b) | (a.isna() & b.isna())).to_numpy()
+
+        return {
+            "added": int((merged["_merge"] == "right_only").sum()),
+            "changed": int(changed.sum()),
+            "removed": int((merged["_merge"] == "left_only").sum()),
+        }
+
+    def refresh(self, feature_view) -> bool:
+        """
+        Bring the snapshot up to date with feature_view.
+        Returns True when a new version was published.
+
+        A Hopsworks source with a recorded commit is refreshed from the rows
+        committed since (see apply_delta); local sources, snapshots without
+        a commit and schema changes re-read the whole source.
+        """
+        with self._lock:
+            fg = source_feature_group(feature_view)
+            if fg is not None and self.stamp.get("commit") is not None:
+                published = self._refresh_delta(feature_view, fg)
+                if published is not None:
+                    return published
+            return self._refresh_full(feature_view, fg)
+
+    def _refresh_full(self, feature_view, fg) -> bool:
+        commit = latest_commit(fg)
+        df = _read_source(feature_view)
+        if _content_hash(_prepare(df)) == self.stamp["content_hash"]:
+            if commit != self.stamp.get("commit"):
+                # Same content: only record the commit, later refreshes are deltas
+                _publish(self.snapshot_dir, dict(self.stamp, commit=commit))
+                self._load()
+            return False
+
+        delta = self.diff(df)
+        old_version = self.version
+        self.write(
+            self.snapshot_dir,
+            df,
+            source=self.stamp.get("source", ""),
+            version=old_version + 1,
+            commit=commit,
+        )
+        self._swap(old_version, delta)
+        return True
+
+    def _refresh_delta(self, feature_view, fg) -> Optional[bool]:
+        """
+        Read the rows committed to fg since the stamp's commit and apply them.
+        None when a full read is needed instead.
+        """
+        since = self.stamp["commit"]
+        columns = [c for c in SNAPSHOT_COLUMNS if c in {f.name for f in feature_view.schema}]
+        if columns != self.stamp["columns"]:
+            print("Metadata snapshot: source schema changed, rebuilding.")
+            return None
+
+        commits = fg.commit_details(limit=MAX_DELTA_COMMITS) or {}
+        new = {c: d for c, d in commits.items() if c > since}
+        if not new:
+            return False
+        if len(new) >= MAX_DELTA_COMMITS:
+            return None  # older commits may be missing from the listing
+
+        latest = max(new)
+        removed = np.zeros(0, dtype=str)
+        if any(d.get("rowsDeleted") for d in new.values()):
+            # Incremental reads return no tombstones: diff the keys only
+            live = fg.select(["paper_id"]).read()["paper_id"].astype(str).to_numpy()
+            removed = np.setdiff1d(np.asarray(self._state[1]), live)
+
+        # Commit ids are commit times (epoch ms); exclude_until is exclusive
+        rows = fg.select(["paper_id"] + columns).as_of(wallclock_time=latest, exclude_until=since).read()
+        return self.apply_delta(_as_frame(rows), removed, commit=latest)
+
+    def apply_delta(self, rows: pd.DataFrame, removed=(), commit: Optional[int] = None) -> Optional[bool]:
+        """
+        Publish a new version with rows upserted and the removed paper ids
+        dropped, patching the current columns instead of rewriting them from
+        a DataFrame. Rows identical to the snapshot are ignored.
+
+        Returns True when a new version was published, False when nothing
+        changed, None when rows do not fit the stored columns (full rebuild).
+        """
+        stamp, keys, columns, _ = self._state
+        names = stamp["columns"]
+        keys = np.asarray(keys)
+        rows = _prepare(rows) if len(rows) else pd.DataFrame(columns=["paper_id"] + names)
+        if len(rows) and (
+            any(c not in rows.columns for c in names)
+            or any(
+                isinstance(columns[c], StringColumn) == pd.api.types.is_numeric_dtype(rows[c])
+                for c in names
+            )
+        ):
+            return None
+
+        ids = rows["paper_id"].to_numpy(dtype=str) if len(rows) else np.zeros(0, dtype=str)
+        pos = np.searchsorted(keys, ids)
+        present = pos < len(keys)
+        present[present] = keys[pos[present]] == ids[present]
+
+        same = present.copy()
+        for name in names:
+            at = pos[same]
+            col = columns[name]
+            if isinstance(col, StringColumn):
+                old = np.array([col[i] for i in at], dtype=object)
+                equal = old == rows[name].to_numpy(dtype=object)[same]
+            else:
+                old, new = np.asarray(col)[at], rows[name].to_numpy(dtype=np.float64)[same]
+                equal = (old == new) | (np.isnan(old) & np.isnan(new))
+            same[np.flatnonzero(same)[~equal]] = False
+
+        rows, ids, present = rows[~same], ids[~same], present[~same]
+        removed = np.setdiff1d(np.asarray(removed, dtype=str), ids)
+        if not len(rows) and not len(removed):
+            if commit is not None and commit != stamp.get("commit"):
+                _publish(self.snapshot_dir, dict(stamp, commit=commit))
+                self._load()
+            return False
+
+        kept = np.flatnonzero(~np.isin(keys, np.concatenate([ids, removed])))
+        new_keys = np.concatenate([keys[kept], ids])
+        order = np.argsort(new_keys, kind="stable")
+        # Row r of the patched column: old row kept[r], or delta row r - len(kept)
+        index = np.concatenate([kept, len(keys) + np.arange(len(rows))])[order]
+
+        version = stamp["version"] + 1
+        version_dir = _new_version_dir(self.snapshot_dir, version)
+        np.save(version_dir / "paper_id.npy", new_keys[order])
+        for name in names:
+            col = columns[name]
+            if isinstance(col, StringColumn):
+                data, offsets = StringColumn.encode(rows[name])
+                data = np.concatenate([np.asarray(col.data), data])
+                offsets = np.concatenate([np.asarray(col.offsets[:-1]), offsets + col.offsets[-1]])
+                StringColumn.write_arrays(version_dir / name, *StringColumn.take(data, offsets, index))
+            else:
+                values = np.concatenate([np.asarray(col), rows[name].to_numpy(dtype=np.float64)])
+                np.save(version_dir / f"{name}.npy", values[index])
+
+        # Chained fingerprint: changes whenever the content does (a later
+        # full read republishes once with the plain content hash)
+        digest = hashlib.sha1(stamp["content_hash"].encode())
+        digest.update(_content_hash(rows).encode())
+        digest.update("\0".join(removed).encode())
+        _publish(self.snapshot_dir, dict(
+            stamp,
+            version=version,
+            rows=len(new_keys),
+            content_hash=digest.hexdigest(),
+            commit=commit if commit is not None else stamp.get("commit"),
+            created_at=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        ))
+        added = int((~present).sum())
+        self._swap(version - 1, {"added": added, "changed": len(rows) - added, "removed": len(removed)})
+        return True
+
+    def _swap(self, old_version: int, delta: Dict[str, int]) -> None:
+        self._load()
+        # Old mmaps stay valid until released; removal is best effort
+        shutil.rmtree(self.snapshot_dir / f"v{old_version}", ignore_errors=True)
+        print(
+            f"Metadata snapshot v{self.version}: +{delta['added']} "
+            f"~{delta['changed']} -{delta['removed']} papers."
+        )
+
+    def refresh_async(self, feature_view) -> threading.Thread:
+        def run():
+            try:
+                self.refresh(feature_view)
+            except Exception as e:
+                print(f"Warning: metadata snapshot refresh failed: {e}")
+
+        self._refresh_thread = threading.Thread(target=run, name="metadata-snapshot-refresh", daemon=True)
+        self._refresh_thread.start()
+        return self._refresh_thread
+
+    def wait_for_refresh(self, timeout: Optional[float] = None) -> None:
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout)
+
+
+def source_label(feature_view) -> str:
+    """
+    Stable name for a metadata source: "<fv name>_v<version>" or the local index dir.
+    """
+    name = getattr(feature_view, "name", None)
+    if name is not None:
+        return f"{name}_v{getattr(feature_view, 'version', '')}"
+    index_dir = getattr(feature_view, "index_dir", None)
+    if index_dir is not None:
+        return f"local_{Path(index_dir).name}"
+    return type(feature_view).__name__
+
+
+def source_feature_group(feature_view):
+    """
+    The Feature Group a Hopsworks Feature View reads (single-FG queries with
+    commit history only); None for local indexes and joined queries.
+    """
+    query = getattr(feature_view, "query", None)
+    fg = getattr(query, "_left_feature_group", None)
+    if fg is None or getattr(query, "_joins", None) or not hasattr(fg, "commit_details"):
+        return None
+    return fg
+
+
+def latest_commit(fg) -> Optional[int]:
+    if fg is None:
+        return None
+    try:
+        return max(fg.commit_details(limit=1) or {}, default=None)
+    except Exception as e:
+        print(f"Warning: cannot read Feature Group commits: {e}")
+        return None
+
+
+def _read_source(feature_view) -> pd.DataFrame:
+    # .query.read() bypasses the Training Dataset check (reads the source data)
+    return _as_frame(feature_view.query.read())
+
+
+def _as_frame(rows) -> pd.DataFrame:
+    return rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+
+
+def _new_version_dir(snapshot_dir: Path, version: int) -> Path:
+    version_dir = snapshot_dir / f"v{version}"
+    if version_dir.exists():
+        shutil.rmtree(version_dir)
+    version_dir.mkdir(parents=True)
+    return version_dir
+
+
+def _publish(snapshot_dir: Path, stamp: Dict[str, Any]) -> None:
+    tmp = snapshot_dir / "CURRENT.tmp"
+    tmp.write_text(json.dumps(stamp))
+    os.replace(tmp, snapshot_dir / "CURRENT")
+
+
+def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+    columns = ["paper_id"] + [c for c in SNAPSHOT_COLUMNS if c in df.columns]
+    df = df[columns]
+    df = df[df["paper_id"].notna() & (df["paper_id"].astype(str) != "")]
+    df = df.astype({"paper_id": str})
+    # Same normalization as stored: numbers -> float64 (NaN), text -> str ("" if missing)
+    for name in columns[1:]:
+        if pd.api.types.is_numeric_dtype(df[name]):
+            df[name] = df[name].to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            df[name] = ["" if v is None or v is pd.NA or v != v else str(v) for v in df[name]]
+    return df.drop_duplicates("paper_id", keep="last").sort_values("paper_id").reset_index(drop=True)
+
+
+def _content_hash(df: pd.DataFrame) -> str:
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name)
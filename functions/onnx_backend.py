@@ -0,0 +1,230 @@
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import (
+    ONNX_CACHE_DIR,
+    ONNX_PARITY_MAX_RERANK_DRIFT,
+    ONNX_PARITY_MIN_COSINE,
+    ONNX_PARITY_MIN_RANK_CORR,
+    ONNX_QUANTIZATION,
+)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Short PCG-flavoured sample used when no parity texts are given
+PARITY_TEXTS = [
+    "phonocardiogram segmentation with hidden semi-Markov models",
+    "Heart sound classification using convolutional neural networks on MFCC features.",
+    "We synthesize PCG signals with a denoising diffusion model conditioned on murmur type.",
+    "S1 and S2 detection in noisy recordings",
+    "Evaluation metrics for synthetic heart sounds include FID and expert listening tests.",
+    "wavelet denoising",
+]
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name)
+
+
+def _export(
+    model_cls,
+    model_name: str,
+    backend: str,
+    cache_dir: Path,
+    quantization: str,
+) -> Tuple[Path, str]:
+    """
+    Export model_name to ONNX (and int8) once; returns (model dir, onnx file name).
+    """
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    export_dir = Path(cache_dir or ONNX_CACHE_DIR) / _slug(model_name)
+    file_name = "onnx/model.onnx"
+    if backend == "onnx-int8":
+        file_name = f"onnx/model_qint8_{quantization}.onnx"
+
+    if not (export_dir / file_name).exists():
+        print(f"Exporting {model_name} to ONNX ({backend}) in {export_dir}...")
+        # backend="onnx" converts the PyTorch weights on load
+        model = model_cls(model_name, backend="onnx")
+        model.save_pretrained(str(export_dir))
+        if backend == "onnx-int8":
+            export_dynamic_quantized_onnx_model(model, quantization, str(export_dir))
+
+    return export_dir, file_name
+
+
+def load_embedder(
+    model_name: str,
+    backend: str = "torch",
+    cache_dir: Optional[Path] = None,
+    quantization: str = ONNX_QUANTIZATION,
+    check_parity: bool = True,
+):
+    """
+    SentenceTransformer on the requested backend ("torch", "onnx", "onnx-int8").
+
+    ONNX artifacts are exported once into <cache_dir>/<model name>/onnx/.
+    The first load after an export runs embedding_parity against PyTorch
+    and stores the result in parity.json next to the artifacts; an export
+    that fails the parity gates (parity_failures) is replaced by PyTorch.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+
+    export_dir, file_name = _export(
+        SentenceTransformer, model_name, backend, cache_dir, quantization
+    )
+    model = SentenceTransformer(
+        str(export_dir), backend="onnx", model_kwargs={"file_name": file_name}
+    )
+
+    if check_parity:
+        result = _check_once(
+            export_dir,
+            file_name,
+            lambda: embedding_parity(SentenceTransformer(model_name), model),
+        )
+        if not _accept(result, model_name, file_name):
+            return SentenceTransformer(model_name)
+    return model
+
+
+def load_reranker(
+    model_name: str,
+    backend: str = "torch",
+    cache_dir: Optional[Path] = None,
+    quantization: str = ONNX_QUANTIZATION,
+    check_parity: bool = True,
+):
+    """
+    CrossEncoder on the requested backend; same caching / parity as load_embedder.
+    """
+    from sentence_transformers import CrossEncoder
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    if backend == "torch":
+        return CrossEncoder(model_name)
+
+    export_dir, file_name = _export(
+        CrossEncoder, model_name, backend, cache_dir, quantization
+    )
+    model = CrossEncoder(
+        str(export_dir), backend="onnx", model_kwargs={"file_name": file_name}
+    )
+
+    if check_parity:
+        result = _check_once(
+            export_dir,
+            file_name,
+            lambda: rerank_parity(CrossEncoder(model_name), model),
+        )
+        if not _accept(result, model_name, file_name):
+            return CrossEncoder(model_name)
+    return model
+
+
+def _check_once(export_dir: Path, file_name: str, run) -> Dict[str, float]:
+    """
+    Parity result of file_name: from parity.json, or computed once and stored.
+    """
+    path = export_dir / "parity.json"
+    results = json.loads(path.read_text()) if path.exists() else {}
+    if file_name in results:
+        return results[file_name]
+
+    results[file_name] = run()
+    path.write_text(json.dumps(results, indent=2))
+    print(f"Parity vs PyTorch ({file_name}): {results[file_name]}")
+    return results[file_name]
+
+
+def _accept(result: Dict[str, float], model_name: str, file_name: str) -> bool:
+    failures = parity_failures(result)
+    if failures:
+        print(
+            f"Warning: {model_name} ({file_name}) fails parity vs PyTorch "
+            f"({'; '.join(failures)}), falling back to the PyTorch backend."
+        )
+    return not failures
+
+
+def parity_failures(
+    result: Dict[str, float],
+    min_cosine: float = ONNX_PARITY_MIN_COSINE,
+    max_rerank_drift: float = ONNX_PARITY_MAX_RERANK_DRIFT,
+    min_rank_correlation: float = ONNX_PARITY_MIN_RANK_CORR,
+) -> List[str]:
+    """
+    Gates an embedding_parity / rerank_parity result misses (empty: usable).
+    """
+    failures = []
+    if "min_cosine" in result and not result["min_cosine"] >= min_cosine:
+        failures.append(f"min_cosine {result['min_cosine']:.4f} < {min_cosine}")
+    if "max_abs_drift" in result and not result["max_abs_drift"] <= max_rerank_drift:
+        failures.append(f"max_abs_drift {result['max_abs_drift']:.4f} > {max_rerank_drift}")
+    if "rank_correlation" in result and not result["rank_correlation"] >= min_rank_correlation:
+        failures.append(
+            f"rank_correlation {result['rank_correlation']:.3f} < {min_rank_correlation}"
+        )
+    return failures
+
+
+# ------------------------------------------------------------
+# Parity checks
+# ------------------------------------------------------------
+
+def embedding_parity(
+    reference,
+    candidate,
+    texts: Optional[Sequence[str]] = None,
+) -> Dict[str, float]:
+    """
+    Cosine similarity between reference and candidate embeddings of the same texts.
+    """
+    texts = list(texts or PARITY_TEXTS)
+    a = np.asarray(reference.encode(texts), dtype=np.float32)
+    b = np.asarray(candidate.encode(texts), dtype=np.float32)
+
+    cos = np.sum(a * b, axis=1) / (
+        np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-12
+    )
+    return {"min_cosine": float(cos.min()), "mean_cosine": float(cos.mean())}
+
+
+def rerank_parity(
+    reference,
+    candidate,
+    pairs: Optional[List[Tuple[str, str]]] = None,
+) -> Dict[str, float]:
+    """
+    Score drift and ranking agreement of two cross-encoders on the same pairs.
+    """
+    if pairs is None:
+        query = PARITY_TEXTS[0]
+        pairs = [(query, text) for text in PARITY_TEXTS[1:]]
+    pairs = [list(p) for p in pairs]
+
+    a = np.asarray(reference.predict(pairs), dtype=np.float64)
+    b = np.asarray(candidate.predict(pairs), dtype=np.float64)
+
+    # Spearman on ranks (no ties expected from continuous scores)
+    ranks_a = np.argsort(np.argsort(-a))
+    ranks_b = np.argsort(np.argsort(-b))
+    rank_corr = float(np.corrcoef(ranks_a, ranks_b)[0, 1]) if len(pairs) > 1 else 1.0
+
+    return {
+        "max_abs_drift": float(np.max(np.abs(a - b))),
+        "mean_abs_drift": float(np.mean(np.abs(a - b))),
+        "rank_correlation": rank_corr,
+        "top1_agrees": float(np.argmax(a) == np.argmax(b)),
+    }
@@ -0,0 +1,97 @@
+import math
+from collections import deque
+from typing import Deque, Optional
+
+from config import RECALL_LOG, RECALL_MAX_DEPTH, RECALL_MAX_ROUNDS, RECALL_OVERSAMPLE
+
+
+class AdaptiveRecallController:
+    """
+    Chooses how many neighbors search_chunks asks the vector index for.
+
+    The goal is `oversample * k` in-scope candidates for the reranker:
+    - pre-filtered backends only score in-scope chunks, so the depth is
+      capped by the scope size (no over-fetch when Phase I kept few papers)
+    - post-filtered backends return chunks of any paper, so the depth is
+      divided by the filter selectivity (no under-fetch on selective filters)
+
+    If a round still yields fewer than `min_oversample * k` in-scope chunks
+    (and the index was not exhausted), the depth is multiplied by
+    widen_factor, up to max_rounds extra round-trips.
+    """
+
+    def __init__(
+        self,
+        oversample: float = RECALL_OVERSAMPLE,
+        min_oversample: float = 2.0,
+        widen_factor: float = 2.0,
+        max_depth: int = RECALL_MAX_DEPTH,
+        max_rounds: int = RECALL_MAX_ROUNDS,
+        verbose: bool = RECALL_LOG,
+        history_size: int = 1000,
+    ):
+        self.oversample = oversample
+        self.min_oversample = min_oversample
+        self.widen_factor = widen_factor
+        self.max_depth = max_depth
+        self.max_rounds = max_rounds
+        self.verbose = verbose
+
+        # (depth, extra round-trips) of the last history_size queries, for analysis
+        self.history: Deque[tuple] = deque(maxlen=history_size)
+
+    def target(self, k: int) -> int:
+        """
+        In-scope candidates handed to the reranker.
+        """
+        return max(k, int(math.ceil(self.oversample * k)))
+
+    def initial_depth(
+        self,
+        k: int,
+        scope_size: Optional[int] = None,
+        selectivity: float = 1.0,
+        prefiltered: bool = False,
+        target: Optional[int] = None,
+    ) -> int:
+        """
+        First depth to ask for; target defaults to target(k) (pass k when
+        the rows are not reranked, e.g. metadata search).
+        """
+        target = self.target(k) if target is None else target
+        if prefiltered:
+            depth = target if scope_size is None else min(target, scope_size)
+        else:
+            # About depth * selectivity of the returned rows will be in scope
+            depth = int(math.ceil(target / max(selectivity, 1e-3)))
+        return max(1, min(depth, self.max_depth))
+
+    def should_widen(
+        self,
+        k: int,
+        in_scope: int,
+        returned: int,
+        depth: int,
+        rounds: int,
+        scope_size: Optional[int] = None,
+        needed: Optional[int] = None,
+    ) -> bool:
+        if needed is None:
+            needed = int(math.ceil(self.min_oversample * k))
+        if scope_size is not None:
+            needed = min(needed, scope_size)
+        return (
+            in_scope < needed
+            and returned >= depth  # fewer rows than asked: index exhausted
+            and depth < self.max_depth
+            and rounds < self.max_rounds
+        )
+
+    def widen(self, depth: int) -> int:
+        return min(self.max_depth, int(math.ceil(depth * self.widen_factor)))
+
+    def record(self, depth: int, rounds: int, scope_size: Optional[int], selectivity: float) -> None:
+        self.history.append((depth, rounds))
+        if self.verbose:
+            scope = f"{scope_size} chunks" if scope_size is not None else f"{selectivity:.1%} of corpus"
+            print(f"[recall] depth={depth} (scope: {scope}), extra round-trips={rounds}")
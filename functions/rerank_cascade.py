@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from functions.retrieval_batch import RetrievalBatch
+from functions.sparse_index import tokenize
+
+STAGES = ("recall", "rescore", "cross_encoder")
+
+
+class RerankCascade:
+    """
+    Three-stage reranking for SimilaritySearchEngine.search_chunks.
+
+    1. recall        : vector / BM25 / RRF score the candidates arrive with
+    2. rescore       : cheap blend of the (min-max scaled) recall score and
+                       query-term overlap with the chunk
+    3. cross_encoder : only the top_m = top_m_factor * k survivors of stage 2
+
+    Early exit: if the stage-2 gap between the k-th and the (k+1)-th
+    candidate is at least early_exit_margin, the top-k set is considered
+    decided and stage 3 is skipped (scores then come from stage 2).
+
+    Per-stage latency, candidates in/out and early exits are kept in
+    self.stats; report() prints them.
+    """
+
+    def __init__(
+        self,
+        top_m_factor: float = 2.0,
+        lexical_weight: float = 0.5,
+        early_exit_margin: float = 0.25,
+    ):
+        self.top_m_factor = top_m_factor
+        self.lexical_weight = lexical_weight
+        self.early_exit_margin = early_exit_margin
+
+        self.stats: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"calls": 0, "in": 0, "out": 0, "seconds": 0.0}
+        )
+        self.queries = 0
+        self.early_exits = 0
+        # Concurrent searches (async serving) update the counters from worker threads
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, n_in: int, n_out: int, seconds: float) -> None:
+        with self._lock:
+            s = self.stats[stage]
+            s["calls"] += 1
+            s["in"] += n_in
+            s["out"] += n_out
+            s["seconds"] += seconds
+
+    # ------------------------------------------------------------
+    # Stage 2
+    # ------------------------------------------------------------
+
+    def rescore(self, query: str, candidates: RetrievalBatch) -> np.ndarray:
+        recall = candidates.scores("_recall_score")
+        recall = np.nan_to_num(recall, nan=np.nanmin(recall) if np.isfinite(recall).any() else 0.0)
+        spread = recall.max() - recall.min()
+        recall = (recall - recall.min()) / spread if spread > 0 else np.ones_like(recall)
+
+        terms = set(tokenize(query))
+        if terms:
+            lexical = np.array(
+                [len(terms.intersection(tokenize(c))) / len(terms) for c in candidates["content"]]
+            )
+        else:
+            lexical = np.zeros(len(candidates))
+
+        w = self.lexical_weight
+        return (1.0 - w) * recall + w * lexical
+
+    def _select(self, query: str, candidates: RetrievalBatch, k: int) -> Tuple[RetrievalBatch, bool]:
+        """
+        Stage 2 for one query: survivors ordered by cheap score, and whether
+        the top-k is already decided.
+        """
+        scores = self.rescore(query, candidates)
+        candidates.set_column("_cascade_score", scores)
+
+        order = np.argsort(-scores, kind="stable")
+        if len(order) <= k:
+            return candidates.take(order), False
+
+        gap = scores[order[k - 1]] - scores[order[k]]
+        if gap >= self.early_exit_margin:
+            return candidates.take(order[:k]), True
+
+        top_m = max(k, int(np.ceil(self.top_m_factor * k)))
+        return candidates.take(order[:top_m]), False
+
+    # ------------------------------------------------------------
+    # Full cascade
+    # ------------------------------------------------------------
+
+    def rerank_batch(
+        self,
+        queries: Sequence[str],
+        candidate_lists: List[RetrievalBatch],
+        k: int,
+        cross_encode: Callable[[List[str], List[RetrievalBatch]], List[np.ndarray]],
+        recall_seconds: float = 0.0,
+    ) -> List[RetrievalBatch]:
+        """
+        Runs stages 2-3 for every query; the cross-encoder is called once
+        for all undecided queries. Scores follow the engine convention
+        (negated relevance, ascending is better).
+        """
+        with self._lock:
+            self.queries += len(queries)
+        n_recalled = sum(len(c) for c in candidate_lists)
+        self.record("recall", n_recalled, n_recalled, recall_seconds)
+
+        start = time.perf_counter()
+        selections = [
+            self._select(query, candidates, k) if len(candidates) else (candidates, True)
+            for query, candidates in zip(queries, candidate_lists)
+        ]
+        n_survivors = sum(len(s) for s, decided in selections if not decided)
+        self.record(
+            "rescore",
+            n_recalled,
+            sum(len(s) for s, _ in selections),
+            time.perf_counter() - start,
+        )
+        with self._lock:
+            self.early_exits += sum(1 for s, decided in selections if decided and len(s))
+
+        undecided = [i for i, (s, decided) in enumerate(selections) if not decided]
+        if undecided:
+            start = time.perf_counter()
+            relevance = cross_encode(
+                [queries[i] for i in undecided],
+                [selections[i][0] for i in undecided],
+            )
+            n_kept = sum(min(k, len(selections[i][0])) for i in undecided)
+            self.record("cross_encoder", n_survivors, n_kept, time.perf_counter() - start)
+            for i, scores in zip(undecided, relevance):
+                selections[i][0].set_column("score", -np.asarray(scores, dtype=np.float64))
+
+        results = []
+        for survivors, decided in selections:
+            if decided:
+                survivors.set_column("score", -survivors.scores("_cascade_score"))
+            results.append(survivors.sort_by("score").head(k))
+        return results
+
+    def report(self) -> None:
+        print("Rerank cascade (candidates in -> out, total time):")
+        for name in STAGES:
+            s = self.stats[name]
+            pruned = 1.0 - s["out"] / s["in"] if s["in"] else 0.0
+            print(
+                f"  {name:<14} {int(s['in']):>7} -> {int(s['out']):<7} "
+                f"pruned {pruned:6.1%}  {s['seconds'] * 1000:8.1f} ms"
+            )
+        print(f"  early exits: {self.early_exits} of {self.queries} queries")
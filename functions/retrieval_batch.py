@@ -0,0 +1,223 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+
+class RetrievalRecord:
+    """
+    Row view into a RetrievalBatch; reads and writes go to the batch columns.
+
+    Supports the dict calls the agent code uses (r["paper_id"], r.get("title"),
+    r["title"] = ..., "content" in r), so existing consumers keep working.
+    """
+
+    __slots__ = ("_batch", "_i")
+
+    def __init__(self, batch: "RetrievalBatch", i: int):
+        self._batch = batch
+        self._i = i
+
+    def __getitem__(self, name: str) -> Any:
+        return self._batch.columns[name][self._i]
+
+    def get(self, name: str, default: Any = None) -> Any:
+        column = self._batch.columns.get(name)
+        return default if column is None else column[self._i]
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        if name not in self._batch.columns:
+            self._batch.columns[name] = [None] * len(self._batch)
+        self._batch.columns[name][self._i] = value
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._batch.columns
+
+    def keys(self) -> List[str]:
+        return list(self._batch.columns)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: col[self._i] for name, col in self._batch.columns.items()}
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+
+class RetrievalBatch:
+    """
+    Columnar retrieval results: parallel columns (paper_id, chunk_index,
+    content, score, ...) instead of one dict per neighbor.
+
+    Text columns are plain lists holding references to the original strings;
+    numeric columns (score, distance, ...) are float64 numpy arrays, so
+    sorting / slicing / filtering never builds per-row dicts.
+
+    Iterating yields RetrievalRecord views, and batch["paper_id"] returns a
+    whole column.
+    """
+
+    __slots__ = ("columns", "_n")
+
+    def __init__(self, columns: Optional[Dict[str, Sequence]] = None, n: Optional[int] = None):
+        self.columns: Dict[str, Union[list, np.ndarray]] = {}
+        for name, values in (columns or {}).items():
+            self.columns[name] = values if isinstance(values, np.ndarray) else list(values)
+
+        if n is None:
+            n = len(next(iter(self.columns.values()))) if self.columns else 0
+        self._n = n
+        for name, values in self.columns.items():
+            if len(values) != n:
+                raise ValueError(f"Column {name!r} has {len(values)} rows, expected {n}")
+
+    # ------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------
+
+    @classmethod
+    def from_records(cls, records, feature_names: Optional[List[str]] = None) -> "RetrievalBatch":
+        """
+        From a DataFrame, a list of dicts, or a list of rows in feature_names order.
+        """
+        if records is None:
+            return cls()
+        if isinstance(records, RetrievalBatch):
+            return records
+        if hasattr(records, "columns") and hasattr(records, "to_dict"):  # DataFrame
+            return cls({name: records[name].tolist() for name in records.columns}, n=len(records))
+
+        records = list(records)
+        if not records:
+            return cls()
+
+        first = records[0]
+        if isinstance(first, RetrievalRecord):
+            return cls.from_records([r.to_dict() for r in records])
+        if isinstance(first, dict):
+            names: Dict[str, None] = {}
+            for record in records:
+                names.update(dict.fromkeys(record))
+            return cls({name: [r.get(name) for r in records] for name in names}, n=len(records))
+        if isinstance(first, (list, tuple)):
+            if feature_names is None:
+                raise TypeError("feature_names are required for row lists")
+            columns = list(zip(*records))
+            return cls(
+                {name: list(col) for name, col in zip(feature_names, columns)},
+                n=len(records),
+            )
+        raise TypeError(f"Unsupported row type: {type(first)}")
+
+    @classmethod
+    def concat(cls, batches: Sequence["RetrievalBatch"]) -> "RetrievalBatch":
+        batches = [b for b in batches if len(b)]
+        if not batches:
+            return cls()
+        names: Dict[str, None] = {}
+        for b in batches:
+            names.update(dict.fromkeys(b.columns))
+
+        columns = {}
+        for name in names:
+            parts = [b.column(name) for b in batches]
+            if all(isinstance(p, np.ndarray) for p in parts):
+                columns[name] = np.concatenate(parts)
+            else:
+                columns[name] = [v for p in parts for v in p]
+        return cls(columns, n=sum(len(b) for b in batches))
+
+    # ------------------------------------------------------------
+    # Access
+    # ------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __bool__(self) -> bool:
+        return self._n > 0
+
+    def __iter__(self) -> Iterator[RetrievalRecord]:
+        return (RetrievalRecord(self, i) for i in range(self._n))
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        if isinstance(key, slice):
+            return self.take(range(self._n)[key])
+        if key < 0:
+            key += self._n
+        if not 0 <= key < self._n:
+            raise IndexError(key)
+        return RetrievalRecord(self, key)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.columns)
+
+    def column(self, name: str, default: Any = None):
+        """
+        Column values, or [default] * len(self) if the column is missing.
+        """
+        values = self.columns.get(name)
+        return [default] * self._n if values is None else values
+
+    def set_column(self, name: str, values) -> "RetrievalBatch":
+        values = values if isinstance(values, np.ndarray) else list(values)
+        if len(values) != self._n:
+            raise ValueError(f"Column {name!r} has {len(values)} rows, expected {self._n}")
+        self.columns[name] = values
+        return self
+
+    def scores(self, name: str = "score") -> np.ndarray:
+        """
+        Numeric column as float64 (missing / None -> NaN).
+        """
+        values = self.columns.get(name)
+        if values is None:
+            return np.full(self._n, np.nan)
+        if isinstance(values, np.ndarray) and values.dtype.kind == "f":
+            return values
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+    # ------------------------------------------------------------
+    # Selection
+    # ------------------------------------------------------------
+
+    def take(self, indices: Iterable[int]) -> "RetrievalBatch":
+        idx = np.asarray(list(indices) if not isinstance(indices, np.ndarray) else indices, dtype=np.int64)
+        columns = {}
+        for name, values in self.columns.items():
+            if isinstance(values, np.ndarray):
+                columns[name] = values[idx]
+            else:
+                columns[name] = [values[i] for i in idx.tolist()]
+        return RetrievalBatch(columns, n=len(idx))
+
+    def mask(self, keep) -> "RetrievalBatch":
+        return self.take(np.flatnonzero(np.asarray(keep, dtype=bool)))
+
+    def head(self, n: int) -> "RetrievalBatch":
+        return self if n >= self._n else self.take(range(n))
+
+    def sort_by(self, name: str = "score") -> "RetrievalBatch":
+        """
+        Ascending (the engine's convention: lower score is better); missing last.
+        """
+        values = self.scores(name)
+        order = np.argsort(np.where(np.isnan(values), np.inf, values), kind="stable")
+        return self.take(order)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """
+        Plain dicts (JSON / UI boundary only).
+        """
+        names = list(self.columns)
+        cols = [
+            self.columns[n].tolist() if isinstance(self.columns[n], np.ndarray) else self.columns[n]
+            for n in names
+        ]
+        return [dict(zip(names, row)) for row in zip(*cols)] if names else []
+
+    def __repr__(self) -> str:
+        preview = ", ".join(repr(r) for r in self.head(2))
+        more = f", ... ({self._n} rows)" if self._n > 2 else ""
+        return f"RetrievalBatch([{preview}{more}])"
@@ -3,6 +3,10 @@ from networkx import neighbors
 import numpy as np
 from sklearn import neighbors
 
+from config import METADATA_SNAPSHOT_DIR
+from functions.metadata_snapshot import MetadataSnapshot
+from functions.worker_pool import run_in_worker
+
 
 class SimilaritySearchEngine:
     """
@@ -38,17 +42,20 @@ class SimilaritySearchEngine:
         self.embedding_model = embedding_model
         self.metadata_fv = metadata_feature_view
         self.chunk_fv = chunk_feature_view
-        self.paper_id_to_title = {}
+        self.metadata_snapshot = None
         try:
-            rows = self.metadata_fv.read()
-            for _, row in rows.iterrows():
-                pid = row.get("paper_id")
-                title = row.get("title")
-                if pid and title:
-                    self.paper_id_to_title[pid] = title
+            self.metadata_snapshot = MetadataSnapshot.open_or_build(
+                METADATA_SNAPSHOT_DIR, self.metadata_fv
+            )
         except Exception:
             # fail silently: title is optional
-            self.paper_id_to_title = {}
+            self.metadata_snapshot = None
+
+    @property
+    def paper_id_to_title(self):
+        if self.metadata_snapshot is None:
+            return {}
+        return self.metadata_snapshot.titles
 
     def _row_to_dict(self, row, feature_names):
         """
@@ -106,6 +113,8 @@ class SimilaritySearchEngine:
             raise TypeError(f"Unsupported neighbors type: {type(neighbors)}")
 
     def _embed_query(self, query: str) -> np.ndarray:
+        if hasattr(self.embedding_model, "encode_query"):
+            return self.embedding_model.encode_query(query)
         embedding = self.embedding_model.encode(query)
         return embedding
 
@@ -198,7 +207,7 @@ class SimilaritySearchEngine:
             results.append(
                 {
                     "paper_id": paper_id,
-                    "title": self.paper_id_to_title.get(paper_id), 
+                    "title": self.paper_id_to_title.get(paper_id) or None,
                     "chunk_index": row.get("chunk_index"),
                     "content": content,
                     "score": row.get("distance", 1.0 / (rank + 1)),
@@ -207,4 +216,12 @@ class SimilaritySearchEngine:
 
         return results
 
+    # ------------------------------------------------------------
+    # Async API: same results, blocking work runs on the shared worker pool
+    # ------------------------------------------------------------
+
+    async def search_metadata_async(self, query: str, k: int = 5):
+        return await run_in_worker(self.search_metadata, query, k=k)
 
+    async def search_chunks_async(self, query: str, k: int = 20, paper_ids=None):
+        return await run_in_worker(self.search_chunks, query, k=k, paper_ids=paper_ids)
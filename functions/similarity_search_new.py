@@ -1,6 +1,21 @@
-from typing import List, Optional, Dict, Any
+import hashlib
+import time
+from typing import List, Optional, Dict, Any, Tuple
 import numpy as np
-from sentence_transformers import CrossEncoder 
+from config import (
+    EMBEDDING_MODEL_NAME,
+    FILTER_PUSHDOWN_MAX_IDS,
+    INFERENCE_BACKEND,
+    METADATA_SNAPSHOT_DIR,
+)
+from functions.lru_cache import LRUCache
+from functions.metadata_filter import MetadataFilterIndex
+from functions.metadata_snapshot import MetadataSnapshot
+from functions.onnx_backend import load_reranker
+from functions.recall_controller import AdaptiveRecallController
+from functions.retrieval_batch import RetrievalBatch
+from functions.sparse_index import reciprocal_rank_fusion
+from functions.worker_pool import run_in_worker
 
 
 class SimilaritySearchEngine:
@@ -9,9 +24,9 @@ class SimilaritySearchEngine:
 
     Responsibilities:
     - Embed query
-    - Perform initial vector similarity search (Recall)
+    - Perform initial vector (+ optional BM25) similarity search (Recall)
     - Perform Cross-Encoder reranking (Precision)
-    - Return structured retrieval results
+    - Return structured retrieval results (one columnar RetrievalBatch per query)
     """
 
     def __init__(
@@ -21,230 +36,653 @@ class SimilaritySearchEngine:
         chunk_feature_view,
         embedding_col_name: str = "embedding",
         reranker_model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        reranker_backend: str = INFERENCE_BACKEND,
+        embedding_model_name: str = EMBEDDING_MODEL_NAME,
+        query_cache_size: int = 1024,
+        rerank_cache_size: int = 16384,
+        sparse_index=None,
+        rrf_k: int = 60,
+        rerank_cascade=None,
+        metadata_snapshot_dir: str = METADATA_SNAPSHOT_DIR,
+        recall_controller: Optional[AdaptiveRecallController] = None,
     ):
         self.embedding_model = embedding_model
         self.metadata_fv = metadata_feature_view
         self.chunk_fv = chunk_feature_view
         self.embedding_col_name = embedding_col_name
+        self.embedding_model_name = embedding_model_name
+
+        # (model name, normalized query) -> query embedding
+        self.query_cache = LRUCache(query_cache_size)
+
+        # (query hash, paper_id, chunk_index, content hash) -> cross-encoder score
+        self.rerank_cache = LRUCache(rerank_cache_size)
+
+        # Optional BM25Index: hybrid recall, fused with dense results via RRF
+        self.sparse_index = sparse_index
+        self.rrf_k = rrf_k
+
+        # Picks the dense recall depth per query (replaces the fixed k*5)
+        self.recall_controller = recall_controller or AdaptiveRecallController()
+
+        # Optional RerankCascade: cross-encoder only on the top-M cheap-score survivors
+        self.rerank_cascade = rerank_cascade
+
+        # Cleared if the vector DB rejects a paper_id filter (post-filter only)
+        self._filter_pushdown = True
         
         # --- 初始化 Reranker ---
-        print(f"Loading Reranker model: {reranker_model_name}...")
-        self.reranker = CrossEncoder(reranker_model_name)
+        print(f"Loading Reranker model: {reranker_model_name} ({reranker_backend})...")
+        self.reranker = load_reranker(reranker_model_name, reranker_backend)
         
-        self.paper_id_to_title = {}
+        # Titles come from a local memory-mapped snapshot (refreshed in the
+        # background) instead of reading the whole metadata view at startup
+        self.metadata_snapshot = None
+        self._filter_index = None
         try:
-            print("Caching paper titles from Metadata Feature View...")
-            
-            # vvvvvvvvvvvvvvv [修改点] vvvvvvvvvvvvvvv
-            # 使用 .query.read() 绕过 Training Dataset 检查，直接读源数据
-            rows = self.metadata_fv.query.read()
-            # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
-            
-            # 兼容 DataFrame 遍历
-            if hasattr(rows, "iterrows"):
-                for _, row in rows.iterrows():
-                    self._cache_title(row)
-            else:
-                for row in rows:
-                    self._cache_title(row)
-            print(f"Successfully cached {len(self.paper_id_to_title)} titles.")
-            
+            self.metadata_snapshot = MetadataSnapshot.open_or_build(
+                metadata_snapshot_dir, self.metadata_fv
+            )
+            print(f"Loaded metadata snapshot v{self.metadata_snapshot.version} "
+                  f"({len(self.metadata_snapshot)} papers).")
         except Exception as e:
-            print(f"Warning: Failed to cache paper titles: {e}")
-            # 保持为空，防止程序崩溃
-            self.paper_id_to_title = {}
-
-    def _cache_title(self, row):
-        # 辅助方法：从行数据中提取 title 并缓存
-        if isinstance(row, dict):
-            pid = row.get("paper_id")
-            title = row.get("title")
-        else: # pandas Series
-            pid = row.get("paper_id")
-            title = row.get("title")
-        
-        if pid and title:
-            self.paper_id_to_title[pid] = title
+            print(f"Warning: Failed to load paper titles: {e}")
 
-    def _row_to_dict(self, row, feature_names):
-        if isinstance(row, dict):
-            return row
-        if isinstance(row, (list, tuple)):
-            return dict(zip(feature_names, row))
-        raise TypeError(f"Unsupported row type: {type(row)}")
+    @property
+    def paper_id_to_title(self):
+        # Re-resolved on every access so a background refresh is picked up
+        if self.metadata_snapshot is None:
+            return {}
+        return self.metadata_snapshot.titles
 
-    def _normalize_neighbors(self, neighbors, feature_view):
+    @property
+    def filter_index(self) -> MetadataFilterIndex:
         """
-        Normalize hsfs find_neighbors output into list[dict].
+        year / item_type / authors bitmaps, rebuilt when the snapshot version changes.
+        """
+        if self.metadata_snapshot is None:
+            raise ValueError("Metadata filters need the metadata snapshot")
+        version = self.metadata_snapshot.version
+        if self._filter_index is None or self._filter_index[0] != version:
+            self._filter_index = (version, MetadataFilterIndex.from_snapshot(self.metadata_snapshot))
+        return self._filter_index[1]
+
+    def _filter_paper_ids(self, filter_expr: Optional[str], paper_ids=None):
+        """
+        Resolve filter_expr to the allowed paper_ids (intersected with paper_ids).
+        None means unrestricted; an empty list means nothing can match.
+        """
+        if not filter_expr:
+            return paper_ids
+        allowed = self.filter_index.select(filter_expr)
+        if paper_ids:
+            allowed = set(allowed)
+            return [pid for pid in paper_ids if pid in allowed]
+        return allowed
+
+    def _normalize_neighbors(self, neighbors, feature_view) -> RetrievalBatch:
+        """
+        Normalize hsfs find_neighbors output into a RetrievalBatch.
         Contains fix for list[list] vs list[Row] confusion.
         """
         if neighbors is None:
-            return []
-        
-        if isinstance(neighbors, list) and len(neighbors) == 0:
-            return []
+            return RetrievalBatch()
 
-        feature_names = [f.name for f in feature_view.schema]
-        rows = []
+        if isinstance(neighbors, RetrievalBatch):
+            return neighbors
 
-        # DataFrame format
+        if isinstance(neighbors, list) and len(neighbors) == 0:
+            return RetrievalBatch()
+
+        # DataFrame format: columns are taken as-is (no iterrows)
         if hasattr(neighbors, "iterrows"):
-            for _, row in neighbors.iterrows():
-                rows.append(row.to_dict())
-            return rows
+            return RetrievalBatch.from_records(neighbors)
 
         # List format handling
         if isinstance(neighbors, list):
+            feature_names = [f.name for f in feature_view.schema]
+
             # Check for nested batch results
-            should_flatten = False
             first_neighbor = neighbors[0]
             if isinstance(first_neighbor, list) and len(first_neighbor) > 0:
-                 if isinstance(first_neighbor[0], (list, dict, tuple)):
-                     should_flatten = True
-            
-            if should_flatten:
-                for sub in neighbors:
-                    for row in sub:
-                        rows.append(self._row_to_dict(row, feature_names))
-                return rows
-            
-            # Single query results
-            for row in neighbors:
-                rows.append(self._row_to_dict(row, feature_names))
-            return rows
+                if isinstance(first_neighbor[0], (list, dict, tuple)):
+                    neighbors = [row for sub in neighbors for row in sub]
+
+            return RetrievalBatch.from_records(neighbors, feature_names)
 
         raise TypeError(f"Unsupported neighbors type: {type(neighbors)}")
 
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        return " ".join(query.lower().split())
+
     def _embed_query(self, query: str) -> np.ndarray:
-        return self.embedding_model.encode(query)
+        key = (self.embedding_model_name, self._normalize_query(query))
+        return self.query_cache.get_or_compute(key, lambda: self._encode_query(query))
+
+    def _encode_query(self, query: str) -> np.ndarray:
+        # EmbeddingService coalesces concurrent queries into one model call
+        if hasattr(self.embedding_model, "encode_query"):
+            embedding = self.embedding_model.encode_query(query)
+        else:
+            embedding = self.embedding_model.encode(query)
+
+        # Shared between callers via the cache: keep it immutable
+        embedding = np.asarray(embedding, dtype=np.float32)
+        embedding.setflags(write=False)
+        return embedding
+
+    def _embedding_column(self, rows: RetrievalBatch):
+        """
+        Stored embeddings of a batch (None entries if the store did not return one).
+        """
+        if self.embedding_col_name in rows.columns:
+            return rows.columns[self.embedding_col_name]
+        # Try to find a column holding list-like values
+        for values in rows.columns.values():
+            if any(isinstance(v, (list, np.ndarray)) and len(v) > 10 for v in values):
+                return values
+        return rows.column(self.embedding_col_name)
 
-    def _compute_distance_fallback(self, query_emb: np.ndarray, row: Dict[str, Any]) -> float:
+    def _cosine_distances(self, query_emb: np.ndarray, rows: RetrievalBatch) -> np.ndarray:
         """
-        Fallback: Calculate Cosine Distance manually if Hopsworks returns None.
+        Fallback when Hopsworks returns no distance: cosine distance of the query
+        to every row in one matmul (inf where a row has no usable embedding).
         Used primarily for metadata search where reranking might be overkill.
+
+        Always computed from the embeddings the store just returned, so a
+        re-embedded abstract or chunk is never scored with an old vector.
         """
-        target_emb_list = row.get(self.embedding_col_name)
-        if target_emb_list is None:
-            # Try to find list-like values in dict
-            for val in row.values():
-                if isinstance(val, (list, np.ndarray)) and len(val) > 10:
-                    target_emb_list = val
-                    break
-        
-        if target_emb_list is None:
-            return float("inf")
+        distances = np.full(len(rows), np.inf)
+
+        query = np.asarray(query_emb, dtype=np.float32).reshape(-1)
+        norm_q = np.linalg.norm(query)
+        if norm_q == 0:
+            return distances
+
+        embeddings = self._embedding_column(rows)
+        positions = [
+            i for i, raw in enumerate(embeddings)
+            if raw is not None and np.size(raw) == query.shape[0]
+        ]
+        if not positions:
+            return distances
+
+        matrix = np.asarray([embeddings[i] for i in positions], dtype=np.float32)
+        matrix = matrix.reshape(len(positions), -1)
+        norms = np.linalg.norm(matrix, axis=1)
+        valid = norms > 0
+        # Cosine Distance = 1 - Cosine Similarity
+        similarities = (matrix[valid] @ query) / (norms[valid] * norm_q)
+        distances[np.asarray(positions)[valid]] = 1.0 - similarities
+        return distances
+
+    def _embed_queries(self, queries: List[str]) -> List[np.ndarray]:
+        """
+        Batch version of _embed_query: cache misses go through one encode call.
+        A single query goes through _embed_query, so concurrent requests are
+        still coalesced by EmbeddingService.encode_query.
+        """
+        if len(queries) == 1:
+            return [self._embed_query(queries[0])]
+
+        keys = [(self.embedding_model_name, self._normalize_query(q)) for q in queries]
+        embeddings = [self.query_cache.get(key) for key in keys]
+
+        missing: Dict[Any, int] = {}
+        for i, (key, embedding) in enumerate(zip(keys, embeddings)):
+            if embedding is None and key not in missing:
+                missing[key] = i
+
+        if len(missing) == 1:
+            i = next(iter(missing.values()))
+            vector = self._embed_query(queries[i])
+            embeddings = [e if e is not None else vector for e in embeddings]
+        elif missing:
+            encoded = self.embedding_model.encode([queries[i] for i in missing.values()])
+            fresh = {}
+            for key, vector in zip(missing, encoded):
+                vector = np.asarray(vector, dtype=np.float32)
+                vector.setflags(write=False)
+                self.query_cache.put(key, vector)
+                fresh[key] = vector
+            embeddings = [e if e is not None else fresh[key] for key, e in zip(keys, embeddings)]
+
+        return embeddings
+
+    def _find_neighbors_batch(self, feature_view, embeddings, k: int, paper_ids=None):
+        """
+        One RetrievalBatch per query embedding.
+        """
+        if hasattr(feature_view, "find_neighbors_batch"):
+            # Local index: one matrix-matrix product for all queries
+            batches = feature_view.find_neighbors_batch(
+                np.vstack(embeddings),
+                k=k,
+                paper_ids=paper_ids,
+            )
+        else:
+            # hsfs Feature Views take a single query vector per call.
+            # paper_ids go down as a vector-DB filter when the view can express
+            # one; callers still post-filter (and over-fetch) in python.
+            flt = self._paper_id_filter(feature_view, paper_ids) if paper_ids else None
+            batches = [self._hsfs_neighbors(feature_view, e, k, flt) for e in embeddings]
 
+        return [self._normalize_neighbors(n, feature_view) for n in batches]
+
+    def _paper_id_filter(self, feature_view, paper_ids):
+        """
+        hsfs filter "paper_id in paper_ids" on the view's embedding Feature
+        Group, or None when it cannot be built (or pushdown was disabled).
+        """
+        if not self._filter_pushdown or len(paper_ids) > FILTER_PUSHDOWN_MAX_IDS:
+            return None
+        try:
+            feature_group = feature_view.query._left_feature_group
+            return feature_group.get_feature("paper_id").isin(list(paper_ids))
+        except Exception:
+            return None
+
+    def _hsfs_neighbors(self, feature_view, embedding, k: int, flt=None):
+        if flt is None:
+            return feature_view.find_neighbors(embedding, k=k)
         try:
-            target_emb = np.array(target_emb_list)
-            norm_q = np.linalg.norm(query_emb)
-            norm_t = np.linalg.norm(target_emb)
-            if norm_q == 0 or norm_t == 0:
-                return float("inf")
-            
-            # Cosine Distance = 1 - Cosine Similarity
-            return 1.0 - np.dot(query_emb, target_emb) / (norm_q * norm_t)
-        except:
-            return float("inf")
-
-    def search_metadata(self, query: str, k: int = 5):
+            return feature_view.find_neighbors(embedding, k=k, filter=flt)
+        except Exception as e:
+            print(f"Warning: vector DB rejected the paper_id filter, post-filtering instead: {e}")
+            self._filter_pushdown = False
+            return feature_view.find_neighbors(embedding, k=k)
+
+    def search_metadata(self, query: str, k: int = 5, filter_expr: Optional[str] = None):
         """
         Searches paper metadata. 
         Uses standard vector search (lightweight).
+        filter_expr: e.g. "year >= 2023 and item_type = journalArticle"
         """
-        query_embedding = self._embed_query(query)
+        return self.search_metadata_batch([query], k=k, filter_expr=filter_expr)[0]
 
-        neighbors = self.metadata_fv.find_neighbors(
-            query_embedding,
-            k=k,
+    def search_metadata_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filter_expr: Optional[str] = None,
+    ) -> List[RetrievalBatch]:
+        """
+        search_metadata for several queries: one encode call and one
+        batched vector search. Returns one RetrievalBatch
+        (paper_id, title, abstract, score) per query.
+        """
+        if not queries:
+            return []
+
+        paper_ids = self._filter_paper_ids(filter_expr)
+        if paper_ids is not None and not paper_ids:
+            return [RetrievalBatch() for _ in queries]
+
+        query_embeddings = self._embed_queries(queries)
+        row_lists = self._recall_metadata(query_embeddings, k, paper_ids)
+
+        all_results = []
+        for query_embedding, rows in zip(query_embeddings, row_lists):
+            # Use DB distance or compute manually (all missing ones in one matmul)
+            scores = self._vector_scores(rows).copy()
+            missing = np.flatnonzero(np.isnan(scores))
+            if len(missing):
+                scores[missing] = self._cosine_distances(query_embedding, rows.take(missing))
+
+            all_results.append(RetrievalBatch(
+                {
+                    "paper_id": rows.column("paper_id"),
+                    "title": rows.column("title"),
+                    "abstract": rows.column("abstract"),
+                    "score": scores,
+                },
+                n=len(rows),
+            ))
+
+        return all_results
+
+    def _recall_metadata(self, query_embeddings, k: int, paper_ids=None) -> List[RetrievalBatch]:
+        """
+        Top-k metadata rows per query, restricted to paper_ids.
+
+        Pre-filtering backends (local index) only scan those papers. Others
+        post-filter, so the depth is divided by the filter selectivity and
+        widened until k rows survive (same controller as _recall_chunks).
+        """
+        if paper_ids is None or getattr(self.metadata_fv, "supports_prefilter", False):
+            # Pre-filter: only the papers passing filter_expr are scanned
+            return self._find_neighbors_batch(
+                self.metadata_fv, query_embeddings, k, paper_ids=paper_ids
+            )
+
+        controller = self.recall_controller
+        allowed = set(paper_ids)
+        corpus = len(self.metadata_snapshot) if self.metadata_snapshot is not None else 0
+        selectivity = min(1.0, len(allowed) / corpus) if corpus else 1.0
+        needed = min(k, len(allowed))
+        # With the filter pushed down every returned row is already in scope
+        pushed_down = self._paper_id_filter(self.metadata_fv, paper_ids) is not None
+        depth = controller.initial_depth(
+            k, selectivity=1.0 if pushed_down else selectivity, target=k
         )
-        
-        rows = self._normalize_neighbors(neighbors, self.metadata_fv)
-        results = []
-
-        for row in rows:
-            # Use DB distance or compute manually
-            score = row.get("distance", row.get("score"))
-            if score is None:
-                score = self._compute_distance_fallback(query_embedding, row)
-
-            results.append({
-                "paper_id": row.get("paper_id"),
-                "title": row.get("title"),
-                "abstract": row.get("abstract"),
-                "score": score,
-            })
-            
-        return results
-
-    def search_chunks(self, query: str, k: int = 20, paper_ids=None):
+
+        def fetch(embeddings, depth):
+            return self._find_neighbors_batch(
+                self.metadata_fv, embeddings, depth, paper_ids=paper_ids
+            )
+
+        def in_scope(rows: RetrievalBatch) -> RetrievalBatch:
+            return rows.mask([pid in allowed for pid in rows.column("paper_id")])
+
+        raw = fetch(query_embeddings, depth)
+        row_lists = [in_scope(rows) for rows in raw]
+        depths = [depth] * len(raw)
+        rounds = [0] * len(raw)
+
+        while True:
+            needy = [
+                i for i in range(len(raw))
+                if controller.should_widen(
+                    k, len(row_lists[i]), len(raw[i]), depths[i], rounds[i], needed=needed
+                )
+            ]
+            if not needy:
+                break
+            wider = controller.widen(depths[needy[0]])
+            for i, rows in zip(needy, fetch([query_embeddings[i] for i in needy], wider)):
+                raw[i], row_lists[i] = rows, in_scope(rows)
+                depths[i] = wider
+                rounds[i] += 1
+
+        return [rows.head(k) for rows in row_lists]
+
+    @staticmethod
+    def _vector_scores(rows: RetrievalBatch) -> np.ndarray:
+        """
+        Store distance (or score) column as float64; NaN where it is missing.
+        """
+        return rows.scores("distance" if "distance" in rows.columns else "score")
+
+    def search_chunks(
+        self,
+        query: str,
+        k: int = 20,
+        paper_ids=None,
+        filter_expr: Optional[str] = None,
+    ):
         """
         Searches full text chunks with Reranking.
-        1. Recall: Retrieve k*5 candidates via Vector Search.
+        1. Recall: Retrieve ~k*5 in-scope candidates via Vector Search, with
+           an adaptive depth (fused with BM25 matches when a sparse_index is set).
         2. Rerank: Re-score using Cross-Encoder.
         """
-        # 1. Expand retrieval window for Reranking (Recall Phase)
-        initial_k = k * 5
-        query_embedding = self._embed_query(query)
+        return self.search_chunks_batch(
+            [query], k=k, paper_ids=paper_ids, filter_expr=filter_expr
+        )[0]
 
-        # Note: 'filter' parameter usage depends on HSFS version/backend. 
-        # If supported, use it. If not, we filter in python (less efficient but safe).
-        neighbors = self.chunk_fv.find_neighbors(
-            query_embedding,
-            k=initial_k,
-        )
+    def search_chunks_batch(
+        self,
+        queries: List[str],
+        k: int = 20,
+        paper_ids=None,
+        filter_expr: Optional[str] = None,
+    ) -> List[RetrievalBatch]:
+        """
+        search_chunks for several queries (paper_ids / filter_expr shared by all).
+        One encode call, one batched vector search and a single
+        Cross-Encoder predict over every (query, chunk) pair.
+        """
+        if not queries:
+            return []
 
-        rows = self._normalize_neighbors(neighbors, self.chunk_fv)
-        
-        # 2. Filter & Prepare candidates
-        candidates = []
-        
-        for row in rows:
-            # Paper ID Filter
-            if paper_ids and row.get("paper_id") not in paper_ids:
-                continue
+        if filter_expr:
+            # Structured constraints narrow paper_ids before any vector work
+            paper_ids = self._filter_paper_ids(filter_expr, paper_ids)
+            if not paper_ids:
+                return [RetrievalBatch() for _ in queries]
 
-            content = row.get("content")
-            if not content or not str(content).strip():
-                continue
-            
-            # Prepare obj for results
-            candidate = {
-                "paper_id": row.get("paper_id"),
-                "title": self.paper_id_to_title.get(row.get("paper_id"), "Unknown"),
-                "chunk_index": row.get("chunk_index"),
-                "content": content,
-                # Temporary store original vector score if needed
-                "_vector_score": row.get("distance", row.get("score")), 
-            }
-            candidates.append(candidate)
+        # 1. Recall Phase: depth chosen from the scope / filter selectivity
+        recall_start = time.perf_counter()
+        target = self.recall_controller.target(k)
+        query_embeddings = self._embed_queries(queries)
+        row_lists = self._recall_chunks(query_embeddings, k, paper_ids)
 
-        if not candidates:
-            return []
+        if self.sparse_index is not None:
+            # Hybrid recall: exact keyword matches (e.g. PCG acronyms) the
+            # dense search misses, fused with it before the reranker
+            row_lists = [
+                self._fuse_sparse(query, rows, target, paper_ids or None)
+                for query, rows in zip(queries, row_lists)
+            ]
+
+        # 2. Prepare candidates (rows are already in scope)
+        candidate_lists = [self._chunk_candidates(rows) for rows in row_lists]
+
+        if self.rerank_cascade is not None:
+            return self.rerank_cascade.rerank_batch(
+                queries,
+                candidate_lists,
+                k,
+                cross_encode=self._rerank,
+                recall_seconds=time.perf_counter() - recall_start,
+            )
 
         # 3. Reranking Phase (Precision Phase)
-        # Construct pairs: [[query, doc1], [query, doc2], ...]
-        rerank_pairs = [[query, c["content"]] for c in candidates]
-        
-        # Predict scores (scores are "relevance", higher is better, can be negative or positive)
+        # Every (query, chunk) pair of every query goes through one predict call.
+        # Scores are "relevance", higher is better, can be negative or positive
         # e.g., 7.5, -2.1, 0.5
-        rerank_scores = self.reranker.predict(rerank_pairs)
+        rerank_scores = self._rerank(queries, candidate_lists)
 
         # 4. Assign new scores and Sort
-        for i, candidate in enumerate(candidates):
-            relevance_score = float(rerank_scores[i])
-            
+        all_results = []
+        for candidates, relevance in zip(candidate_lists, rerank_scores):
             # CRITICAL ADAPTATION FOR CONTEXT BUILDER:
             # Your ContextBuilder sorts by 'score' in ASCENDING order (low is better).
             # CrossEncoder outputs RELEVANCE (high is better).
             # Solution: We negate the relevance score. 
             # High relevance (8.0) becomes (-8.0), which sorts before low relevance (1.0 -> -1.0).
-            candidate["score"] = -relevance_score
-            
-            # Optional: Keep the raw relevance for debugging
-            # candidate["relevance"] = relevance_score
+            candidates.set_column("score", -relevance.astype(np.float64))
+
+            # Sort by the new negated score (effectively descending relevance)
+            # 5. Slice top k
+            all_results.append(candidates.sort_by("score").head(k))
+
+        return all_results
 
-        # Sort by the new negated score (effectively descending relevance)
-        candidates.sort(key=lambda x: x["score"])
+    @staticmethod
+    def _digest(text: str) -> bytes:
+        return hashlib.sha1(text.encode("utf-8")).digest()
 
-        # 5. Slice top k
-        return candidates[:k]
\ No newline at end of file
+    def _rerank(self, queries: List[str], candidate_lists: List[RetrievalBatch]) -> List[np.ndarray]:
+        """
+        Cross-encoder scores for every candidate of every query (one array per query).
+        Cached pairs skip inference; the rest go to the model in one predict call.
+        """
+        scores = [np.empty(len(c), dtype=np.float32) for c in candidate_lists]
+
+        # key -> [(query index, row)], first one is sent to the model
+        missing: Dict[Any, List[Tuple[int, int]]] = {}
+        for q, (query, candidates) in enumerate(zip(queries, candidate_lists)):
+            if not len(candidates):
+                continue
+            query_hash = self._digest(self._normalize_query(query))
+            rows = zip(
+                candidates.column("paper_id"),
+                candidates.column("chunk_index"),
+                candidates.column("content"),
+            )
+            for i, (paper_id, chunk_index, content) in enumerate(rows):
+                key = (query_hash, paper_id, chunk_index, self._digest(str(content)))
+                cached = self.rerank_cache.get(key)
+                if cached is None:
+                    missing.setdefault(key, []).append((q, i))
+                else:
+                    scores[q][i] = cached
+
+        if missing:
+            todo = [positions[0] for positions in missing.values()]
+            predicted = self.reranker.predict(
+                [[queries[q], candidate_lists[q].columns["content"][i]] for q, i in todo]
+            )
+            for (key, positions), score in zip(missing.items(), predicted):
+                score = float(score)
+                self.rerank_cache.put(key, score)
+                for q, i in positions:
+                    scores[q][i] = score
+
+        return scores
+
+    def _recall_scope(self, paper_ids, prefilter: bool):
+        """
+        (in-scope chunk count if known, fraction of the corpus in scope).
+        """
+        if not paper_ids:
+            return None, 1.0
+
+        if prefilter and hasattr(self.chunk_fv, "positions_for_papers"):
+            scope_size = len(self.chunk_fv.positions_for_papers(paper_ids))
+            return scope_size, scope_size / max(len(self.chunk_fv), 1)
+
+        if self.metadata_snapshot is not None and len(self.metadata_snapshot):
+            return None, min(1.0, len(paper_ids) / len(self.metadata_snapshot))
+        return None, 1.0
+
+    def _recall_chunks(self, query_embeddings, k: int, paper_ids=None) -> List[RetrievalBatch]:
+        """
+        Dense recall with adaptive depth: in-scope rows (non-empty content,
+        paper in paper_ids), best first, at most target(k) per query.
+        """
+        controller = self.recall_controller
+        prefilter = bool(paper_ids) and getattr(self.chunk_fv, "supports_prefilter", False)
+        scope_size, selectivity = self._recall_scope(paper_ids, prefilter)
+        allowed = set(paper_ids) if paper_ids else None
+
+        depth = controller.initial_depth(k, scope_size, selectivity, prefilter)
+        if scope_size == 0:
+            return [RetrievalBatch() for _ in query_embeddings]
+
+        def fetch(embeddings, depth):
+            return self._find_neighbors_batch(
+                self.chunk_fv,
+                embeddings,
+                depth,
+                # Pre-filter: the local index only scores chunks of the candidate papers
+                paper_ids=paper_ids if prefilter else None,
+            )
+
+        def in_scope(rows: RetrievalBatch) -> RetrievalBatch:
+            keep = [
+                bool(content) and bool(str(content).strip())
+                for content in rows.column("content")
+            ]
+            if allowed is not None:
+                keep = [ok and pid in allowed for ok, pid in zip(keep, rows.column("paper_id"))]
+            return rows if all(keep) else rows.mask(keep)
+
+        raw = fetch(query_embeddings, depth)
+        row_lists = [in_scope(rows) for rows in raw]
+        depths = [depth] * len(raw)
+        rounds = [0] * len(raw)
+
+        # Widen only the queries that came back short, one batch per round
+        while True:
+            needy = [
+                i for i in range(len(raw))
+                if controller.should_widen(
+                    k, len(row_lists[i]), len(raw[i]), depths[i], rounds[i], scope_size
+                )
+            ]
+            if not needy:
+                break
+            wider = controller.widen(depths[needy[0]])
+            for i, rows in zip(needy, fetch([query_embeddings[i] for i in needy], wider)):
+                raw[i], row_lists[i] = rows, in_scope(rows)
+                depths[i] = wider
+                rounds[i] += 1
+
+        for d, r in zip(depths, rounds):
+            controller.record(d, r, scope_size, selectivity)
+
+        target = controller.target(k)
+        return [rows.head(target) for rows in row_lists]
+
+    def _fuse_sparse(self, query: str, dense_rows: RetrievalBatch, k: int, paper_ids=None) -> RetrievalBatch:
+        sparse_rows = self.sparse_index.find_matches(query, k=k, paper_ids=paper_ids)
+        return reciprocal_rank_fusion(
+            [dense_rows, sparse_rows],
+            key_columns=("paper_id", "chunk_index"),
+            k=self.rrf_k,
+            limit=k,
+        )
+
+    def _recall_scores(self, rows: RetrievalBatch) -> np.ndarray:
+        """
+        Recall-stage score per row, higher is better: RRF score, else
+        1 - vector distance, else BM25 score (NaN if none is known).
+        """
+        scores = rows.scores("rrf_score")
+        vector = 1.0 - self._vector_scores(rows)
+        scores = np.where(np.isnan(scores), vector, scores)
+        return np.where(np.isnan(scores), rows.scores("bm25_score"), scores)
+
+    def _chunk_candidates(self, rows: RetrievalBatch) -> RetrievalBatch:
+        contents = rows.column("content")
+        keep = [bool(c) and bool(str(c).strip()) for c in contents]
+        if not all(keep):
+            rows = rows.mask(keep)
+
+        titles = self.paper_id_to_title
+        paper_ids = rows.column("paper_id")
+        # Candidate columns reference the row values (no copies of the content)
+        return RetrievalBatch(
+            {
+                "paper_id": paper_ids,
+                "title": [titles.get(pid) or "Unknown" for pid in paper_ids],
+                "chunk_index": rows.column("chunk_index"),
+                "content": rows.column("content"),
+                # Temporary store original vector score if needed
+                "_vector_score": self._vector_scores(rows),
+                # Recall-stage score, higher is better (used by the rerank cascade)
+                "_recall_score": self._recall_scores(rows),
+            },
+            n=len(rows),
+        )
+
+    # ------------------------------------------------------------
+    # Async API: same results, blocking work runs on the shared worker pool
+    # ------------------------------------------------------------
+
+    async def search_metadata_async(
+        self, query: str, k: int = 5, filter_expr: Optional[str] = None
+    ) -> RetrievalBatch:
+        return await run_in_worker(self.search_metadata, query, k=k, filter_expr=filter_expr)
+
+    async def search_chunks_async(
+        self,
+        query: str,
+        k: int = 20,
+        paper_ids=None,
+        filter_expr: Optional[str] = None,
+    ) -> RetrievalBatch:
+        return await run_in_worker(
+            self.search_chunks, query, k=k, paper_ids=paper_ids, filter_expr=filter_expr
+        )
+
+    async def search_metadata_batch_async(
+        self, queries: List[str], k: int = 5, filter_expr: Optional[str] = None
+    ) -> List[RetrievalBatch]:
+        return await run_in_worker(
+            self.search_metadata_batch, queries, k=k, filter_expr=filter_expr
+        )
+
+    async def search_chunks_batch_async(
+        self,
+        queries: List[str],
+        k: int = 20,
+        paper_ids=None,
+        filter_expr: Optional[str] = None,
+    ) -> List[RetrievalBatch]:
+        return await run_in_worker(
+            self.search_chunks_batch, queries, k=k, paper_ids=paper_ids, filter_expr=filter_expr
+        )
@@ -0,0 +1,404 @@
+import json
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from functions.retrieval_batch import RetrievalBatch
+from functions.vector_index import LocalVectorIndex
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# (offsets per term id, doc ids, term frequencies); postings sorted by term id
+Segment = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase alphanumeric tokens, so "PCG" / "pcg" / "(PCG)" all match.
+    """
+    return _TOKEN_RE.findall(str(text).lower())
+
+
+class BM25Index:
+    """
+    Local BM25 inverted index over chunk content (sparse half of hybrid search).
+
+    Postings are plain numpy arrays in CSR layout: for term id t, documents
+    doc_ids[offsets[t]:offsets[t + 1]] with frequencies tfs[...].
+
+    - add() appends a new in-memory segment, so ingest stays incremental;
+      segments are merged on save() (or when there are too many)
+    - delete_papers() only tombstones documents; compact() drops them
+    - Documents keep paper_id / chunk_index / content, so BM25-only hits can
+      go to the reranker without a Feature Store lookup
+
+    Layout under <index_dir>/:
+    - postings.npz : offsets, doc_ids (int32), tfs (uint16)
+    - vocab.json   : term list (position == term id)
+    - docs.parquet : paper_id, chunk_index, content, length per document
+    - deleted.npy  : tombstone mask
+    - meta.json    : k1, b, count, source (corpus signature it was built from)
+    """
+
+    MAX_SEGMENTS = 8
+    COLUMNS = ["paper_id", "chunk_index", "content"]
+
+    def __init__(self, index_dir: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.index_dir = Path(index_dir) if index_dir is not None else None
+        self.k1 = k1
+        self.b = b
+        # Signature of the corpus the index reflects (see open_or_build)
+        self.source: Optional[str] = None
+
+        self.terms: List[str] = []
+        self.vocab: Dict[str, int] = {}
+        self.doc_freq = np.zeros(0, dtype=np.int64)
+        self.segments: List[Segment] = []
+
+        self.docs = pd.DataFrame(columns=self.COLUMNS)
+        self.doc_len = np.zeros(0, dtype=np.int32)
+        self.deleted = np.zeros(0, dtype=bool)
+        self._postings: Optional[Dict[Any, np.ndarray]] = None
+
+        if self.index_dir is not None and (self.index_dir / "meta.json").exists():
+            self._load()
+
+    def __len__(self) -> int:
+        return int(len(self.doc_len) - self.deleted.sum())
+
+    # ------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------
+
+    @classmethod
+    def build(cls, index_dir: str, df: pd.DataFrame, **params) -> "BM25Index":
+        index = cls(None, **params)
+        index.index_dir = Path(index_dir)
+        index.add(df)
+        index.save()
+        return index
+
+    @classmethod
+    def open_or_build(
+        cls,
+        feature_view,
+        index_dir: str,
+        source: Optional[str] = None,
+        **params,
+    ) -> "BM25Index":
+        """
+        Open <index_dir> if present, otherwise build it from feature_view's rows.
+
+        source: signature of the current corpus (e.g. manifest_signature() of
+        the sync manifest). An index recorded for another source is stale,
+        i.e. the Feature Group was written by a path that did not update it,
+        and is rebuilt.
+        """
+        if (Path(index_dir) / "meta.json").exists():
+            index = cls(index_dir, **params)
+            if source is None or index.source == source:
+                return index
+            print(f"BM25 index in {index_dir} is stale, rebuilding...")
+        else:
+            print(f"Building BM25 index in {index_dir}...")
+
+        index = cls(None, **params)
+        index.index_dir = Path(index_dir)
+        index.source = source
+        index.add(feature_view.query.read())
+        index.save()
+        return index
+
+    # ------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------
+
+    def add(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Index new chunk rows; returns their document ids.
+        """
+        first = len(self.doc_len)
+        if df.empty:
+            return np.empty(0, dtype=np.int64)
+
+        token_lists = [tokenize(text) for text in df["content"].fillna("")]
+        self.segments.append(self._build_segment(token_lists, first))
+
+        docs = df[self.COLUMNS].reset_index(drop=True)
+        self.docs = docs if first == 0 else pd.concat([self.docs, docs], ignore_index=True)
+        self.doc_len = np.concatenate(
+            [self.doc_len, np.fromiter((len(t) for t in token_lists), np.int32, len(token_lists))]
+        )
+        self.deleted = np.concatenate([self.deleted, np.zeros(len(df), dtype=bool)])
+        self._postings = None
+
+        if len(self.segments) > self.MAX_SEGMENTS:
+            self._merge_segments()
+        return np.arange(first, len(self.doc_len), dtype=np.int64)
+
+    def _build_segment(self, token_lists: List[List[str]], first_doc: int) -> Segment:
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        tfs: List[int] = []
+
+        for i, tokens in enumerate(token_lists):
+            for term, tf in Counter(tokens).items():
+                tid = self.vocab.get(term)
+                if tid is None:
+                    tid = self.vocab[term] = len(self.terms)
+                    self.terms.append(term)
+                term_ids.append(tid)
+                doc_ids.append(first_doc + i)
+                tfs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        counts = np.bincount(term_ids, minlength=len(self.terms))
+        self.doc_freq = np.concatenate(
+            [self.doc_freq, np.zeros(len(self.terms) - len(self.doc_freq), dtype=np.int64)]
+        ) + counts
+
+        order = np.argsort(term_ids, kind="stable")
+        offsets = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return (
+            offsets,
+            np.asarray(doc_ids, dtype=np.int32)[order],
+            np.minimum(np.asarray(tfs, dtype=np.int64), np.iinfo(np.uint16).max)
+            .astype(np.uint16)[order],
+        )
+
+    @property
+    def postings(self) -> Dict[Any, np.ndarray]:
+        """
+        paper_id -> its document ids (built lazily, reset by add()).
+        """
+        if self._postings is None:
+            pids = self.docs["paper_id"].to_numpy()
+            order = np.argsort(pids, kind="stable")
+            keys, starts = np.unique(pids[order], return_index=True)
+            bounds = list(starts[1:]) + [len(order)]
+            self._postings = {
+                key: order[start:end] for key, start, end in zip(keys, starts, bounds)
+            }
+        return self._postings
+
+    def docs_for_papers(self, paper_ids: Iterable[str]) -> np.ndarray:
+        postings = self.postings
+        lists = [postings[pid] for pid in paper_ids if pid in postings]
+        if not lists:
+            return np.empty(0, dtype=np.int64)
+        docs = np.concatenate(lists)
+        return docs[~self.deleted[docs]]
+
+    def delete_papers(self, paper_ids: Iterable[str]) -> int:
+        docs = self.docs_for_papers(paper_ids)
+        self.deleted[docs] = True
+        return len(docs)
+
+    def upsert_papers(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Replace all chunks of the papers in df.
+        """
+        self.delete_papers(df["paper_id"].unique())
+        return self.add(df)
+
+    def compact(self) -> "BM25Index":
+        """
+        Drop tombstoned documents and renumber the rest.
+        """
+        self._merge_segments(drop_deleted=True)
+        return self
+
+    def _merge_segments(self, drop_deleted: bool = False) -> None:
+        n_terms = len(self.terms)
+        term_ids, doc_ids, tfs = [], [], []
+        for offsets, docs, freqs in self.segments:
+            counts = np.diff(offsets)
+            term_ids.append(np.repeat(np.arange(len(counts)), counts))
+            doc_ids.append(docs)
+            tfs.append(freqs)
+
+        term_ids = np.concatenate(term_ids) if term_ids else np.empty(0, dtype=np.int64)
+        doc_ids = np.concatenate(doc_ids) if doc_ids else np.empty(0, dtype=np.int32)
+        tfs = np.concatenate(tfs) if tfs else np.empty(0, dtype=np.uint16)
+
+        if drop_deleted and self.deleted.any():
+            keep = ~self.deleted[doc_ids]
+            remap = np.cumsum(~self.deleted) - 1
+            term_ids, doc_ids, tfs = term_ids[keep], remap[doc_ids[keep]].astype(np.int32), tfs[keep]
+
+            alive = ~self.deleted
+            self.docs = self.docs[alive].reset_index(drop=True)
+            self.doc_len = self.doc_len[alive]
+            self.deleted = np.zeros(len(self.doc_len), dtype=bool)
+            self._postings = None
+
+        # Segments are in doc order, so a stable sort keeps doc ids ascending per term
+        order = np.argsort(term_ids, kind="stable")
+        counts = np.bincount(term_ids, minlength=n_terms)
+        offsets = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        self.segments = [(offsets, doc_ids[order], tfs[order])]
+        self.doc_freq = counts.astype(np.int64)
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+
+    def save(self) -> None:
+        if self.index_dir is None:
+            raise ValueError("BM25Index has no index_dir")
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        if len(self.segments) != 1:
+            self._merge_segments()
+
+        offsets, doc_ids, tfs = self.segments[0]
+        with open(self.index_dir / "postings.npz.tmp", "wb") as f:
+            np.savez(f, offsets=offsets, doc_ids=doc_ids, tfs=tfs)
+        os.replace(self.index_dir / "postings.npz.tmp", self.index_dir / "postings.npz")
+
+        (self.index_dir / "vocab.json").write_text(json.dumps(self.terms))
+        docs = self.docs.assign(length=self.doc_len)
+        docs.to_parquet(self.index_dir / "docs.parquet", index=False)
+        np.save(self.index_dir / "deleted.npy", self.deleted)
+
+        # meta.json last: an index without it is treated as absent
+        tmp = self.index_dir / "meta.json.tmp"
+        tmp.write_text(json.dumps(
+            {"k1": self.k1, "b": self.b, "count": len(self.doc_len), "source": self.source}
+        ))
+        os.replace(tmp, self.index_dir / "meta.json")
+
+    def _load(self) -> None:
+        meta = json.loads((self.index_dir / "meta.json").read_text())
+        self.k1, self.b = meta["k1"], meta["b"]
+        self.source = meta.get("source")
+
+        self.terms = json.loads((self.index_dir / "vocab.json").read_text())
+        self.vocab = {term: i for i, term in enumerate(self.terms)}
+
+        with np.load(self.index_dir / "postings.npz") as data:
+            self.segments = [(data["offsets"], data["doc_ids"], data["tfs"])]
+        self.doc_freq = np.diff(self.segments[0][0])
+
+        docs = pd.read_parquet(self.index_dir / "docs.parquet")
+        self.doc_len = docs.pop("length").to_numpy(dtype=np.int32)
+        self.docs = docs
+        self.deleted = np.load(self.index_dir / "deleted.npy")
+
+    # ------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------
+
+    def score(self, query: str) -> np.ndarray:
+        """
+        BM25 score of every document (0 where no query term occurs).
+        """
+        scores = np.zeros(len(self.doc_len), dtype=np.float32)
+        n_docs = len(self)
+        if n_docs == 0:
+            return scores
+
+        avgdl = max(float(self.doc_len[~self.deleted].mean()), 1.0)
+        k1, b = self.k1, self.b
+
+        for tid in {self.vocab[t] for t in tokenize(query) if t in self.vocab}:
+            df = self.doc_freq[tid]
+            idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+            for offsets, docs, tfs in self.segments:
+                if tid + 1 >= len(offsets):
+                    continue  # term is newer than this segment
+                start, end = offsets[tid], offsets[tid + 1]
+                if start == end:
+                    continue
+                d = docs[start:end]
+                tf = tfs[start:end].astype(np.float32)
+                norm = k1 * (1.0 - b + b * self.doc_len[d] / avgdl)
+                # A document appears once per term and segment: plain += is safe
+                scores[d] += idf * tf * (k1 + 1.0) / (tf + norm)
+        return scores
+
+    def search(self, query: str, k: int = 10, positions: Optional[np.ndarray] = None):
+        """
+        Returns (document ids, BM25 scores), best first; zero scores are dropped.
+        """
+        scores = self.score(query)
+        if positions is None:
+            candidates = np.flatnonzero(scores > 0)
+            candidates = candidates[~self.deleted[candidates]]
+        else:
+            positions = np.asarray(positions, dtype=np.int64)
+            candidates = positions[scores[positions] > 0]
+
+        top = candidates[LocalVectorIndex.top_k(scores[candidates], k)]
+        return top, scores[top]
+
+    def find_matches(
+        self,
+        query: str,
+        k: int = 10,
+        paper_ids: Optional[Iterable[str]] = None,
+    ) -> RetrievalBatch:
+        """
+        Top-k chunk rows (paper_id, chunk_index, content, bm25_score).
+        """
+        positions = self.docs_for_papers(paper_ids) if paper_ids is not None else None
+        docs, scores = self.search(query, k, positions)
+
+        picked = self.docs.iloc[docs]
+        columns = {name: picked[name].tolist() for name in picked.columns}
+        columns["bm25_score"] = scores.astype(np.float64)
+        return RetrievalBatch(columns, n=len(docs))
+
+
+def reciprocal_rank_fusion(
+    result_lists: List[RetrievalBatch],
+    key_columns: Sequence[str] = ("paper_id", "chunk_index"),
+    k: int = 60,
+    limit: Optional[int] = None,
+) -> RetrievalBatch:
+    """
+    Fuse ranked lists with RRF: score(d) = sum over lists of 1 / (k + rank).
+
+    Rows seen in several lists are merged (earlier lists win on conflicts);
+    the fused batch gets an "rrf_score" column.
+    """
+    batches = [RetrievalBatch.from_records(r) for r in result_lists]
+    fused: Dict[Hashable, float] = {}
+    # key -> {list index: row position}
+    positions: Dict[Hashable, Dict[int, int]] = {}
+
+    for b, batch in enumerate(batches):
+        keys = zip(*(batch.column(name) for name in key_columns))
+        for i, key in enumerate(keys):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + i + 1)
+            positions.setdefault(key, {}).setdefault(b, i)
+
+    ordered = sorted(fused, key=fused.get, reverse=True)[:limit]
+    names: Dict[str, None] = {}
+    for batch in batches:
+        names.update(dict.fromkeys(batch.names))
+
+    # Column values come from the first list holding the row; columns it
+    # lacks (e.g. bm25_score on a dense row) are filled from later lists
+
+    columns = {}
+    for name in names:
+        values = []
+        for key in ordered:
+            value = None
+            for b, i in positions[key].items():
+                column = batches[b].columns.get(name)
+                if column is not None and column[i] is not None:
+                    value = column[i]
+                    break
+            values.append(value)
+        columns[name] = values
+    columns["rrf_score"] = np.array([fused[key] for key in ordered], dtype=np.float64)
+    return RetrievalBatch(columns, n=len(ordered))
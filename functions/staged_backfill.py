@@ -0,0 +1,312 @@
+import json
+import os
+import time
+import urllib.parse
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import MIN_FULLTEXT_LEN
+from functions.extraction_cache import ExtractionCache, read_clean_fulltexts
+from functions.incremental_sync import IncrementalSync
+from functions.test_and_file_processor import extract_abstract_from_text, iter_chunk_records
+from functions.zotero_parser import ZoteroCSVParser
+
+
+class StagedBackfill:
+    """
+    Resumable backfill: parse -> extract -> chunk -> embed -> upload.
+
+    Every stage writes one Parquet file per partition of papers under
+    <work_dir>/<stage>/, followed by a .done marker. On restart, finished
+    (stage, partition) pairs are skipped, so a crash only costs the
+    partition that was in flight. Uploads are upserts on the primary keys
+    and are marked per partition, so re-running them is harmless.
+    """
+
+    STAGES = ("parse", "extract", "chunk", "embed", "upload")
+
+    def __init__(
+        self,
+        csv_path: str,
+        work_dir: str,
+        embed_fn: Callable[[List[str]], np.ndarray],
+        metadata_fg=None,
+        chunk_fg=None,
+        partition_size: int = 256,
+        extract_workers: Optional[int] = None,
+        extraction_cache: Optional[ExtractionCache] = None,
+        write_options: Optional[Dict] = None,
+        manifest_path: Optional[str] = None,
+    ):
+        self.csv_path = Path(csv_path)
+        self.work_dir = Path(work_dir)
+        self.embed_fn = embed_fn
+        self.metadata_fg = metadata_fg
+        self.chunk_fg = chunk_fg
+        self.partition_size = partition_size
+        self.extract_workers = extract_workers
+        self.extraction_cache = extraction_cache
+        self.write_options = write_options or {"start_offline_materialization": False}
+        # Incremental sync manifest, written once every partition is uploaded
+        self.manifest_path = manifest_path
+
+        for stage in self.STAGES:
+            (self.work_dir / stage).mkdir(parents=True, exist_ok=True)
+
+        self._check_source()
+
+    # ------------------------------------------------------------
+    # Checkpoint bookkeeping
+    # ------------------------------------------------------------
+
+    def _check_source(self) -> None:
+        """
+        Partitions are only meaningful for the CSV they were cut from.
+        """
+        st = self.csv_path.stat()
+        source = {
+            "csv_path": str(self.csv_path.resolve()),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "partition_size": self.partition_size,
+        }
+        path = self.work_dir / "source.json"
+
+        if path.exists():
+            stored = json.loads(path.read_text())
+            if stored != source:
+                raise RuntimeError(
+                    f"Checkpoints in {self.work_dir} belong to another export "
+                    f"({stored}). Use a new work_dir or call reset()."
+                )
+        else:
+            path.write_text(json.dumps(source))
+
+    def reset(self) -> None:
+        for stage in self.STAGES:
+            for f in (self.work_dir / stage).iterdir():
+                f.unlink()
+        (self.work_dir / "source.json").unlink(missing_ok=True)
+        self._check_source()
+
+    def _part_path(self, stage: str, part: int, name: str = "part") -> Path:
+        return self.work_dir / stage / f"{name}-{part:05d}.parquet"
+
+    def _done_path(self, stage: str, part: int) -> Path:
+        return self.work_dir / stage / f"part-{part:05d}.done"
+
+    def is_done(self, stage: str, part: int) -> bool:
+        return self._done_path(stage, part).exists()
+
+    def _mark_done(self, stage: str, part: int, **info) -> None:
+        _atomic_write_text(self._done_path(stage, part), json.dumps(info))
+
+    @staticmethod
+    def _write(df: pd.DataFrame, path: Path) -> None:
+        tmp = path.with_suffix(".tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    def partitions(self) -> List[int]:
+        return sorted(
+            int(p.stem.split("-")[1])
+            for p in (self.work_dir / "parse").glob("part-*.done")
+        )
+
+    # ------------------------------------------------------------
+    # Stages
+    # ------------------------------------------------------------
+
+    def stage_parse(self) -> List[int]:
+        parts = self.partitions()
+        if parts and (self.work_dir / "parse" / "_COMPLETE").exists():
+            return parts
+
+        parser = ZoteroCSVParser(self.csv_path)
+        parts = []
+        for part, batch in enumerate(parser.iter_batches(chunksize=self.partition_size)):
+            if not self.is_done("parse", part):
+                self._write(pd.DataFrame(batch), self._part_path("parse", part))
+                self._mark_done("parse", part, rows=len(batch))
+            parts.append(part)
+
+        _atomic_write_text(self.work_dir / "parse" / "_COMPLETE", str(len(parts)))
+        return parts
+
+    def stage_extract(self, part: int) -> None:
+        papers = pd.read_parquet(self._part_path("parse", part))
+
+        paths = [urllib.parse.unquote(p) if p else "" for p in papers["file_attachments"]]
+        papers["full_text"] = read_clean_fulltexts(
+            paths,
+            cache=self.extraction_cache,
+            workers=self.extract_workers,
+        )
+
+        self._write(papers, self._part_path("extract", part))
+        self._mark_done("extract", part, rows=len(papers))
+
+    def stage_chunk(self, part: int) -> None:
+        papers = pd.read_parquet(self._part_path("extract", part))
+        df_meta, df_chunks = build_feature_frames(papers)
+
+        self._write(df_meta, self._part_path("chunk", part, "meta"))
+        self._write(df_chunks, self._part_path("chunk", part, "chunks"))
+        self._mark_done("chunk", part, papers=len(df_meta), chunks=len(df_chunks))
+
+    def stage_embed(self, part: int) -> None:
+        df_meta = pd.read_parquet(self._part_path("chunk", part, "meta"))
+        df_chunks = pd.read_parquet(self._part_path("chunk", part, "chunks"))
+
+        for df, col in ((df_meta, "combined_text"), (df_chunks, "content")):
+            if df.empty:
+                df["embedding"] = []
+            else:
+                vectors = np.asarray(
+                    self.embed_fn(df[col].fillna("").tolist()), dtype=np.float32
+                )
+                df["embedding"] = list(vectors)
+
+        self._write(df_meta, self._part_path("embed", part, "meta"))
+        self._write(df_chunks, self._part_path("embed", part, "chunks"))
+        self._mark_done("embed", part, papers=len(df_meta), chunks=len(df_chunks))
+
+    def stage_upload(self, part: int) -> None:
+        if self.metadata_fg is None or self.chunk_fg is None:
+            raise RuntimeError("metadata_fg and chunk_fg are required for upload")
+
+        df_meta = pd.read_parquet(self._part_path("embed", part, "meta"))
+        df_chunks = pd.read_parquet(self._part_path("embed", part, "chunks"))
+
+        # Hopsworks expects array features as lists of floats
+        for df in (df_meta, df_chunks):
+            if not df.empty:
+                df["embedding"] = df["embedding"].map(
+                    lambda v: np.asarray(v, dtype=np.float32).tolist()
+                )
+
+        if not df_meta.empty:
+            self.metadata_fg.insert(df_meta, write_options=self.write_options)
+        if not df_chunks.empty:
+            self.chunk_fg.insert(df_chunks, write_options=self.write_options)
+
+        (self.work_dir / "upload" / "_MATERIALIZED").unlink(missing_ok=True)
+        self._mark_done("upload", part, papers=len(df_meta), chunks=len(df_chunks))
+
+    def materialize(self) -> None:
+        """
+        One offline materialization for all partitions uploaded since the last one.
+        """
+        marker = self.work_dir / "upload" / "_MATERIALIZED"
+        if marker.exists() or self.write_options.get("start_offline_materialization", True):
+            return
+
+        for fg in (self.metadata_fg, self.chunk_fg):
+            fg.materialization_job.run(await_termination=True)
+        _atomic_write_text(marker, str(time.time()))
+
+    def record_manifest(self, parts: List[int]) -> None:
+        """
+        Seed the incremental sync manifest with what the backfill uploaded.
+        Papers are re-parsed from the CSV (the Parquet round-trip changes
+        None / int dtypes, which would alter the fingerprints).
+        """
+        chunk_counts: Dict[str, int] = {}
+        for part in parts:
+            ids = pd.read_parquet(self._part_path("chunk", part, "chunks"), columns=["paper_id"])
+            chunk_counts.update(ids["paper_id"].value_counts().to_dict())
+
+        parser = ZoteroCSVParser(self.csv_path)
+        papers = [p for batch in parser.iter_batches(chunksize=self.partition_size) for p in batch]
+        IncrementalSync(self.manifest_path).record_backfill(papers, chunk_counts)
+
+    # ------------------------------------------------------------
+    # Driver
+    # ------------------------------------------------------------
+
+    def run(self, stop_after: str = "upload") -> Dict[str, int]:
+        """
+        Run (or resume) every partition through the stages up to `stop_after`.
+        Returns how many (stage, partition) steps were executed vs skipped.
+        """
+        if stop_after not in self.STAGES:
+            raise ValueError(f"Unknown stage: {stop_after}")
+
+        stages = self.STAGES[1 : self.STAGES.index(stop_after) + 1]
+        handlers = {
+            "extract": self.stage_extract,
+            "chunk": self.stage_chunk,
+            "embed": self.stage_embed,
+            "upload": self.stage_upload,
+        }
+
+        parts = self.stage_parse()
+        executed, skipped = 0, 0
+
+        for part in parts:
+            for stage in stages:
+                if self.is_done(stage, part):
+                    skipped += 1
+                    continue
+
+                start = time.perf_counter()
+                handlers[stage](part)
+                executed += 1
+                print(
+                    f"[{stage}] partition {part + 1}/{len(parts)} "
+                    f"done in {time.perf_counter() - start:.1f}s"
+                )
+
+        if stop_after == "upload":
+            self.materialize()
+            if self.manifest_path is not None:
+                self.record_manifest(parts)
+
+        print(f"Backfill: {executed} steps executed, {skipped} resumed from checkpoints.")
+        return {"executed": executed, "skipped": skipped, "partitions": len(parts)}
+
+
+def build_feature_frames(papers: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Sanitized papers + cleaned "full_text" column -> (metadata rows, chunk rows),
+    matching the Feature Group schemas used by the notebooks.
+    """
+
+    # ---- Paper-level features ----
+    abstracts = []
+    for abstract, full_text in zip(papers["abstract"], papers["full_text"]):
+        if not abstract and len(full_text) >= MIN_FULLTEXT_LEN:
+            abstract = extract_abstract_from_text(full_text) or ""
+        abstracts.append(abstract)
+
+    df_meta = pd.DataFrame(
+        {
+            "paper_id": papers["paper_id"].values,
+            "title": papers["title"].values,
+            "abstract": abstracts,
+            "authors": papers["authors"].values,
+            "year": papers["year"].values,
+            "item_type": papers["item_type"].values,
+        }
+    )
+    df_meta["combined_text"] = (
+        "Title: " + df_meta["title"] + "\nAbstract: " + df_meta["abstract"]
+    )
+
+    # ---- Chunk-level features ----
+    records = list(iter_chunk_records(zip(papers["paper_id"], papers["full_text"])))
+    df_chunks = pd.DataFrame(records, columns=["paper_id", "chunk_index", "content"])
+    df_chunks["year"] = df_chunks["paper_id"].map(
+        dict(zip(papers["paper_id"], papers["year"]))
+    )
+
+    return df_meta, df_chunks
+
+
+def _atomic_write_text(path: Path, text: str) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
@@ -2,9 +2,14 @@
 
 import re
 
-from typing import List, Optional
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, TypeVar
 
-from config import CHUNK_SIZE, CHUNK_OVERLAP
+from config import CHUNK_SIZE, CHUNK_OVERLAP, MIN_FULLTEXT_LEN
+
+T = TypeVar("T")
+
+_SEPARATOR_RE = re.compile(r"(\.{5,}|\-{5,})")
 
 
 # -------- Abstract extraction (provided implementation) --------
@@ -92,39 +97,55 @@ def clean_text(text: str) -> str:
 
 # -------- Chunking --------
 
-def chunk_text(
+def iter_chunk_text(
     text: str,
     chunk_size: int = CHUNK_SIZE,
     overlap: int = CHUNK_OVERLAP,
-) -> List[str]:
+) -> Iterator[str]:
+    """
+    Streaming version of chunk_text.
+    Paragraphs are buffered in a list and joined once per emitted chunk.
+    """
     if not text:
-        return []
+        return
 
-    paragraphs = text.split("\n\n")
-    chunks = []
-    current = ""
+    parts: List[str] = []
+    current_len = 0
 
-    for para in paragraphs:
+    for para in text.split("\n\n"):
         para = para.strip()
         if not para:
             continue
 
-        if len(current) + len(para) < chunk_size:
-            current = f"{current}\n\n{para}" if current else para
+        if current_len + len(para) < chunk_size:
+            current_len += len(para) + (2 if parts else 0)
+            parts.append(para)
+            continue
+
+        if not parts:
+            continue
+
+        current = "\n\n".join(parts)
+        yield current
+        current = current[-overlap:] + "\n\n" + para
+
+        if len(current) > chunk_size:
+            for i in range(0, len(current), chunk_size - overlap):
+                yield current[i : i + chunk_size]
+            parts, current_len = [], 0
         else:
-            if current:
-                chunks.append(current)
-                current = current[-overlap:] + "\n\n" + para
+            parts, current_len = [current], len(current)
 
-            if len(current) > chunk_size:
-                for i in range(0, len(current), chunk_size - overlap):
-                    chunks.append(current[i : i + chunk_size])
-                current = ""
+    if parts:
+        yield "\n\n".join(parts)
 
-    if current:
-        chunks.append(current)
 
-    return chunks
+def chunk_text(
+    text: str,
+    chunk_size: int = CHUNK_SIZE,
+    overlap: int = CHUNK_OVERLAP,
+) -> List[str]:
+    return list(iter_chunk_text(text, chunk_size, overlap))
 
 
 def split_sentences(text: str) -> List[str]:
@@ -134,34 +155,34 @@ def split_sentences(text: str) -> List[str]:
     return re.split(r'(?<=[.!?])\s+', text.strip())
 
 
-def extract_paragraph_chunks(
+def iter_paragraph_chunks(
     text: str,
     min_len: int = 500,
     max_len: int = 1500,
     overlap_sentences: int = 2,   # 👈 sentence-level overlap
-) -> List[str]:
+) -> Iterator[str]:
     """
     Paragraph-first chunking with sentence-level overlap.
     No character slicing. No broken words.
+    Yields chunks lazily; see extract_paragraph_chunks for the list form.
     """
     if not text:
-        return []
+        return
 
-    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
-    chunks: List[str] = []
+    for para in text.split("\n\n"):
+        para = para.strip()
 
-    for para in paragraphs:
         # skip very short paragraphs
         if len(para) < min_len:
             continue
 
         # skip separators / garbage
-        if re.search(r"(\.{5,}|\-{5,})", para):
+        if _SEPARATOR_RE.search(para):
             continue
 
         # short enough: keep whole paragraph
         if len(para) <= max_len:
-            chunks.append(para)
+            yield para
             continue
 
         sentences = split_sentences(para)
@@ -183,7 +204,7 @@ def extract_paragraph_chunks(
             else:
                 # flush current chunk
                 if current_sents:
-                    chunks.append(" ".join(current_sents))
+                    yield " ".join(current_sents)
 
                 # sentence-level overlap
                 if overlap_sentences > 0:
@@ -196,8 +217,49 @@ def extract_paragraph_chunks(
                 current_len = sum(len(s) + 1 for s in current_sents)
 
         if current_sents:
-            chunks.append(" ".join(current_sents))
+            yield " ".join(current_sents)
+
+
+def extract_paragraph_chunks(
+    text: str,
+    min_len: int = 500,
+    max_len: int = 1500,
+    overlap_sentences: int = 2,
+) -> List[str]:
+    return list(iter_paragraph_chunks(text, min_len, max_len, overlap_sentences))
+
 
-    return chunks
+# -------- Streaming records --------
 
+ChunkRecord = Tuple[str, int, str]
 
+
+def iter_chunk_records(
+    paper_texts: Iterable[Tuple[str, str]],
+    chunker: Callable[[str], Iterable[str]] = iter_paragraph_chunks,
+    min_fulltext_len: int = MIN_FULLTEXT_LEN,
+) -> Iterator[ChunkRecord]:
+    """
+    Turn a stream of (paper_id, full_text) into (paper_id, chunk_index, content).
+    Nothing is materialized beyond the chunk currently being produced.
+    """
+    for paper_id, full_text in paper_texts:
+        if not full_text or len(full_text) < min_fulltext_len:
+            continue
+        for i, chunk in enumerate(chunker(full_text)):
+            yield paper_id, i, chunk
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Group a stream into lists of at most `size` items.
+    """
+    if size < 1:
+        raise ValueError("size must be >= 1")
+
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,474 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from functions.retrieval_batch import RetrievalBatch
+
+
+class _Feature:
+    """
+    Minimal stand-in for an hsfs feature (only .name is used downstream).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"Feature({self.name!r})"
+
+
+class LocalVectorIndex:
+    """
+    Exact cosine-similarity index over a memory-mapped embedding matrix.
+
+    Drop-in for the parts of a Hopsworks Feature View that
+    SimilaritySearchEngine uses (.schema, .find_neighbors, .query.read),
+    so metadata and chunk search can run fully offline.
+
+    Layout under <index_dir>/:
+    - vectors.f32  : (n, dim) float32, rows L2-normalized, memory-mapped
+    - ids.npy      : int64 row id per vector (sidecar ID array)
+    - rows*.parquet: remaining feature columns (paper_id, content, ...),
+                     one segment per build/add
+    - deleted.npy  : tombstone mask (rows removed since the last compact)
+    - meta.json    : dim, count, embedding column name, segments
+
+    Search is one BLAS matrix-vector product + argpartition top-k.
+    Row ids equal row positions; compact() rewrites the index to keep it so.
+    """
+
+    VERSION = 1
+
+    def __init__(self, index_dir: str):
+        self.index_dir = Path(index_dir)
+
+        meta = json.loads((self.index_dir / "meta.json").read_text())
+        if meta.get("version") != self.VERSION:
+            raise ValueError(f"Unsupported index version in {self.index_dir}: {meta}")
+
+        self.dim: int = meta["dim"]
+        self.embedding_col: str = meta["embedding_col"]
+        self.count: int = meta["count"]
+
+        self.segments: List[str] = meta.get("segments", ["rows.parquet"])
+
+        self.vectors = self._open_vectors(self.count)
+        self.ids = np.load(self.index_dir / "ids.npy", mmap_mode="r")
+
+        deleted_path = self.index_dir / "deleted.npy"
+        self.deleted = (
+            np.load(deleted_path)
+            if deleted_path.exists()
+            else np.zeros(self.count, dtype=bool)
+        )
+
+        rows = pd.concat(
+            [pd.read_parquet(self.index_dir / seg) for seg in self.segments],
+            ignore_index=True,
+        )
+        self.columns: Dict[str, np.ndarray] = {c: rows[c].to_numpy() for c in rows.columns}
+        self._postings: Optional[Dict[Any, np.ndarray]] = None
+
+    def _open_vectors(self, count: int) -> np.ndarray:
+        if count == 0:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.memmap(
+            self.index_dir / "vectors.f32",
+            dtype=np.float32,
+            mode="r",
+            shape=(count, self.dim),
+        )
+
+    # ------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------
+
+    @classmethod
+    def build(
+        cls,
+        index_dir: str,
+        df: pd.DataFrame,
+        embedding_col: str = "embedding",
+    ) -> "LocalVectorIndex":
+        """
+        Write an index from a DataFrame holding an embedding column.
+        """
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+
+        if df.empty:
+            raise ValueError("Cannot build an index from an empty DataFrame")
+
+        vectors = normalize_rows(
+            np.stack([np.asarray(v, dtype=np.float32) for v in df[embedding_col]])
+        )
+
+        vectors.tofile(index_dir / "vectors.f32.tmp")
+        os.replace(index_dir / "vectors.f32.tmp", index_dir / "vectors.f32")
+        np.save(index_dir / "ids.npy", np.arange(len(df), dtype=np.int64))
+        df.drop(columns=[embedding_col]).reset_index(drop=True).to_parquet(
+            index_dir / "rows.parquet", index=False
+        )
+        (index_dir / "deleted.npy").unlink(missing_ok=True)
+        _write_meta(
+            index_dir,
+            {
+                "version": cls.VERSION,
+                "dim": int(vectors.shape[1]),
+                "count": int(vectors.shape[0]),
+                "embedding_col": embedding_col,
+                "segments": ["rows.parquet"],
+            },
+        )
+        return cls(index_dir)
+
+    @classmethod
+    def from_feature_view(
+        cls,
+        feature_view,
+        index_dir: str,
+        embedding_col: str = "embedding",
+    ) -> "LocalVectorIndex":
+        """
+        Export a Hopsworks Feature View (offline read) into a local index.
+        """
+        return cls.build(index_dir, feature_view.query.read(), embedding_col)
+
+    @classmethod
+    def open_or_export(
+        cls,
+        feature_view,
+        index_dir: str,
+        embedding_col: str = "embedding",
+    ) -> "LocalVectorIndex":
+        if (Path(index_dir) / "meta.json").exists():
+            return cls(index_dir)
+        return cls.from_feature_view(feature_view, index_dir, embedding_col)
+
+    # ------------------------------------------------------------
+    # Feature View compatible surface
+    # ------------------------------------------------------------
+
+    @property
+    def schema(self) -> List[_Feature]:
+        return [_Feature(c) for c in self.columns] + [_Feature(self.embedding_col)]
+
+    @property
+    def query(self) -> "LocalVectorIndex":
+        # Lets callers use metadata_fv.query.read() unchanged
+        return self
+
+    def read(self, *args, **kwargs) -> pd.DataFrame:
+        # Live rows only: tombstoned ones stay on disk until compact()
+        df = pd.DataFrame(self.columns)
+        if self.deleted.any():
+            df = df[~self.deleted].reset_index(drop=True)
+        return df
+
+    def __len__(self) -> int:
+        return self.count - int(self.deleted.sum())
+
+    # ------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------
+
+    def _save_meta(self) -> None:
+        _write_meta(
+            self.index_dir,
+            {
+                "version": self.VERSION,
+                "dim": self.dim,
+                "count": self.count,
+                "embedding_col": self.embedding_col,
+                "segments": self.segments,
+            },
+        )
+
+    def add(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Append rows (with embeddings). Returns the new row ids.
+        """
+        if df.empty:
+            return np.empty(0, dtype=np.int64)
+
+        vectors = normalize_rows(
+            np.stack([np.asarray(v, dtype=np.float32) for v in df[self.embedding_col]])
+        )
+        new_ids = np.arange(self.count, self.count + len(df), dtype=np.int64)
+
+        rows = df.drop(columns=[self.embedding_col]).reset_index(drop=True)
+        rows = pd.DataFrame(
+            {c: rows[c] if c in rows else pd.Series([None] * len(rows)) for c in self.columns}
+        )
+        segment = f"rows-{len(self.segments):05d}.parquet"
+        rows.to_parquet(self.index_dir / segment, index=False)
+
+        with open(self.index_dir / "vectors.f32", "r+b") as f:
+            # Drop bytes of an add that crashed before meta.json was updated
+            f.truncate(self.count * self.dim * 4)
+            f.seek(0, os.SEEK_END)
+            f.write(vectors.tobytes())
+        np.save(self.index_dir / "ids.npy", np.concatenate([np.asarray(self.ids), new_ids]))
+
+        self.count += len(df)
+        self.segments.append(segment)
+        self.deleted = np.concatenate([self.deleted, np.zeros(len(df), dtype=bool)])
+        np.save(self.index_dir / "deleted.npy", self.deleted)
+        self._save_meta()
+
+        self.vectors = self._open_vectors(self.count)
+        self.ids = np.load(self.index_dir / "ids.npy", mmap_mode="r")
+        for c in self.columns:
+            self.columns[c] = np.concatenate([self.columns[c], rows[c].to_numpy()])
+        self._postings = None
+
+        return new_ids
+
+    # ------------------------------------------------------------
+    # paper_id -> row posting lists
+    # ------------------------------------------------------------
+
+    @property
+    def postings(self) -> Dict[Any, np.ndarray]:
+        """
+        paper_id -> positions of its rows (built lazily, reset by add()).
+        """
+        if self._postings is None:
+            pids = self.columns.get("paper_id")
+            if pids is None:
+                raise KeyError("Index has no paper_id column")
+            order = np.argsort(pids, kind="stable")
+            keys, starts = np.unique(pids[order], return_index=True)
+            bounds = list(starts[1:]) + [len(order)]
+            self._postings = {
+                key: order[start:end] for key, start, end in zip(keys, starts, bounds)
+            }
+        return self._postings
+
+    def positions_for_papers(self, paper_ids: Iterable[str]) -> np.ndarray:
+        postings = self.postings
+        lists = [postings[pid] for pid in paper_ids if pid in postings]
+        if not lists:
+            return np.empty(0, dtype=np.int64)
+        positions = np.concatenate(lists)
+        return positions[~self.deleted[positions]]
+
+    def delete(self, positions: Iterable[int]) -> int:
+        """
+        Tombstone rows; they disappear from search immediately.
+        """
+        positions = np.asarray(list(positions), dtype=np.int64)
+        positions = positions[~self.deleted[positions]]
+        self.deleted[positions] = True
+        np.save(self.index_dir / "deleted.npy", self.deleted)
+        return len(positions)
+
+    def delete_papers(self, paper_ids: Iterable[str]) -> int:
+        return self.delete(self.positions_for_papers(paper_ids))
+
+    def upsert_papers(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Replace every row of the papers in df (incremental pipeline update).
+        """
+        self.delete_papers(df["paper_id"].unique())
+        return self.add(df)
+
+    def compact(self) -> "LocalVectorIndex":
+        """
+        Rewrite the index without tombstoned rows.
+        """
+        alive = np.flatnonzero(~self.deleted)
+        df = pd.DataFrame({c: col[alive] for c, col in self.columns.items()})
+        df[self.embedding_col] = list(np.asarray(self.vectors[alive]))
+        for seg in self.segments:
+            (self.index_dir / seg).unlink(missing_ok=True)
+        # Exact layer only: subclasses add their own structures on top once
+        return LocalVectorIndex.build(self.index_dir, df, self.embedding_col)
+
+    # ------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------
+
+    def _prepare_query(self, embedding) -> np.ndarray:
+        q = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        if q.shape[0] != self.dim:
+            raise ValueError(f"Query dim {q.shape[0]} != index dim {self.dim}")
+        norm = np.linalg.norm(q)
+        return q / norm if norm > 0 else q
+
+    @staticmethod
+    def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Positions of the k highest scores, best first.
+        """
+        k = min(k, scores.shape[0])
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        if k < scores.shape[0]:
+            part = np.argpartition(-scores, k - 1)[:k]
+        else:
+            part = np.arange(scores.shape[0])
+        return part[np.argsort(-scores[part], kind="stable")]
+
+    def search(self, embedding, k: int = 10):
+        """
+        Returns (row positions, cosine similarities), best first.
+        """
+        q = self._prepare_query(embedding)
+        scores = self.vectors @ q
+        if self.deleted.any():
+            scores[self.deleted] = -np.inf
+        top = self.top_k(scores, min(k, len(self)))
+        return top, scores[top]
+
+    def _prepare_queries(self, embeddings) -> np.ndarray:
+        queries = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Query dim {queries.shape[1]} != index dim {self.dim}")
+        return normalize_rows(queries)
+
+    @staticmethod
+    def top_k_rows(scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Row-wise top_k of a (queries, candidates) score matrix, best first.
+        """
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            return np.empty((scores.shape[0], 0), dtype=np.int64)
+        if k < scores.shape[1]:
+            part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            part = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+        return np.take_along_axis(part, order, axis=1)
+
+    def search_batch(
+        self,
+        embeddings,
+        k: int = 10,
+        positions: Optional[np.ndarray] = None,
+        block_size: int = 256,
+    ):
+        """
+        Batched search: one matrix-matrix product per block of queries.
+
+        Optionally restricted to the given rows (shared by all queries).
+        Returns a list of (row positions, cosine similarities) per query.
+        """
+        queries = self._prepare_queries(embeddings)
+        if positions is not None:
+            positions = np.asarray(positions, dtype=np.int64)
+            candidates = self.vectors[positions]
+        else:
+            candidates = self.vectors
+            # Tombstoned rows score -inf; never let them fill the top k
+            k = min(k, len(self))
+
+        results = []
+        # Blocks bound the (queries x rows) score matrix
+        for start in range(0, len(queries), block_size):
+            scores = queries[start:start + block_size] @ candidates.T
+            if positions is None and self.deleted.any():
+                scores[:, self.deleted] = -np.inf
+            top = self.top_k_rows(scores, k)
+            sims = np.take_along_axis(scores, top, axis=1)
+            if positions is not None:
+                top = positions[top]
+            results.extend(zip(top, sims))
+        return results
+
+    def rows_at(self, positions: np.ndarray, similarities: np.ndarray) -> List[Dict[str, Any]]:
+        # .tolist() yields plain Python values (JSON friendly)
+        picked = {name: col[positions].tolist() for name, col in self.columns.items()}
+        distances = (1.0 - np.asarray(similarities, dtype=np.float64)).tolist()
+
+        results = []
+        for i, distance in enumerate(distances):
+            row = {name: values[i] for name, values in picked.items()}
+            row["distance"] = distance  # cosine distance, like the fallback
+            results.append(row)
+        return results
+
+    def batch_at(self, positions: np.ndarray, similarities: np.ndarray) -> RetrievalBatch:
+        """
+        Columnar rows_at: one array / list per column, no dict per neighbor.
+        """
+        columns = {name: col[positions].tolist() for name, col in self.columns.items()}
+        columns["distance"] = 1.0 - np.asarray(similarities, dtype=np.float64)
+        return RetrievalBatch(columns, n=len(positions))
+
+    def search_within(self, embedding, positions: np.ndarray, k: int = 10):
+        """
+        Exact search restricted to the given rows: work is proportional
+        to len(positions), not to the corpus size.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions) == 0:
+            return positions, np.empty(0, dtype=np.float32)
+
+        q = self._prepare_query(embedding)
+        scores = self.vectors[positions] @ q
+        top = self.top_k(scores, k)
+        return positions[top], scores[top]
+
+    # Lets SimilaritySearchEngine push paper_id filters down to the index
+    supports_prefilter = True
+
+    def find_neighbors(
+        self,
+        embedding,
+        k: int = 10,
+        paper_ids: Optional[Iterable[str]] = None,
+        **kwargs,
+    ) -> List[Dict[str, Any]]:
+        if paper_ids is not None:
+            positions, sims = self.search_within(
+                embedding, self.positions_for_papers(paper_ids), k
+            )
+        else:
+            positions, sims = self.search(embedding, k)
+        return self.rows_at(positions, sims)
+
+    def find_neighbors_batch(
+        self,
+        embeddings,
+        k: int = 10,
+        paper_ids: Optional[Iterable[str]] = None,
+        **kwargs,
+    ) -> List[RetrievalBatch]:
+        """
+        find_neighbors for many queries at once; one RetrievalBatch per query.
+        """
+        positions = self.positions_for_papers(paper_ids) if paper_ids is not None else None
+        return [
+            self.batch_at(rows, sims)
+            for rows, sims in self.search_batch(embeddings, k, positions=positions)
+        ]
+
+
+def open_index(index_dir: str) -> LocalVectorIndex:
+    """
+    Open a local index directory as HNSW if it has a graph, else exact.
+    """
+    if (Path(index_dir) / "hnsw.json").exists():
+        from functions.hnsw_index import HNSWVectorIndex
+
+        return HNSWVectorIndex(index_dir)
+    return LocalVectorIndex(index_dir)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _write_meta(index_dir: Path, meta: Dict[str, Any]) -> None:
+    tmp = index_dir / "meta.json.tmp"
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, index_dir / "meta.json")
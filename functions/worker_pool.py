@@ -0,0 +1,45 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from config import ASYNC_WORKERS
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Process-wide pool for blocking work called from async code
+    (embedding, vector search, reranking, feature store round-trips).
+
+    Threads rather than processes: the models and memory-mapped indexes are
+    shared in-process, and numpy / torch / onnxruntime release the GIL while
+    they compute. The pool size bounds how much of that work runs at once,
+    however many requests are in flight on the event loop.
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=ASYNC_WORKERS, thread_name_prefix="rag-worker"
+            )
+        return _executor
+
+
+async def run_in_worker(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Await fn(*args, **kwargs) on the worker pool without blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown(wait: bool = True) -> None:
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
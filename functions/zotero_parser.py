@@ -1,6 +1,9 @@
 import pandas as pd
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
+
+from functions.metadata_check import sanitize_metadata_frame
+
 
 class ZoteroCSVParser:
     """
@@ -18,38 +21,93 @@ class ZoteroCSVParser:
         "Item Type",
     }
 
+    # Optional: used for change detection when present
+    DATE_MODIFIED_COLUMN = "Date Modified"
+
+    # CSV column -> paper field
+    COLUMN_MAP = {
+        "Key": "paper_id",
+        "Title": "title",
+        "Author": "authors",
+        "Publication Year": "year",
+        "Abstract Note": "abstract",
+        "Item Type": "item_type",
+        "File Attachments": "file_attachments",
+        "Url": "url",
+        "Date Modified": "date_modified",
+    }
+
     def __init__(self, csv_path: str):
         self.csv_path = Path(csv_path)
 
-    def parse(self) -> List[Dict[str, Any]]:
-        df = pd.read_csv(self.csv_path)
+    # ------------------------------------------------------------
+    # Columnar reading
+    # ------------------------------------------------------------
+
+    def _read_csv(self, chunksize: Optional[int] = None):
+        wanted = self.REQUIRED_COLUMNS | {self.DATE_MODIFIED_COLUMN}
+        return pd.read_csv(
+            self.csv_path,
+            usecols=lambda c: c in wanted,
+            dtype=str,
+            keep_default_na=False,
+            chunksize=chunksize,
+        )
 
+    def _normalize_frame(self, df: pd.DataFrame) -> pd.DataFrame:
         missing = self.REQUIRED_COLUMNS - set(df.columns)
         if missing:
             raise ValueError(f"Missing required CSV columns: {missing}")
 
-        papers = []
-
-        for _, row in df.iterrows():
-            paper_id = str(row["Key"]).strip()
-            if not paper_id:
-                continue  # 强制要求 Key 存在
-
-            paper = {
-                "paper_id": paper_id,
-                "title": str(row["Title"]).strip(),
-                "authors": str(row["Author"]).strip(),
-                "year": (
-                    int(row["Publication Year"])
-                    if not pd.isna(row["Publication Year"])
-                    else None
-                ),
-                "abstract": str(row["Abstract Note"]).strip(),
-                "item_type": str(row["Item Type"]).strip(),
-                "file_attachments": str(row["File Attachments"]).strip(),
-                "url": str(row["Url"]).strip(),
-            }
-
-            papers.append(paper)
-
-        return papers
+        if self.DATE_MODIFIED_COLUMN not in df.columns:
+            df[self.DATE_MODIFIED_COLUMN] = ""
+
+        df = df.rename(columns=self.COLUMN_MAP)[list(self.COLUMN_MAP.values())]
+
+        for col in df.columns:
+            if col != "year":
+                df[col] = df[col].str.strip()
+
+        df["year"] = pd.to_numeric(df["year"].str.strip(), errors="coerce").astype("Int64")
+
+        # 强制要求 Key 存在
+        return df[df["paper_id"] != ""].reset_index(drop=True)
+
+    def parse_frame(self) -> pd.DataFrame:
+        """
+        Whole export as one normalized DataFrame (one row per paper).
+        """
+        return self._normalize_frame(self._read_csv())
+
+    # ------------------------------------------------------------
+    # Record output
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+        out = df.astype(object)
+        out["year"] = pd.Series(
+            [None if pd.isna(y) else int(y) for y in df["year"]],
+            index=out.index,
+            dtype=object,
+        )
+        return out.to_dict("records")
+
+    def parse(self) -> List[Dict[str, Any]]:
+        return self.to_records(self.parse_frame())
+
+    def iter_batches(
+        self,
+        chunksize: int = 5000,
+        sanitize: bool = True,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream the export in batches of at most `chunksize` rows.
+        With sanitize=True, batches contain sanitized records only.
+        """
+        for chunk in self._read_csv(chunksize=chunksize):
+            df = self._normalize_frame(chunk)
+            if sanitize:
+                df = sanitize_metadata_frame(df)
+            if not df.empty:
+                yield self.to_records(df)
@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Tests import config / functions like the notebooks do (repo root on sys.path)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+WORDS = "heart sound pcg murmur segmentation diffusion wavelet cnn mfcc noise synthetic model".split()
+
+
+class BagOfWordsEmbedder:
+    """
+    Deterministic stand-in for SentenceTransformer: sum of fixed word vectors.
+    """
+
+    def __init__(self, dim: int = 16, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.vectors = {w: rng.normal(size=dim) for w in WORDS}
+        self.dim = dim
+
+    def encode(self, texts):
+        one = isinstance(texts, str)
+        texts = [texts] if one else list(texts)
+        out = np.array(
+            [
+                sum((self.vectors.get(w, np.zeros(self.dim)) for w in t.lower().split()), np.zeros(self.dim)) + 0.01
+                for t in texts
+            ],
+            dtype=np.float32,
+        )
+        return out[0] if one else out
+
+
+@pytest.fixture
+def embedder() -> BagOfWordsEmbedder:
+    return BagOfWordsEmbedder()
+
+
+@pytest.fixture
+def papers_frame(embedder) -> pd.DataFrame:
+    """
+    40 papers: years 2019..2023, every fourth one a preprint.
+    """
+    rng = np.random.default_rng(1)
+    n = 40
+    df = pd.DataFrame(
+        {
+            "paper_id": [f"P{i:02d}" for i in range(n)],
+            "title": [f"Title {i}" for i in range(n)],
+            "abstract": [" ".join(rng.choice(WORDS, 5)) for _ in range(n)],
+            "authors": ["Liu, Yang; Doe, J" if i % 2 else "Smith, A" for i in range(n)],
+            "year": [2019 + i % 5 for i in range(n)],
+            "item_type": ["preprint" if i % 4 == 0 else "journalArticle" for i in range(n)],
+        }
+    )
+    df["embedding"] = list(embedder.encode(df["abstract"].tolist()))
+    return df
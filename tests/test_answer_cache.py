@@ -0,0 +1,105 @@
+from functions.answer_cache import CorpusStamp, SemanticAnswerCache
+from functions.vector_index import LocalVectorIndex
+
+
+class _Engine:
+    def __init__(self, metadata_fv, chunk_fv):
+        self.metadata_fv = metadata_fv
+        self.chunk_fv = chunk_fv
+        self.metadata_snapshot = None
+
+
+class _FeatureGroup:
+    name = "paper_chunk_fg_2"
+    version = 3
+
+    def __init__(self):
+        self.commit = 1
+        self.polls = 0
+
+    def commit_details(self, limit=None):
+        self.polls += 1
+        return {self.commit: {"rowsInserted": 1}}
+
+
+class _Links:
+    def __init__(self, fg):
+        self.accessible = [fg]
+
+
+class _HopsworksView:
+    name = "paper_chunk_fv_2"
+    version = 3
+
+    def __init__(self, fg):
+        self.fg = fg
+
+    def get_parent_feature_groups(self):
+        return _Links(self.fg)
+
+
+def _cache(embedder, **kwargs):
+    return SemanticAnswerCache(embedder.encode, threshold=0.95, **kwargs)
+
+
+def test_hits_paraphrases_and_evicts_lru(embedder):
+    t = [0.0]
+    cache = _cache(embedder, capacity=2, ttl_seconds=100, stamp_fn=lambda: 0, clock=lambda: t[0])
+
+    assert cache.store("heart murmur segmentation", {"answer": "A"})
+    assert not cache.store("no answer", {"answer": ""})
+    assert cache.lookup("  Heart MURMUR segmentation ") == {"answer": "A"}
+    assert cache.lookup("segmentation of heart murmur") == {"answer": "A"}
+    assert cache.lookup("wavelet noise") is None
+
+    cache.store("wavelet noise", {"answer": "B"})
+    cache.store("diffusion model", {"answer": "C"})
+    assert len(cache) == 2 and cache.lookup("heart murmur segmentation") is None
+
+    t[0] = 500
+    assert cache.lookup("diffusion model") is None
+
+
+def test_upsert_with_same_live_count_invalidates(embedder, papers_frame, tmp_path):
+    index = LocalVectorIndex.build(tmp_path, papers_frame)
+    stamp = CorpusStamp(_Engine(index, index), manifest_path=tmp_path / "manifest.json")
+    cache = _cache(embedder, stamp_fn=stamp)
+    cache.store("heart murmur segmentation", {"answer": "A"})
+
+    # Re-embedded paper: one row tombstoned, one appended
+    index.upsert_papers(papers_frame.head(1))
+    assert len(index) == len(papers_frame)
+    assert cache.lookup("heart murmur segmentation") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_feature_group_commits_are_polled_off_the_request_path(embedder, tmp_path):
+    fg = _FeatureGroup()
+    view = _HopsworksView(fg)
+    stamp = CorpusStamp(_Engine(view, view), manifest_path=tmp_path / "m.json", poll_seconds=None)
+    cache = _cache(embedder, stamp_fn=stamp)
+    polls = fg.polls
+
+    cache.store("heart murmur segmentation", {"answer": "A"})
+    fg.commit = 2
+    assert cache.lookup("heart murmur segmentation") == {"answer": "A"}
+    assert fg.polls == polls  # lookups never call Hopsworks
+
+    stamp.refresh()  # what the background thread does every poll_seconds
+    assert cache.lookup("heart murmur segmentation") is None
+
+
+def test_background_poll_thread(embedder, tmp_path):
+    fg = _FeatureGroup()
+    view = _HopsworksView(fg)
+    stamp = CorpusStamp(_Engine(view, view), manifest_path=tmp_path / "m.json", poll_seconds=0.01)
+    try:
+        before = stamp.commits()
+        fg.commit = 7
+        for _ in range(200):
+            if stamp.commits() != before:
+                break
+            stamp._stop.wait(0.01)
+        assert stamp.commits() == ((("paper_chunk_fg_2", 3, 7),),) * 2
+    finally:
+        stamp.close()
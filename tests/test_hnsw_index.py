@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("hnswlib")
+
+from functions.hnsw_index import HNSWVectorIndex
+
+
+@pytest.fixture
+def chunks() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    n = 300
+    return pd.DataFrame(
+        {
+            "paper_id": [f"P{i // 3:03d}" for i in range(n)],
+            "chunk_index": [i % 3 for i in range(n)],
+            "embedding": list(rng.normal(size=(n, 16)).astype(np.float32)),
+        }
+    )
+
+
+def test_concurrent_searches_get_their_own_ef(tmp_path, chunks):
+    index = HNSWVectorIndex.build(tmp_path, chunks, ef_search=8)
+    queries = np.random.default_rng(1).normal(size=(64, 16))
+
+    def run(i):
+        k = 5 + (i % 4) * 20  # most calls need ef > ef_search
+        if i % 2:
+            positions, _ = index.search(queries[i], k=k)
+            return k, len(positions)
+        (positions, _), = index.search_batch(queries[i:i + 1], k=k)
+        return k, len(positions)
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(run, range(len(queries))))
+
+    assert all(k == found for k, found in results)
+    assert index.ef_search == 8
+    # The graph is back at ef_search once every call has finished
+    (positions, _), = index.search_batch(queries[:1], k=3)
+    assert len(positions) == 3
+
+
+def test_recall_report_restores_ef(tmp_path, chunks):
+    index = HNSWVectorIndex.build(tmp_path, chunks, ef_search=32)
+    report = index.recall_report(np.random.default_rng(2).normal(size=(5, 16)), k=5, ef_values=[10, 50])
+    assert list(report["ef_search"]) == [10, 50]
+    assert index.ef_search == 32
+
+
+def test_compact_builds_the_graph_once(tmp_path, chunks, monkeypatch):
+    index = HNSWVectorIndex.build(tmp_path, chunks, M=8, ef_construction=50, ef_search=40)
+    index.delete_papers(["P000", "P001"])
+
+    builds = []
+    original = HNSWVectorIndex._build_graph.__func__
+    monkeypatch.setattr(
+        HNSWVectorIndex, "_build_graph",
+        classmethod(lambda cls, *args: builds.append(args[1:]) or original(cls, *args)),
+    )
+    compacted = index.compact()
+
+    assert builds == [(8, 50, 40)]
+    assert len(compacted) == len(chunks) - 6 and compacted.count == len(compacted)
+    assert (compacted.M, compacted.ef_construction, compacted.ef_search) == (8, 50, 40)
+    positions, _ = compacted.search(chunks["embedding"][10], k=len(compacted))
+    assert len(positions) == len(compacted)
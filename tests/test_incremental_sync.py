@@ -0,0 +1,69 @@
+import pytest
+
+from functions.incremental_sync import IncrementalSync, manifest_signature
+
+
+def _paper(pid, title="A title", **fields):
+    return dict({"paper_id": pid, "title": title, "year": 2021, "file_attachments": ""}, **fields)
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    return tmp_path / "sync" / "manifest.json"
+
+
+def _synced(manifest, papers, chunk_counts):
+    sync = IncrementalSync(manifest)
+    sync.record_backfill(papers, chunk_counts)
+    return IncrementalSync(manifest)
+
+
+def test_diff_detects_added_modified_deleted(manifest, tmp_path):
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF-1")
+    sync = _synced(
+        manifest,
+        [_paper("A", file_attachments=str(pdf)), _paper("B"), _paper("C"), _paper("D")],
+        {"A": 3, "B": 2, "C": 1},
+    )
+
+    pdf.write_bytes(b"%PDF-1 edited")  # attachment changed, metadata not
+    changes = sync.diff(
+        [_paper("A", file_attachments=str(pdf)), _paper("B", title="Retitled"), _paper("D"), _paper("E")]
+    )
+
+    assert (changes.added, changes.modified, changes.deleted) == (["E"], ["A", "B"], ["C"])
+    assert changes.unchanged == 1 and set(changes.fingerprints) == {"A", "B", "E"}
+    assert changes.summary() == "1 added, 2 modified, 1 deleted, 1 unchanged"
+
+
+def test_stale_chunk_keys_and_commit(manifest):
+    sync = _synced(manifest, [_paper("A"), _paper("B"), _paper("C")], {"A": 4, "B": 2, "C": 2})
+    changes = sync.diff([_paper("A", year=2022), _paper("B", year=2022), _paper("N")])
+    new_counts = {"A": 2, "B": 3, "N": 1}
+
+    # A shrank 4 -> 2, B grew (upsert overwrites), C was deleted
+    assert sync.stale_chunk_keys(changes, new_counts) == [("A", 2), ("A", 3), ("C", 0), ("C", 1)]
+
+    before = manifest_signature(manifest)
+    sync.commit(changes, new_counts)
+    assert manifest_signature(manifest) != before
+
+    reloaded = IncrementalSync(manifest)
+    assert {pid: p["num_chunks"] for pid, p in reloaded.papers.items()} == {"A": 2, "B": 3, "N": 1}
+    assert reloaded.diff([_paper("A", year=2022), _paper("B", year=2022), _paper("N")]).is_empty()
+
+
+def test_uncommitted_changes_are_detected_again(manifest):
+    sync = _synced(manifest, [_paper("A")], {"A": 1})
+    assert sync.diff([_paper("A", title="New")]).modified == ["A"]
+
+    # Upload failed: nothing committed, the next run sees the same change
+    assert IncrementalSync(manifest).diff([_paper("A", title="New")]).modified == ["A"]
+
+
+def test_unknown_manifest_version_starts_over(manifest):
+    manifest.parent.mkdir(parents=True)
+    manifest.write_text('{"version": 0, "papers": {"A": {}}}')
+    assert manifest_signature(manifest) != ""
+    assert IncrementalSync(manifest).diff([_paper("A")]).added == ["A"]
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from functions.metadata_filter import MetadataFilterIndex, parse_filter
+
+
+@pytest.mark.parametrize(
+    "expr, clauses",
+    [
+        ("year >= 2023", [("year", ">=", 2023.0)]),
+        ("Year == 2020 AND type = preprint", [("year", "=", 2020.0), ("item_type", "=", "preprint")]),
+        (
+            "item_type in (journalArticle, 'preprint')",
+            [("item_type", "in", ["journalArticle", "preprint"])],
+        ),
+        ("year in [2019, 2021]", [("year", "in", [2019.0, 2021.0])]),
+        ('author ~ "Liu, Yang"', [("authors", "=", "Liu, Yang")]),
+        ("authors in (Liu, Smith) and year != 2022", [("authors", "in", ["Liu", "Smith"]), ("year", "!=", 2022.0)]),
+    ],
+)
+def test_parse_filter(expr, clauses):
+    assert parse_filter(expr) == clauses
+
+
+@pytest.mark.parametrize(
+    "expr, message",
+    [
+        ("year", "Cannot parse"),
+        ("venue = ICASSP", "Unknown filter field"),
+        ("type > preprint", "only applies to year"),
+        ("year >= recent", "could not convert"),
+    ],
+)
+def test_parse_filter_errors(expr, message):
+    with pytest.raises(ValueError, match=message):
+        parse_filter(expr)
+
+
+@pytest.fixture
+def index(papers_frame):
+    return MetadataFilterIndex(
+        papers_frame["paper_id"].to_numpy(),
+        papers_frame["year"].to_numpy(),
+        papers_frame["item_type"],
+        papers_frame["authors"],
+    )
+
+
+def _expected(papers_frame, mask):
+    return papers_frame["paper_id"][mask].tolist()
+
+
+def test_select_matches_the_frame(index, papers_frame):
+    df = papers_frame
+    liu = df["authors"].str.contains("Liu")
+
+    assert index.select("year >= 2022") == _expected(df, df["year"] >= 2022)
+    assert index.select("type != preprint") == _expected(df, df["item_type"] != "preprint")
+    assert index.select("author = liu and year in (2019, 2020)") == _expected(df, liu & df["year"].isin([2019, 2020]))
+    assert index.select("author = Liu, Yang") == _expected(df, liu)
+    assert index.select("author in (Nobody, Smith)") == _expected(df, ~liu)
+    assert index.select("author != smith") == _expected(df, liu)
+    assert index.select("type = Unknown") == []
+    assert index.selectivity("type = preprint") == pytest.approx(0.25)
+
+
+def test_bitmaps_are_cached_per_expression(index):
+    first = index.bitmap("year >= 2021")
+    assert index.bitmap("year >= 2021") is first
+    assert np.unpackbits(first, count=index.n).sum() == len(index.select("year >= 2021"))
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from functions.metadata_snapshot import MetadataSnapshot, StringColumn, _prepare
+
+
+class _Feature:
+    def __init__(self, name):
+        self.name = name
+
+
+class _Read:
+    def __init__(self, frame, log, kind):
+        self.frame, self.log, self.kind = frame, log, kind
+
+    def as_of(self, wallclock_time=None, exclude_until=None):
+        frame = self.frame[(self.frame["_commit"] > exclude_until) & (self.frame["_commit"] <= wallclock_time)]
+        return _Read(frame, self.log, ("delta", exclude_until, wallclock_time))
+
+    def read(self):
+        self.log.append((self.kind, len(self.frame)))
+        return self.frame.drop(columns="_commit")
+
+
+class FakeFeatureGroup:
+    """
+    Hudi-like Feature Group: every insert / delete is a commit; as_of()
+    returns the rows written after exclude_until (no tombstones).
+    """
+
+    def __init__(self, frame):
+        self.frame = frame.assign(_commit=1)
+        self.commits = {1: {"rowsInserted": len(frame), "rowsDeleted": 0}}
+        self.reads = []
+
+    def _commit(self, **details):
+        commit = max(self.commits) + 1
+        self.commits[commit] = details
+        return commit
+
+    def insert(self, rows):
+        commit = self._commit(rowsInserted=len(rows), rowsDeleted=0)
+        kept = self.frame[~self.frame["paper_id"].isin(rows["paper_id"])]
+        self.frame = pd.concat([kept, rows.assign(_commit=commit)], ignore_index=True)
+
+    def delete(self, paper_ids):
+        self._commit(rowsInserted=0, rowsDeleted=len(paper_ids))
+        self.frame = self.frame[~self.frame["paper_id"].isin(paper_ids)]
+
+    def commit_details(self, limit=None):
+        ids = sorted(self.commits, reverse=True)[:limit]
+        return {c: self.commits[c] for c in ids}
+
+    def select(self, columns):
+        kind = "keys" if columns == ["paper_id"] else "select"
+        return _Read(self.frame[columns + ["_commit"]], self.reads, kind)
+
+
+class _Query:
+    def __init__(self, fg):
+        self._left_feature_group = fg
+        self._joins = []
+
+    def read(self):
+        self._left_feature_group.reads.append(("full", len(self._left_feature_group.frame)))
+        return self._left_feature_group.frame.drop(columns="_commit")
+
+
+class FakeMetadataView:
+    name = "paper_metadata_fv_test"
+    version = 1
+
+    def __init__(self, fg):
+        self.query = _Query(fg)
+        self.schema = [_Feature(c) for c in fg.frame.columns if c != "_commit"]
+
+
+@pytest.fixture
+def source(papers_frame):
+    fg = FakeFeatureGroup(papers_frame.drop(columns="embedding"))
+    return fg, FakeMetadataView(fg)
+
+
+def _assert_matches_source(snapshot, fg):
+    expected = _prepare(fg.frame.drop(columns="_commit"))
+    pd.testing.assert_frame_equal(snapshot.to_frame(), expected, check_dtype=False)
+    assert snapshot.titles["P01"] == expected.set_index("paper_id").at["P01", "title"]
+
+
+def test_refresh_reads_only_new_commits(source, tmp_path):
+    fg, view = source
+    snapshot = MetadataSnapshot.open_or_build(tmp_path, view, refresh=False)
+    assert fg.reads == [("full", 40)] and snapshot.stamp["commit"] == 1
+
+    assert snapshot.refresh(view) is False  # nothing committed
+    fg.insert(pd.DataFrame({
+        "paper_id": ["P03", "P99"],
+        "title": ["Retitled ✓", "New paper"],
+        "abstract": ["", ""],
+        "authors": ["Smith, A", "Ng, K"],
+        "year": [2022, np.nan],
+        "item_type": ["journalArticle", "preprint"],
+    }))
+    assert snapshot.refresh(view) is True
+
+    assert fg.reads[1:] == [(("delta", 1, 2), 2)]
+    assert snapshot.version == 2 and snapshot.stamp["commit"] == 2
+    assert snapshot.titles["P03"] == "Retitled ✓" and "P99" in snapshot.titles
+    _assert_matches_source(snapshot, fg)
+    assert not (snapshot.snapshot_dir / "v1").exists()
+
+
+def test_deletes_diff_keys_only(source, tmp_path):
+    fg, view = source
+    snapshot = MetadataSnapshot.open_or_build(tmp_path, view, refresh=False)
+    fg.delete(["P00", "P17"])
+
+    assert snapshot.refresh(view) is True
+    assert [kind for kind, _ in fg.reads] == ["full", "keys", ("delta", 1, 2)]
+    assert len(snapshot) == 38 and "P17" not in snapshot.titles
+    _assert_matches_source(snapshot, fg)
+
+
+def test_identical_rows_only_advance_the_commit(source, tmp_path):
+    fg, view = source
+    snapshot = MetadataSnapshot.open_or_build(tmp_path, view, refresh=False)
+    fg.insert(fg.frame.drop(columns="_commit").head(5))
+
+    assert snapshot.refresh(view) is False
+    assert snapshot.version == 1 and snapshot.stamp["commit"] == 2
+
+
+def test_schema_change_rebuilds(source, tmp_path):
+    fg, view = source
+    snapshot = MetadataSnapshot.open_or_build(tmp_path, view, refresh=False)
+    fg.frame = fg.frame.drop(columns="item_type")
+    fg.insert(fg.frame.drop(columns="_commit").head(1))
+    view.schema = [f for f in view.schema if f.name != "item_type"]
+
+    assert snapshot.refresh(view) is True
+    assert fg.reads[-1] == ("full", 40)
+    assert snapshot.stamp["columns"] == ["title", "authors", "year"]
+    assert snapshot.stamp["commit"] == 2
+
+
+def test_string_column_take():
+    values = ["", "héllo", "a", "", "wörld ✓"]
+    data, offsets = StringColumn.encode(values)
+    index = np.array([4, 0, 1, 1])
+    column = StringColumn(*StringColumn.take(data, offsets, index))
+    assert column.tolist() == [values[i] for i in index]
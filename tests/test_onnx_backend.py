@@ -0,0 +1,120 @@
+import json
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from functions import onnx_backend
+from functions.onnx_backend import embedding_parity, load_embedder, load_reranker, parity_failures, rerank_parity
+
+
+class _Model:
+    """
+    Stand-in for SentenceTransformer / CrossEncoder. Exported int8 models
+    add `noise` to their outputs (module attribute, set per test).
+    """
+
+    noise = 0.0
+    loads = []
+
+    def __init__(self, name, backend="torch", model_kwargs=None):
+        self.name = name
+        self.backend = backend
+        self.file_name = (model_kwargs or {}).get("file_name", "")
+        _Model.loads.append((name, backend, self.file_name))
+
+    def _drift(self, n):
+        if "qint8" not in self.file_name:
+            return np.zeros(n)
+        return np.random.default_rng(0).normal(scale=_Model.noise, size=n)
+
+    def encode(self, texts):
+        base = np.array([[len(t), t.count(" ") + 1, sum(map(ord, t)) % 97] for t in texts], dtype=np.float64)
+        return base + self._drift(base.size).reshape(base.shape)
+
+    def predict(self, pairs):
+        base = np.array([len(set(q.split()) & set(d.split())) + len(d) / 100 for q, d in pairs])
+        return base + self._drift(len(pairs))
+
+    def save_pretrained(self, path):
+        (onnx_dir := Path(path) / "onnx").mkdir(parents=True, exist_ok=True)
+        (onnx_dir / "model.onnx").write_bytes(b"onnx")
+
+
+def _quantize(model, quantization, path):
+    (Path(path) / "onnx" / f"model_qint8_{quantization}.onnx").write_bytes(b"int8")
+
+
+@pytest.fixture(autouse=True)
+def fake_sentence_transformers(monkeypatch):
+    module = types.ModuleType("sentence_transformers")
+    module.SentenceTransformer = type("SentenceTransformer", (_Model,), {})
+    module.CrossEncoder = type("CrossEncoder", (_Model,), {})
+    module.export_dynamic_quantized_onnx_model = _quantize
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    _Model.noise = 0.0
+    _Model.loads = []
+    return module
+
+
+def test_parity_failures_gates():
+    assert parity_failures({"min_cosine": 0.999, "mean_cosine": 0.9995}) == []
+    assert parity_failures({"min_cosine": 0.95}) == ["min_cosine 0.9500 < 0.99"]
+    assert parity_failures({"min_cosine": float("nan")})
+    good = {"max_abs_drift": 0.1, "mean_abs_drift": 0.05, "rank_correlation": 1.0, "top1_agrees": 1.0}
+    assert parity_failures(good) == []
+    assert len(parity_failures(dict(good, max_abs_drift=2.0, rank_correlation=0.2))) == 2
+
+
+def test_parity_metrics(fake_sentence_transformers):
+    st = fake_sentence_transformers
+    reference = st.SentenceTransformer("m")
+    assert embedding_parity(reference, reference)["min_cosine"] == pytest.approx(1.0)
+
+    ce = st.CrossEncoder("m")
+    result = rerank_parity(ce, ce)
+    assert result["max_abs_drift"] == 0.0 and result["rank_correlation"] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("loader, cls_name", [(load_embedder, "SentenceTransformer"), (load_reranker, "CrossEncoder")])
+def test_int8_export_within_parity_is_used(tmp_path, loader, cls_name):
+    _Model.noise = 1e-4
+    model = loader("org/model", "onnx-int8", cache_dir=tmp_path, quantization="avx2")
+
+    assert type(model).__name__ == cls_name
+    assert model.backend == "onnx" and "qint8" in model.file_name
+    stored = json.loads((tmp_path / "org_model" / "parity.json").read_text())
+    assert parity_failures(stored["onnx/model_qint8_avx2.onnx"]) == []
+
+
+@pytest.mark.parametrize("loader", [load_embedder, load_reranker])
+def test_bad_int8_export_falls_back_to_torch(tmp_path, loader):
+    _Model.noise = 50.0
+    model = loader("org/model", "onnx-int8", cache_dir=tmp_path, quantization="avx2")
+    assert model.backend == "torch"
+
+    # The stored failing result is honoured without re-running the check
+    _Model.loads = []
+    model = loader("org/model", "onnx-int8", cache_dir=tmp_path, quantization="avx2")
+    assert model.backend == "torch"
+    assert [backend for _, backend, _ in _Model.loads] == ["onnx", "torch"]
+
+
+def test_unchecked_export_and_torch_backend(tmp_path):
+    _Model.noise = 50.0
+    assert load_embedder("m", "onnx-int8", cache_dir=tmp_path, check_parity=False).backend == "onnx"
+    assert load_reranker("m", "torch").backend == "torch"
+    with pytest.raises(ValueError):
+        load_embedder("m", "tensorrt")
+
+
+def test_export_happens_once(tmp_path, monkeypatch):
+    exports = []
+    original = onnx_backend._export
+    monkeypatch.setattr(onnx_backend, "_export", lambda *a: exports.append(a[2]) or original(*a))
+    for _ in range(2):
+        load_embedder("m", "onnx", cache_dir=tmp_path)
+    saved = [l for l in _Model.loads if l[1] == "onnx" and l[2] == ""]
+    assert exports == ["onnx", "onnx"] and len(saved) == 1  # converted from PyTorch only once
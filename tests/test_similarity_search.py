@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+
+from functions import similarity_search_new
+from functions.similarity_search_new import SimilaritySearchEngine
+from functions.vector_index import LocalVectorIndex
+
+
+class _Feature:
+    def __init__(self, name):
+        self.name = name
+
+
+class _Query:
+    def __init__(self, frame, feature_group=None):
+        self.frame = frame
+        if feature_group is not None:
+            self._left_feature_group = feature_group
+
+    def read(self):
+        return self.frame.drop(columns=["embedding"])
+
+
+class FakeHopsworksView:
+    """
+    hsfs-like Feature View: no supports_prefilter, find_neighbors returns
+    the k nearest rows (schema order, no distance); filter= is paper_id isin.
+    """
+
+    name = "paper_metadata_fv_test"
+    version = 1
+
+    def __init__(self, frame, feature_group=None, reject_filter=False):
+        self.frame = frame.reset_index(drop=True)
+        self.schema = [_Feature(c) for c in frame.columns]
+        self.query = _Query(self.frame, feature_group)
+        self.reject_filter = reject_filter
+        self.calls = []
+
+    def find_neighbors(self, embedding, k=10, filter=None):
+        self.calls.append((k, filter))
+        frame = self.frame
+        if filter is not None:
+            if self.reject_filter:
+                raise RuntimeError("filter not supported")
+            frame = frame[frame["paper_id"].isin(filter.values)]
+        matrix = np.vstack(frame["embedding"].to_numpy())
+        matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+        q = np.asarray(embedding, dtype=np.float32)
+        order = np.argsort(-(matrix @ (q / np.linalg.norm(q))), kind="stable")[:k]
+        return [list(row) for row in frame.iloc[order].itertuples(index=False)]
+
+
+class _IsIn:
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class _PaperIdFeature:
+    def isin(self, values):
+        return _IsIn(values)
+
+
+class FakeFeatureGroup:
+    def get_feature(self, name):
+        assert name == "paper_id"
+        return _PaperIdFeature()
+
+
+@pytest.fixture(autouse=True)
+def no_reranker(monkeypatch):
+    monkeypatch.setattr(similarity_search_new, "load_reranker", lambda *args, **kwargs: None)
+
+
+def _engine(embedder, metadata_fv, tmp_path):
+    return SimilaritySearchEngine(
+        embedder, metadata_fv, chunk_feature_view=None,
+        metadata_snapshot_dir=str(tmp_path / "snapshot"),
+    )
+
+
+@pytest.mark.parametrize(
+    "filter_expr, k",
+    [
+        ("year >= 2023 and type = preprint", 4),  # 2 papers match
+        ("year >= 2022", 5),                      # more matches than k
+        ("author in (Liu, Nobody) and year = 2020", 3),
+    ],
+)
+def test_filtered_metadata_search_without_prefilter(embedder, papers_frame, tmp_path, filter_expr, k):
+    local = _engine(embedder, LocalVectorIndex.build(tmp_path / "index", papers_frame), tmp_path / "a")
+    remote_fv = FakeHopsworksView(papers_frame)
+    remote = _engine(embedder, remote_fv, tmp_path / "b")
+    assert not getattr(remote_fv, "supports_prefilter", False)
+
+    query = "heart murmur segmentation"
+    expected = local.search_metadata(query, k=k, filter_expr=filter_expr)
+    result = remote.search_metadata(query, k=k, filter_expr=filter_expr)
+
+    allowed = set(local.filter_index.select(filter_expr))
+    assert len(expected) == min(k, len(allowed))
+    assert list(result["paper_id"]) == list(expected["paper_id"])
+    np.testing.assert_allclose(result.scores(), expected.scores(), atol=1e-5)
+    # Selective filters are over-fetched, not cut at k
+    assert remote_fv.calls[0][0] >= k
+
+
+def test_filter_is_pushed_down_to_find_neighbors(embedder, papers_frame, tmp_path):
+    fv = FakeHopsworksView(papers_frame, feature_group=FakeFeatureGroup())
+    engine = _engine(embedder, fv, tmp_path)
+
+    result = engine.search_metadata("wavelet noise", k=3, filter_expr="type = preprint")
+
+    allowed = set(engine.filter_index.select("type = preprint"))
+    k, flt = fv.calls[0]
+    assert k == 3 and set(flt.values) == allowed
+    assert len(result) == 3 and set(result["paper_id"]) <= allowed
+
+
+def test_rejected_filter_falls_back_to_post_filter(embedder, papers_frame, tmp_path):
+    fv = FakeHopsworksView(papers_frame, feature_group=FakeFeatureGroup(), reject_filter=True)
+    engine = _engine(embedder, fv, tmp_path)
+
+    result = engine.search_metadata("wavelet noise", k=3, filter_expr="type = preprint")
+
+    assert len(result) == 3
+    assert set(result["paper_id"]) <= set(engine.filter_index.select("type = preprint"))
+    assert engine._filter_pushdown is False
+
+
+def test_reembedded_rows_are_scored_with_the_returned_vector(embedder, papers_frame, tmp_path):
+    fv = FakeHopsworksView(papers_frame)
+    engine = _engine(embedder, fv, tmp_path)
+    query = "heart murmur segmentation"
+
+    before = engine.search_metadata(query, k=1)
+    top = before["paper_id"][0]
+
+    # Abstract re-embedded in the store; metadata snapshot columns unchanged
+    row = fv.frame.index[fv.frame["paper_id"] == top][0]
+    fv.frame.at[row, "embedding"] = embedder.encode("wavelet noise")
+    after = engine.search_metadata(query, k=len(papers_frame))
+
+    expected = 1.0 - np.dot(
+        embedder.encode(query) / np.linalg.norm(embedder.encode(query)),
+        embedder.encode("wavelet noise") / np.linalg.norm(embedder.encode("wavelet noise")),
+    )
+    score = after.scores()[list(after["paper_id"]).index(top)]
+    assert score == pytest.approx(expected, abs=1e-5)
+    assert score != pytest.approx(before.scores()[0], abs=1e-5)
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from functions.sparse_index import BM25Index, tokenize
+
+QUERIES = ["heart murmur", "PCG segmentation (CNN)", "wavelet noise synthetic", "unknownword"]
+
+
+@pytest.fixture
+def chunks(papers_frame) -> pd.DataFrame:
+    rows = [
+        (pid, i, f"{abstract} part {i}" if i else abstract)
+        for pid, abstract in zip(papers_frame["paper_id"], papers_frame["abstract"])
+        for i in range(3)
+    ]
+    return pd.DataFrame(rows, columns=["paper_id", "chunk_index", "content"])
+
+
+def _ranking(index, query, k=10):
+    batch = index.find_matches(query, k=k)
+    return list(zip(batch["paper_id"], batch["chunk_index"])), np.asarray(batch["bm25_score"])
+
+
+def _doc_freq(index):
+    # Term ids depend on insertion order: compare per term
+    return {term: int(df) for term, df in zip(index.terms, index.doc_freq) if df}
+
+
+def _assert_same_results(a, b):
+    for query in QUERIES:
+        keys_a, scores_a = _ranking(a, query)
+        keys_b, scores_b = _ranking(b, query)
+        np.testing.assert_allclose(scores_a, scores_b, rtol=1e-6)
+        assert set(keys_a) == set(keys_b)
+
+
+def test_tokenize():
+    assert tokenize("PCG-based (Heart) sound, v2") == ["pcg", "based", "heart", "sound", "v2"]
+
+
+def test_segments_merge_to_the_same_index(chunks):
+    built = BM25Index()
+    built.add(chunks)
+
+    incremental = BM25Index()
+    for part in np.array_split(np.arange(len(chunks)), BM25Index.MAX_SEGMENTS + 3):
+        incremental.add(chunks.iloc[part])
+    assert len(incremental.segments) <= BM25Index.MAX_SEGMENTS
+
+    assert _doc_freq(incremental) == _doc_freq(built)
+    _assert_same_results(incremental, built)
+
+
+def test_delete_compact_and_reload(chunks, tmp_path):
+    index = BM25Index(tmp_path / "bm25")
+    index.add(chunks.iloc[:60])
+    index.add(chunks.iloc[60:])
+
+    removed = ["P00", "P05", "P31"]
+    assert index.delete_papers(removed) == 9
+    assert len(index) == len(chunks) - 9
+    for query in QUERIES:
+        assert not set(removed) & {pid for pid, _ in _ranking(index, query, k=len(chunks))[0]}
+
+    # Tombstones survive a save / load round trip
+    index.save()
+    reloaded = BM25Index(tmp_path / "bm25")
+    assert len(reloaded) == len(index) and reloaded.deleted.sum() == 9
+    _assert_same_results(reloaded, index)
+
+    index.compact()
+    assert len(index.doc_len) == len(index) == len(chunks) - 9 and not index.deleted.any()
+    fresh = BM25Index()
+    fresh.add(chunks[~chunks["paper_id"].isin(removed)])
+    assert _doc_freq(index) == _doc_freq(fresh)
+    _assert_same_results(index, fresh)
+
+
+def test_upsert_replaces_a_papers_chunks(chunks):
+    index = BM25Index()
+    index.add(chunks)
+    index.upsert_papers(pd.DataFrame({"paper_id": ["P07"], "chunk_index": [0], "content": ["zebra crossing"]}))
+
+    assert _ranking(index, "zebra")[0] == [("P07", 0)]
+    assert len(index.docs_for_papers(["P07"])) == 1
+
+    scoped = index.find_matches("heart murmur zebra", k=5, paper_ids=["P07", "P08"])
+    assert set(scoped["paper_id"]) <= {"P07", "P08"}
@@ -0,0 +1,126 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from functions import staged_backfill
+from functions.incremental_sync import IncrementalSync
+from functions.staged_backfill import StagedBackfill
+from functions.zotero_parser import ZoteroCSVParser
+
+PARAGRAPH = "Heart sound segmentation with a convolutional network is evaluated on noisy PCG recordings. " * 6
+
+
+def _write_csv(path, n):
+    pd.DataFrame(
+        {
+            "Key": [f"K{i:03d}" for i in range(n)],
+            "Title": [f"Paper {i}" for i in range(n)],
+            "Author": ["Liu, Yang"] * n,
+            "Publication Year": [str(2019 + i % 4) for i in range(n)],
+            "Abstract Note": ["An abstract."] * n,
+            "File Attachments": [f"/papers/{i}.pdf" if i % 3 else "" for i in range(n)],
+            "Url": [""] * n,
+            "Item Type": ["journalArticle"] * n,
+            "Date Modified": ["2026-01-01"] * n,
+        }
+    ).to_csv(path, index=False)
+
+
+class FakeFeatureGroup:
+    def __init__(self):
+        self.inserted = []
+        self.materialized = 0
+        self.materialization_job = self
+
+    def insert(self, df, write_options=None):
+        self.inserted.append(df)
+
+    def run(self, await_termination=True):
+        self.materialized += 1
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.texts = 0
+
+    def __call__(self, texts):
+        self.texts += len(texts)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+@pytest.fixture(autouse=True)
+def fake_extraction(monkeypatch):
+    # Four paragraphs per attached PDF, no PDF parsing
+    monkeypatch.setattr(
+        staged_backfill,
+        "read_clean_fulltexts",
+        lambda paths, cache=None, workers=None: ["\n\n".join([PARAGRAPH] * 4) if p else "" for p in paths],
+    )
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "export.csv"
+    _write_csv(path, 7)
+    return path
+
+
+def _backfill(csv_path, tmp_path, embed_fn, **kwargs):
+    return StagedBackfill(csv_path, tmp_path / "work", embed_fn, partition_size=3, **kwargs)
+
+
+def test_resume_skips_finished_steps(csv_path, tmp_path):
+    embed = CountingEmbedder()
+    first = _backfill(csv_path, tmp_path, embed).run(stop_after="embed")
+    assert first == {"executed": 9, "skipped": 0, "partitions": 3}
+    embedded = embed.texts
+
+    # Crash mid-embed of partition 1: its marker never got written
+    os.remove(tmp_path / "work" / "embed" / "part-00001.done")
+
+    embed.texts = 0
+    meta_fg, chunk_fg = FakeFeatureGroup(), FakeFeatureGroup()
+    manifest = tmp_path / "manifest.json"
+    second = _backfill(
+        csv_path, tmp_path, embed, metadata_fg=meta_fg, chunk_fg=chunk_fg, manifest_path=manifest
+    ).run()
+
+    # extract + chunk + 2 embeds resumed; 1 embed + 3 uploads executed
+    assert second == {"executed": 4, "skipped": 8, "partitions": 3}
+    assert 0 < embed.texts < embedded
+
+    papers = pd.concat(meta_fg.inserted)
+    chunks = pd.concat(chunk_fg.inserted)
+    assert sorted(papers["paper_id"]) == [f"K{i:03d}" for i in range(7)]
+    assert not chunks.duplicated(["paper_id", "chunk_index"]).any()
+    assert set(chunks["paper_id"]) == {f"K{i:03d}" for i in range(7) if i % 3}
+    assert meta_fg.materialized == chunk_fg.materialized == 1
+
+    # The manifest knows the chunk counts, so the next incremental run is a no-op
+    sync = IncrementalSync(manifest)
+    assert sync.diff(ZoteroCSVParser(csv_path).parse()).is_empty()
+    assert sync.papers["K001"]["num_chunks"] == int((chunks["paper_id"] == "K001").sum())
+
+    third = _backfill(csv_path, tmp_path, embed, metadata_fg=meta_fg, chunk_fg=chunk_fg).run()
+    assert third == {"executed": 0, "skipped": 12, "partitions": 3}
+    assert meta_fg.materialized == 1
+
+
+def test_checkpoints_belong_to_one_export(csv_path, tmp_path):
+    _backfill(csv_path, tmp_path, CountingEmbedder()).run(stop_after="extract")
+
+    _write_csv(csv_path, 8)
+    with pytest.raises(RuntimeError, match="another export"):
+        _backfill(csv_path, tmp_path, CountingEmbedder())
+
+    with pytest.raises(ValueError):
+        StagedBackfill(csv_path, tmp_path / "other", CountingEmbedder()).run(stop_after="index")
+
+
+def test_upload_requires_feature_groups(csv_path, tmp_path):
+    backfill = _backfill(csv_path, tmp_path, CountingEmbedder())
+    with pytest.raises(RuntimeError, match="required for upload"):
+        backfill.run()
+    assert backfill.is_done("embed", 0) and not backfill.is_done("upload", 0)